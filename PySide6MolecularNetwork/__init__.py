@@ -7,18 +7,133 @@ try:
     from . import qmn
     from .qmn import (Node, NodePolygon, Edge, Config,
                               NetworkScene as BaseNetworkScene,
-                              NetworkStyle, DefaultStyle)
+                              NetworkStyle, DefaultStyle, DepictionCache)
     from .style import read_css, style_to_json, style_to_cytoscape
     
+    from ._utils import to_mask, to_array, to_indexes
+    from .attributes import AttributesFiltersMixin
+    
     import numpy as np
+
+    from PySide6.QtCore import Qt
                               
-    class NetworkScene(BaseNetworkScene):
-        def setLayout(self, layout, scale=0, isolated_nodes=[]):
-            if isinstance(layout, list):
-                layout = np.asarray(layout)
-                
-            super().setLayout(layout.ravel(), scale,
-                              isolated_nodes if isolated_nodes is not None else [])
+    # Attributes and filters are evaluated with NumPy, the resulting masks are applied by the compiled scene
+    class NetworkScene(AttributesFiltersMixin, BaseNetworkScene):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._resetAttributes()
+
+        def clear(self):
+            super().clear()
+            self._resetAttributes()
+
+        def setLayout(self, layout, scale=0, isolated_nodes=None):
+            layout = np.asarray(layout, dtype=np.float64).reshape(-1, 2)
+            self.setLayoutFromArray(layout, scale, to_mask(isolated_nodes, len(layout)))
+            
+        def setLayoutFromArray(self, layout, scale=0, isolated_mask=None):
+            layout = np.ascontiguousarray(layout, dtype=np.float64).reshape(-1, 2)
+            isolated_mask = to_mask(isolated_mask, len(layout))
+            super().setLayoutFromArray(layout.tobytes(), scale if scale is not None else 0,
+                                       isolated_mask.tobytes())
+
+        def selectedNodesIndexes(self):
+            return np.array(super().selectedNodesIndexes(), dtype=np.intp)
+
+        def selectedEdgesIndexes(self):
+            return np.array(super().selectedEdgesIndexes(), dtype=np.intp)
+
+        def nodesColorsArray(self):
+            return np.array(super().nodesColorsArray(), dtype=np.uint32)
+
+        def nodesRadiiArray(self):
+            return np.array(super().nodesRadiiArray(), dtype=np.int32)
+
+        def nodesPolygonsArray(self):
+            return np.array(super().nodesPolygonsArray(), dtype=np.int8)
+
+        def edgesWidthsArray(self):
+            return np.array(super().edgesWidthsArray(), dtype=np.float64)
+
+        def setNodesSelection(self, items):
+            if isinstance(items, np.ndarray):
+                self.setNodesSelectionFromArray(items)
+            else:
+                super().setNodesSelection(list(items))
+
+        def setNodesSelectionFromArray(self, indexes):
+            indexes = np.ascontiguousarray(to_indexes(indexes), dtype=np.int32)
+            super().setNodesSelectionFromArray(indexes.tobytes())
+
+        def setEdgesSelection(self, items):
+            if isinstance(items, np.ndarray):
+                self.setEdgesSelectionFromArray(items)
+            else:
+                super().setEdgesSelection(list(items))
+
+        def setEdgesSelectionFromArray(self, indexes):
+            indexes = np.ascontiguousarray(to_indexes(indexes), dtype=np.int32)
+            super().setEdgesSelectionFromArray(indexes.tobytes())
+
+        def setNodesVisible(self, items):
+            indexes = np.ascontiguousarray(to_indexes(items), dtype=np.int32)
+            super().setNodesVisibleFromArray(indexes.tobytes())
+
+        def setEdgesVisible(self, items):
+            indexes = np.ascontiguousarray(to_indexes(items), dtype=np.int32)
+            super().setEdgesVisibleFromArray(indexes.tobytes())
+
+        def setItemsVisible(self, nodes=None, edges=None):
+            nodes = np.ascontiguousarray(to_indexes(nodes), dtype=np.int32) if nodes is not None else None
+            edges = np.ascontiguousarray(to_indexes(edges), dtype=np.int32) if edges is not None else None
+            super().setItemsVisibleFromArrays(nodes.tobytes() if nodes is not None else None,
+                                              edges.tobytes() if edges is not None else None)
+
+        def createNodesFromArrays(self, indexes, positions=None, radii=None, colors=None, labels=None):
+            indexes = np.ascontiguousarray(indexes, dtype=np.int32).ravel()
+            size = len(indexes)
+            positions = to_array(positions, np.float64, size, "positions", 2)
+            radii = to_array(radii, np.int32, size, "radii")
+            colors = to_array(colors, np.uint32, size, "colors")
+            if labels is not None and len(labels) < size:
+                raise ValueError("labels must have one value per index")
+            super().createNodesFromArrays(indexes.tobytes(),
+                                          positions.tobytes() if positions is not None else b'',
+                                          radii.tobytes() if radii is not None else b'',
+                                          colors.tobytes() if colors is not None else b'',
+                                          [str(label) for label in labels] if labels is not None else [])
+
+        def createEdgesFromArrays(self, indexes, sources, dests, widths=None):
+            indexes = np.ascontiguousarray(indexes, dtype=np.int32).ravel()
+            size = len(indexes)
+            sources = to_array(sources, np.int32, size, "sources")
+            dests = to_array(dests, np.int32, size, "dests")
+            widths = to_array(widths, np.float64, size, "widths")
+            super().createEdgesFromArrays(indexes.tobytes(), sources.tobytes(), dests.tobytes(),
+                                          widths.tobytes() if widths is not None else b'')
+
+        def setPieCharts(self, values):
+            values = np.ascontiguousarray(values, dtype=np.float64)
+            if values.ndim == 1:
+                values = values[:, np.newaxis]
+            super().setPieChartsFromArray(values.tobytes(), values.shape[1])
+
+        def setPieChartsFromModel(self, model, column_ids, role=Qt.DisplayRole):
+            # Models which can be converted to an array of numbers are read at once
+            if (role == Qt.DisplayRole and hasattr(model, '__array__')
+                    and len(column_ids) <= len(self.pieColors())):
+                self.setPieCharts(np.asarray(model)[:, list(column_ids)])
+            else:
+                super().setPieChartsFromModel(model, column_ids, role)
+
+        def adjustEdges(self, edges=None):
+            if edges is None:
+                super().adjustEdges()
+            else:
+                super().adjustEdges(list(edges))
+
+        def scheduleEdgesAdjustment(self, edges):
+            super().scheduleEdgesAdjustment(list(edges))
             
     def style_from_css(css):
         result = read_css(css)
@@ -35,9 +150,11 @@ except ImportError:
     from .config import Config
     from .style import (NetworkStyle, DefaultStyle,
                         style_from_css, style_to_json, style_to_cytoscape)
+    from .mol_depiction import DepictionCache
     
 from .view import NetworkView, MiniMapGraphicsView, disable_opengl
-from .mol_depiction import SvgToPixmap, SmilesToPixmap, InchiToPixmap
+from .mol_depiction import (SvgToPixmap, SmilesToPixmap, InchiToPixmap, DepictionService,
+                            ParseStructures, DepictStructures)
 
 from . import _version
 __version__ = _version.get_versions()['version']
@@ -5,4 +5,5 @@ from .config import Config
 from .style import (NetworkStyle, DefaultStyle,
                     style_from_css, style_to_json, style_to_cytoscape)
 from .view import NetworkView, MiniMapGraphicsView, disable_opengl
-from .mol_depiction import SvgToPixmap, SmilesToPixmap, InchiToPixmap
+from .mol_depiction import (SvgToPixmap, SmilesToPixmap, InchiToPixmap, DepictionCache, DepictionService,
+                            ParseStructures, DepictStructures)
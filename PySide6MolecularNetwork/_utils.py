@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def to_mask(items, size: int) -> np.ndarray:
+    """Convert a sequence of indexes or a boolean mask to a boolean mask of length `size`."""
+
+    mask = np.zeros(size, dtype=bool)
+    if items is None or len(items) == 0:
+        return mask
+
+    if not isinstance(items, np.ndarray):
+        items = np.asarray(list(items))
+
+    if items.dtype == bool:
+        items = items[:size]
+        mask[:len(items)] = items
+    else:
+        items = items.astype(np.intp, copy=False)
+        mask[items[(items >= 0) & (items < size)]] = True
+    return mask
+
+
+def to_indexes(items) -> np.ndarray:
+    """Convert a sequence of indexes or a boolean mask to an array of indexes. Only numpy boolean arrays are
+    considered as masks."""
+
+    if not isinstance(items, np.ndarray):
+        return np.asarray(list(items), dtype=np.intp).ravel()
+    if items.dtype == bool:
+        return np.flatnonzero(items)
+    return items.astype(np.intp, copy=False).ravel()
+
+
+def to_array(values, dtype, size: int, name: str, columns: int = None):
+    """Convert `values` to a contiguous array of `size` rows (and `columns` columns), or return None if
+    `values` is None."""
+
+    if values is None:
+        return None
+
+    shape = (-1, columns) if columns is not None else (-1,)
+    array = np.ascontiguousarray(values, dtype=dtype).reshape(shape)
+    if len(array) < size:
+        raise ValueError(f"{name} must have one value per index")
+    return array[:size]
@@ -0,0 +1,334 @@
+import ast
+from typing import List
+
+import numpy as np
+
+
+_COMPARISONS = {ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+                ast.Eq: np.equal, ast.NotEq: np.not_equal}
+_BINARY_OPERATORS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+                     ast.FloorDiv: np.floor_divide, ast.Mod: np.mod, ast.Pow: np.power,
+                     ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or, ast.BitXor: np.logical_xor}
+_UNARY_OPERATORS = {ast.USub: np.negative, ast.UAdd: np.positive, ast.Not: np.logical_not, ast.Invert: np.logical_not}
+_BOOLEAN_OPERATORS = {ast.And: np.logical_and, ast.Or: np.logical_or}
+_FUNCTIONS = {'abs': np.abs, 'sqrt': np.sqrt, 'exp': np.exp, 'log': np.log, 'log2': np.log2, 'log10': np.log10,
+              'isnan': np.isnan, 'min': np.fmin, 'max': np.fmax}
+# Functions are ufuncs which would accept an output array as extra argument, their number of arguments is checked
+_FUNCTIONS_ARGS = {name: 2 if name in ('min', 'max') else 1 for name in _FUNCTIONS}
+
+
+def _compile(node):
+    # Convert an expression tree to a function evaluating it over a mapping of columns
+    if isinstance(node, ast.Expression):
+        return _compile(node.body)
+    elif isinstance(node, ast.Name):
+        name = node.id
+        return lambda columns: columns[name]
+    elif isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float)):
+        value = node.value
+        return lambda columns: value
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        func, operand = _UNARY_OPERATORS[type(node.op)], _compile(node.operand)
+        return lambda columns: func(operand(columns))
+    elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        func, left, right = _BINARY_OPERATORS[type(node.op)], _compile(node.left), _compile(node.right)
+        return lambda columns: func(left(columns), right(columns))
+    elif isinstance(node, ast.BoolOp):
+        func, values = _BOOLEAN_OPERATORS[type(node.op)], [_compile(value) for value in node.values]
+        # Operands may be columns or scalars, e.g. `score > 0.5 and True`
+        return lambda columns: func.reduce(np.broadcast_arrays(*[value(columns) for value in values]))
+    elif isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+        # Chained comparisons such as `0.5 < score <= 1` are combined with a logical and
+        operands = [_compile(node.left)] + [_compile(comparator) for comparator in node.comparators]
+        funcs = [_COMPARISONS[type(op)] for op in node.ops]
+
+        def compare(columns):
+            values = [operand(columns) for operand in operands]
+            return np.logical_and.reduce(np.broadcast_arrays(*[func(left, right) for func, left, right
+                                                               in zip(funcs, values[:-1], values[1:])]))
+        return compare
+    elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+          and not node.keywords):
+        name = node.func.id
+        if len(node.args) != _FUNCTIONS_ARGS[name] or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise ValueError(f"{name}() takes {_FUNCTIONS_ARGS[name]} argument(s) in filter expression")
+        func, args = _FUNCTIONS[name], [_compile(arg) for arg in node.args]
+        return lambda columns: func(*[arg(columns) for arg in args])
+
+    raise ValueError(f"Unsupported syntax in filter expression: {ast.dump(node)}")
+
+
+def compile_expression(expression: str):
+    """Compile a filter expression to a function taking a mapping of columns and returning values computed
+    element-wise.
+
+    Expressions use Python syntax restricted to attribute names, numbers, arithmetic, comparisons (which may be
+    chained), `and`, `or`, `not` (or `&`, `|`, `~`) and the functions abs, sqrt, exp, log, log2, log10, isnan, min
+    and max, e.g. `score >= 0.7 and spectra > 2`."""
+
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+        return _compile(tree)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Invalid filter expression: {expression!r}") from e
+
+
+class AttributesTable:
+    """Numeric attributes of items stored as columns of float64 values indexed by item index.
+
+    All columns have the same length, missing values are NaN. Boolean masks can be computed from filter
+    expressions over these columns, see `compile_expression`."""
+
+    def __init__(self):
+        self._columns = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name: str):
+        return name in self._columns
+
+    def names(self):
+        return list(self._columns.keys())
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only view of the values of attribute `name`."""
+
+        view = self._columns[name].view()
+        view.flags.writeable = False
+        return view
+
+    def _resize(self, size: int):
+        if size <= self._size:
+            return
+        for name, values in self._columns.items():
+            column = np.full(size, np.nan)
+            column[:self._size] = values
+            self._columns[name] = column
+        self._size = size
+
+    def setColumn(self, name: str, values, indexes=None):
+        """Set values of attribute `name` for items at `indexes`, or for items 0 to len(values)-1 if `indexes` is
+        None. Other values of the attribute are reset to NaN."""
+
+        if not name.isidentifier():
+            raise ValueError(f"Attribute name must be a valid identifier: {name!r}")
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if indexes is None:
+            indexes = np.arange(len(values))
+        else:
+            indexes = np.asarray(indexes, dtype=np.intp).ravel()
+            if len(values) != len(indexes):
+                raise ValueError("values must have one value per index")
+            if len(indexes) > 0 and indexes.min() < 0:
+                raise ValueError("indexes must be positive")
+
+        self._resize(int(indexes.max()) + 1 if len(indexes) > 0 else 0)
+        column = np.full(self._size, np.nan)
+        column[indexes] = values
+        self._columns[name] = column
+
+    def removeColumn(self, name: str):
+        self._columns.pop(name, None)
+        if not self._columns:
+            self._size = 0
+
+    def clear(self):
+        self._columns.clear()
+        self._size = 0
+
+    def evaluate(self, expression: str) -> np.ndarray:
+        """Return a boolean mask of items for which `expression` is true. Comparisons with missing values are
+        false."""
+
+        func = compile_expression(expression)
+        columns = _Columns(self._columns)
+        try:
+            with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+                result = func(columns)
+            return np.broadcast_to(np.asarray(result, dtype=bool), (self._size,))
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Invalid filter expression: {expression!r}: {e}") from e
+
+
+class AttributesFiltersMixin:
+    """Numeric attributes of nodes and edges of a scene, and filters over them deciding which items are visible.
+
+    Scenes call `_resetAttributes` when they are created and cleared, and provide `setItemsVisible`."""
+
+    def _resetAttributes(self):
+        self._nodes_attributes = AttributesTable()
+        self._edges_attributes = AttributesTable()
+        self._nodes_filter = None
+        self._edges_filter = None
+
+    def nodesAttributes(self) -> List[str]:
+        return self._nodes_attributes.names()
+
+    def nodesAttribute(self, name: str) -> np.ndarray:
+        """Return a read-only view of the values of attribute `name` indexed by node index, NaN for nodes without
+        a value."""
+
+        return self._nodes_attributes.column(name)
+
+    def setNodesAttribute(self, name: str, values, indexes=None):
+        """Set numeric values of attribute `name` for nodes at `indexes`, or for nodes 0 to len(values)-1 if
+        `indexes` is None. Filters are not applied again, see applyFilters."""
+
+        self._nodes_attributes.setColumn(name, values, indexes)
+
+    def removeNodesAttribute(self, name: str):
+        self._nodes_attributes.removeColumn(name)
+
+    def edgesAttributes(self) -> List[str]:
+        return self._edges_attributes.names()
+
+    def edgesAttribute(self, name: str) -> np.ndarray:
+        """Return a read-only view of the values of attribute `name` indexed by edge index, NaN for edges without
+        a value."""
+
+        return self._edges_attributes.column(name)
+
+    def setEdgesAttribute(self, name: str, values, indexes=None):
+        """Set numeric values of attribute `name` for edges at `indexes`, or for edges 0 to len(values)-1 if
+        `indexes` is None. Filters are not applied again, see applyFilters."""
+
+        self._edges_attributes.setColumn(name, values, indexes)
+
+    def removeEdgesAttribute(self, name: str):
+        self._edges_attributes.removeColumn(name)
+
+    def nodesFilter(self) -> str:
+        return self._nodes_filter
+
+    def setNodesFilter(self, expression: str = None):
+        """Show only nodes for which `expression` over nodes attributes is true, e.g. `spectra >= 3`, or all nodes
+        if `expression` is None. See compile_expression for the syntax of expressions. If `expression` is invalid,
+        ValueError is raised and the previous filter is kept."""
+
+        previous, self._nodes_filter = self._nodes_filter, expression or None
+        try:
+            self.applyFilters()
+        except ValueError:
+            self._nodes_filter = previous
+            raise
+
+    def edgesFilter(self) -> str:
+        return self._edges_filter
+
+    def setEdgesFilter(self, expression: str = None):
+        """Show only edges for which `expression` over edges attributes is true, e.g. `cosine > 0.7`, or all edges
+        if `expression` is None. See compile_expression for the syntax of expressions. If `expression` is invalid,
+        ValueError is raised and the previous filter is kept."""
+
+        previous, self._edges_filter = self._edges_filter, expression or None
+        try:
+            self.applyFilters()
+        except ValueError:
+            self._edges_filter = previous
+            raise
+
+    def applyFilters(self):
+        """Evaluate nodes and edges filters and update visibility of items at once. Items without a value for an
+        attribute used in a filter are hidden."""
+
+        nodes = self._nodes_attributes.evaluate(self._nodes_filter) if self._nodes_filter is not None else None
+        edges = self._edges_attributes.evaluate(self._edges_filter) if self._edges_filter is not None else None
+        self.setItemsVisible(nodes, edges)
+
+
+class _Columns(dict):
+    def __missing__(self, name):
+        raise ValueError(f"Unknown attribute in filter expression: {name!r}")
+
+
+class ColumnStore:
+    """State of items stored as a struct of arrays indexed by item index.
+
+    Columns are declared once with their dtype and default value. Rows are allocated as items are added and
+    capacity grows geometrically, so that adding items one by one is amortized O(1). Bulk getters read whole
+    columns instead of iterating items."""
+
+    def __init__(self, columns: dict):
+        # columns: name -> (dtype, default value)
+        self._defaults = {name: default for name, (dtype, default) in columns.items()}
+        self._columns = {name: np.empty(0, dtype=dtype) for name, (dtype, default) in columns.items()}
+        self._present = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._indexes = None
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size: int):
+        capacity = len(self._present)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 64)
+        for name, values in self._columns.items():
+            column = np.full(capacity, self._defaults[name], dtype=values.dtype)
+            column[:len(values)] = values
+            self._columns[name] = column
+        present = np.zeros(capacity, dtype=bool)
+        present[:len(self._present)] = self._present
+        self._present = present
+
+    def add(self, index: int, *values):
+        """Add an item at `index` with `values` given in the order columns were declared."""
+
+        if index >= len(self._present):
+            self._reserve(index + 1)
+        if index >= self._size:
+            self._size = index + 1
+        self._present[index] = True
+        self._indexes = None
+        self.set(index, *values)
+
+    def remove(self, index: int):
+        if index < self._size:
+            self._present[index] = False
+            for name, column in self._columns.items():
+                column[index] = self._defaults[name]
+            self._indexes = None
+
+    def set(self, index: int, *values):
+        """Set `values` of the item at `index`, given in the order columns were declared."""
+
+        for column, value in zip(self._columns.values(), values):
+            column[index] = value
+
+    def clear(self):
+        for name, values in self._columns.items():
+            self._columns[name] = values[:0]
+        self._present = self._present[:0]
+        self._size = 0
+        self._indexes = None
+
+    def indexes(self) -> np.ndarray:
+        """Return the sorted indexes of items in the store."""
+
+        if self._indexes is None:
+            self._indexes = np.flatnonzero(self._present[:self._size])
+        return self._indexes
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only view of column `name` indexed by item index. Rows without an item hold the default
+        value."""
+
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def values(self, name: str) -> np.ndarray:
+        """Return values of column `name` for items in the store, sorted by index."""
+
+        indexes = self.indexes()
+        if len(indexes) == self._size:
+            return self.column(name)
+        return self._columns[name][indexes]
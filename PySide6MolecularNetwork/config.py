@@ -1,2 +1,3 @@
 class Config:
     Radius = 30
+    MinDepictionSize = 16
@@ -1,18 +1,31 @@
 from .style import NetworkStyle
+from .graphicsitem import EdgesLayer
 
 from PySide6.QtGui import QPainterPath, QPen
 from PySide6.QtWidgets import QGraphicsItem, QGraphicsPathItem, QStyle
 from PySide6.QtCore import Qt, QPointF, QLineF, QRectF, qFuzzyCompare
 
+# itemChange is called for each edge when selecting or hiding many of them, looking up enum members on the class
+# each time is costly
+_ITEM_SELECTED_CHANGE = QGraphicsItem.ItemSelectedChange
+_ITEM_SELECTED_HAS_CHANGED = QGraphicsItem.ItemSelectedHasChanged
+_ITEM_PARENT_CHANGE = QGraphicsItem.ItemParentChange
+_ITEM_PARENT_HAS_CHANGED = QGraphicsItem.ItemParentHasChanged
+_ITEM_SCENE_CHANGE = QGraphicsItem.ItemSceneChange
+_ITEM_VISIBLE_HAS_CHANGED = QGraphicsItem.ItemVisibleHasChanged
+
 class Edge(QGraphicsPathItem):
     Type = QGraphicsItem.UserType + 2
 
+    __slots__ = ('id', 'source_point', 'dest_point', '_end_points', '_source', '_dest')
+
     def __init__(self, index, source_node, dest_node, width=1.):
         super().__init__()
 
         self.id = index
         self.source_point = QPointF()
         self.dest_point = QPointF()
+        self._end_points = None
 
         self._source = source_node
         self._dest = dest_node
@@ -54,6 +67,7 @@ class Edge(QGraphicsPathItem):
         new_pen = QPen(pen)
         new_pen.setWidthF(self.pen().widthF())
         super().setPen(new_pen)
+        self._invalidateLayer()
 
     def width(self):
         return self.pen().widthF()
@@ -65,6 +79,10 @@ class Edge(QGraphicsPathItem):
         else:
             pen.setWidth(1)
         super().setPen(pen)
+        self._invalidateLayer()
+        scene = self.scene()
+        if scene is not None:
+            scene.updateEdgeState(self)
         
     def isSelfLoop(self) -> bool:
         return self._source == self._dest and self._source is not None
@@ -77,34 +95,59 @@ class Edge(QGraphicsPathItem):
                       self.mapFromItem(self._dest, 0., 0.))
         length = line.length()
 
-        self.prepareGeometryChange()
-
         min_len = self._source.radius() + self._dest.radius() + self._source.pen().widthF() + self._dest.pen().widthF()
         if length > min_len:
             offset = QPointF((line.dx() * (self._source.radius()/2 + self._source.pen().widthF() + 1)) / length,
                              (line.dy() * (self._source.radius()/2 + self._source.pen().widthF() + 1)) / length)
-            self.source_point = line.p1() + offset
+            source_point = line.p1() + offset
             offset = QPointF((line.dx() * (self._dest.radius()/2 + self._dest.pen().widthF() + 1)) / length,
                              (line.dy() * (self._dest.radius()/2 + self._dest.pen().widthF() + 1)) / length)
-            self.dest_point = line.p2() - offset
+            dest_point = line.p2() - offset
         else:
-            self.source_point = self.dest_point = line.p1()
+            source_point = dest_point = line.p1()
+
+        self._setEndPoints(source_point.x(), source_point.y(), dest_point.x(), dest_point.y(), force=True)
+        self._invalidateSceneIndex()
+
+    def setEndPoints(self, source_point: QPointF, dest_point: QPointF):
+        self._setEndPoints(source_point.x(), source_point.y(), dest_point.x(), dest_point.y())
+        self._invalidateSceneIndex()
+
+    def _invalidateSceneIndex(self):
+        # Edges adjusted by the scene in bulk invalidate its index only once
+        scene = self.scene()
+        if scene is not None:
+            scene.invalidateEdgesIndex()
+
+    def _setEndPoints(self, sx: float, sy: float, dx: float, dy: float, force: bool = False):
+        # Self-loops also depend on the radius of their node, always rebuild them
+        end_points = (sx, sy, dx, dy)
+        if not force and end_points == self._end_points and self._source != self._dest:
+            return
+        self._end_points = end_points
+
+        self.prepareGeometryChange()
+
+        self.source_point = QPointF(sx, sy)
+        self.dest_point = QPointF(dx, dy)
 
         path = QPainterPath()
         if self._source == self._dest:  # Draw self-loops
             radius = self._source.radius()
-            path.moveTo(self.source_point.x() - radius - 2 * self._source.pen().widthF(),
-                        self.source_point.y())
-            path.cubicTo(QPointF(self.source_point.x() - 4 * radius,
-                                 self.source_point.y()),
-                         QPointF(self.source_point.x(),
-                                 self.source_point.y() - 4 * radius),
-                         QPointF(self.dest_point.x(),
-                                 self.dest_point.y() - radius - 2 * self._source.pen().widthF()))
+            path.moveTo(sx - radius - 2 * self._source.pen().widthF(), sy)
+            path.cubicTo(QPointF(sx - 4 * radius, sy),
+                         QPointF(sx, sy - 4 * radius),
+                         QPointF(dx, dy - radius - 2 * self._source.pen().widthF()))
         else:
             path.moveTo(self.source_point)
             path.lineTo(self.dest_point)
         self.setPath(path)
+        self._invalidateLayer()
+
+    def _invalidateLayer(self):
+        layer = self.parentItem()
+        if isinstance(layer, EdgesLayer):
+            layer.invalidate()
 
     # noinspection PyUnusedLocal
     def updateStyle(self, style: NetworkStyle, old: NetworkStyle = None):
@@ -112,9 +155,29 @@ class Edge(QGraphicsPathItem):
         self.update()
 
     def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemSelectedChange:
+        if change == _ITEM_SELECTED_CHANGE:
             self.setZValue(5 if value else 0)  # Bring item to front
             self.setCacheMode(self.cacheMode())  # Force redraw
+        elif change == _ITEM_SCENE_CHANGE:
+            # Edge is removed from the scene or moved to another one, only network scenes keep registries
+            unregister = getattr(self.scene(), '_unregisterEdge', None)
+            if unregister is not None and value is not self.scene():
+                unregister(self)
+        elif change == _ITEM_PARENT_CHANGE:
+            # The layer the edge leaves has to draw its batches again
+            self._invalidateLayer()
+        elif change == _ITEM_SELECTED_HAS_CHANGED or change == _ITEM_PARENT_HAS_CHANGED:
+            # Selected edges are not drawn by the edges layer, edges outside of a layer paint themselves
+            layer = self.parentItem()
+            if isinstance(layer, EdgesLayer):
+                layer.updateEdge(self)
+            elif change == _ITEM_PARENT_HAS_CHANGED:
+                self.setFlag(QGraphicsItem.ItemHasNoContents, False)
+            scene = self.scene()
+            if change == _ITEM_SELECTED_HAS_CHANGED and scene is not None:
+                scene.updateItemSelection(self)
+        elif change == _ITEM_VISIBLE_HAS_CHANGED:
+            self._invalidateLayer()
         return super().itemChange(change, value)
             
     def boundingRect(self):
@@ -1,4 +1,7 @@
-from PySide6.QtCore import QRectF
+import numpy as np
+
+from PySide6.QtCore import QRectF, QLineF
+from PySide6.QtGui import QPen, QPainterPath
 from PySide6.QtWidgets import QGraphicsItem
 
 class GraphicsItemLayer(QGraphicsItem):
@@ -7,4 +10,108 @@ class GraphicsItemLayer(QGraphicsItem):
         return QRectF(0, 0, 0, 0)
 
     def paint(self, painter, options, widget):
-        pass
\ No newline at end of file
+        pass
+
+
+class EdgesLayer(GraphicsItemLayer):
+    """Layer holding the edges of a scene.
+
+    In batch rendering mode, unselected straight edges do not paint themselves: the layer draws all of them
+    at once, with one `drawLines` call per pen. Edges are still individual items that can be picked and
+    selected."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self._batch_rendering = False
+        self._dirty = True
+        self._rect = QRectF()
+        self._batches = []
+
+    def batchRendering(self) -> bool:
+        return self._batch_rendering
+
+    def setBatchRendering(self, enabled: bool = True):
+        if enabled == self._batch_rendering:
+            return
+
+        self.prepareGeometryChange()
+        self._batch_rendering = enabled
+        self._dirty = True
+        self._batches = []
+        for edge in self.childItems():
+            self.updateEdge(edge)
+
+    def updateEdge(self, edge):
+        """Update the flags of `edge` to let it paint itself only if it is not drawn by the layer."""
+
+        batched = (self._batch_rendering and edge.parentItem() is self
+                   and not edge.isSelected() and not edge.isSelfLoop())
+        edge.setFlag(QGraphicsItem.ItemHasNoContents, batched)
+        self.invalidate()
+
+    def invalidate(self):
+        """Mark batches to be rebuilt before next paint."""
+
+        if self._batch_rendering and not self._dirty:
+            self.prepareGeometryChange()
+            self._dirty = True
+
+    def _updateBatches(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+
+        lines = {}
+        pens = {}
+        for edge in self.childItems():
+            if not edge.flags() & QGraphicsItem.ItemHasNoContents or not edge.isVisible():
+                continue
+
+            line = QLineF(edge.source_point, edge.dest_point)
+            if line.isNull():
+                continue
+
+            pen = edge.pen()
+            key = (pen.color().rgba(), pen.widthF(), pen.style())
+            if key not in pens:
+                pens[key] = QPen(pen)
+                lines[key] = []
+            lines[key].append(line)
+
+        self._batches = [(pens[key], lines[key]) for key in pens]
+
+        if self._batches:
+            points = np.array([(line.x1(), line.y1(), line.x2(), line.y2())
+                               for _, batch in self._batches for line in batch]).reshape(-1, 2)
+            margin = max(pen.widthF() for pen, _ in self._batches) / 2
+            x_min, y_min = points.min(axis=0) - margin
+            x_max, y_max = points.max(axis=0) + margin
+            self._rect = QRectF(x_min, y_min, x_max - x_min, y_max - y_min)
+        else:
+            self._rect = QRectF()
+
+    def boundingRect(self):
+        if not self._batch_rendering:
+            return super().boundingRect()
+
+        self._updateBatches()
+        return self._rect
+
+    def shape(self):
+        # The layer covers all batched edges but must not be picked in place of the background, edges are picked
+        # as individual items
+        return QPainterPath()
+
+    def paint(self, painter, options, widget):
+        if not self._batch_rendering:
+            return
+
+        # Same level of detail as the one used by edges to skip painting
+        if options.levelOfDetailFromTransform(painter.worldTransform()) < 0.1:
+            return
+
+        self._updateBatches()
+        for pen, lines in self._batches:
+            painter.setPen(pen)
+            painter.drawLines(lines)
@@ -0,0 +1,75 @@
+from typing import List
+
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QFont, QFontMetrics
+
+
+class LabelMetrics:
+    """Rectangles of node labels memoised by font and text, shared by all scenes.
+
+    One QFontMetrics is kept per font. Label rectangles are stored per font and text, so that nodes sharing a font
+    and a label also share the same rectangle, which must not be modified. Once the capacity is reached for a font,
+    oldest texts are evicted first."""
+
+    _fonts = {}  # font -> (QFontMetrics, height, {text: QRectF})
+    _capacity = 65536
+
+    @staticmethod
+    def capacity() -> int:
+        """Return the maximum number of texts stored for each font."""
+
+        return LabelMetrics._capacity
+
+    @staticmethod
+    def setCapacity(n: int):
+        LabelMetrics._capacity = max(n, 1)
+        for _, _, rects in LabelMetrics._fonts.values():
+            LabelMetrics._trim(rects)
+
+    @staticmethod
+    def clear():
+        LabelMetrics._fonts.clear()
+
+    @staticmethod
+    def _trim(rects: dict):
+        # Dicts keep insertion order, the first keys are the oldest ones
+        while len(rects) > LabelMetrics._capacity:
+            del rects[next(iter(rects))]
+
+    @staticmethod
+    def _entry(font: QFont):
+        entry = LabelMetrics._fonts.get(font)
+        if entry is None:
+            # Fonts are mutable, keep a copy as key
+            font = QFont(font)
+            metrics = QFontMetrics(font)
+            entry = LabelMetrics._fonts[font] = (metrics, metrics.height(), {})
+        return entry
+
+    @staticmethod
+    def labelRect(font: QFont, text: str) -> QRectF:
+        """Return the rectangle of `text` drawn with `font`, centered on the origin."""
+
+        metrics, height, rects = LabelMetrics._entry(font)
+        rect = rects.get(text)
+        if rect is None:
+            width = metrics.horizontalAdvance(text)
+            rect = rects[text] = QRectF(-width/2, -height/2, width, height)
+            if len(rects) > LabelMetrics._capacity:
+                LabelMetrics._trim(rects)
+        return rect
+
+    @staticmethod
+    def labelRects(font: QFont, texts: List[str]) -> List[QRectF]:
+        """Return the rectangles of `texts` drawn with `font`, looking the font up only once."""
+
+        metrics, height, rects = LabelMetrics._entry(font)
+        result = []
+        for text in texts:
+            rect = rects.get(text)
+            if rect is None:
+                width = metrics.horizontalAdvance(text)
+                rect = rects[text] = QRectF(-width/2, -height/2, width, height)
+            result.append(rect)
+        LabelMetrics._trim(rects)
+        return result
@@ -1,40 +1,84 @@
 from typing import Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import binascii
+import hashlib
+import itertools
+import os
+import threading
+import time
+import weakref
 
-from rdkit.Chem import Mol, MolFromSmiles, rdDepictor
+import numpy as np
+
+import rdkit
+from rdkit.Chem import Mol, MolFromSmiles, MolToSmiles, rdDepictor
 from rdkit.Chem.Draw import rdMolDraw2D
 from rdkit.Chem.inchi import INCHI_AVAILABLE
 if INCHI_AVAILABLE:
     from rdkit.Chem.inchi import MolFromInchi
     
-from PySide6.QtCore import QSize, Qt
-from PySide6.QtGui import QPainter, QPixmap
+from PySide6.QtCore import QObject, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QPainter, QPixmap
 from PySide6.QtSvg import QSvgRenderer
 
+# Types of depictions, same values as NetworkScene.Pixmaps* constants
+DEPICTION_SMILES = 0
+DEPICTION_INCHI = 1
+DEPICTION_BASE64 = 2
+DEPICTION_SVG = 3
+DEPICTION_AUTO = -1
 
-def SvgToPixmap(svg_data: Union[str, bytes], size: QSize):
-    if size.isNull():
-        return QPixmap()
-    
+# Status of depictions
+DEPICTION_OK = 0
+DEPICTION_EMPTY = 1
+DEPICTION_PARSE_ERROR = 2
+DEPICTION_ERROR = 3
+
+# Options used to draw molecules, part of the keys of cached depictions
+DRAWING_OPTIONS = "clearBackground=0"
+
+
+def _svgRenderer(svg_data: Union[str, bytes]):
     svg_renderer = QSvgRenderer()
     if isinstance(svg_data, bytes):
         svg_renderer.load(svg_data)
     else:
         svg_renderer.load(svg_data.encode('utf-8'))
-    pixmap = QPixmap(size)
+    return svg_renderer
+
+
+def SvgToImage(svg_data: Union[str, bytes], size: QSize):
+    if size.isNull():
+        return QImage()
+
+    return _renderSvg(_svgRenderer(svg_data), size)
+
+
+def _renderSvg(svg_renderer: QSvgRenderer, size: QSize):
+    image = QImage(size, QImage.Format_ARGB32_Premultiplied)
     painter = QPainter()
 
-    pixmap.fill(Qt.transparent)
-    painter.begin(pixmap)
+    image.fill(Qt.transparent)
+    painter.begin(image)
     svg_renderer.render(painter)
     painter.end()
 
-    return pixmap
+    return image
 
 
-def MolToPixmap(mol: Mol, size: QSize):
-    if size.isNull() or mol is None:
+def SvgToPixmap(svg_data: Union[str, bytes], size: QSize):
+    if size.isNull():
         return QPixmap()
     
+    return QPixmap.fromImage(_renderSvg(_svgRenderer(svg_data), size))
+
+
+def MolToSvg(mol: Mol, size: QSize):
+    if size.isNull() or mol is None:
+        return ''
+    
     if not mol.GetNumConformers():
         rdDepictor.Compute2DCoords(mol)
 
@@ -42,8 +86,14 @@ def MolToPixmap(mol: Mol, size: QSize):
     svg_drawer.drawOptions().clearBackground = False
     svg_drawer.DrawMolecule(mol)
     svg_drawer.FinishDrawing()
-    drawing_text = svg_drawer.GetDrawingText()
-    return SvgToPixmap(drawing_text, size)
+    return svg_drawer.GetDrawingText()
+
+
+def MolToPixmap(mol: Mol, size: QSize):
+    if size.isNull() or mol is None:
+        return QPixmap()
+
+    return SvgToPixmap(MolToSvg(mol, size), size)
 
 
 def SmilesToPixmap(smiles: str, size: QSize):
@@ -58,3 +108,513 @@ def InchiToPixmap(inchi: str, size: QSize):
         return QPixmap()
     
     return MolToPixmap(MolFromInchi(inchi), size)
+
+
+def depictionType(text: str, type: int = DEPICTION_AUTO) -> int:
+    """Return the type of depiction held by `text`, guessed from its content if `type` is DEPICTION_AUTO."""
+
+    if type != DEPICTION_AUTO:
+        return type
+    if text.startswith("b64="):
+        return DEPICTION_BASE64
+    if text.startswith("<?xml") or text.startswith("<svg"):
+        return DEPICTION_SVG
+    if text.startswith("InChI="):
+        return DEPICTION_INCHI
+    return DEPICTION_SMILES
+
+
+def _prefixesTypes(prefixes: np.ndarray) -> np.ndarray:
+    types = np.full(len(prefixes), DEPICTION_SMILES, dtype=np.int8)
+    types[np.char.startswith(prefixes, "InChI=")] = DEPICTION_INCHI
+    types[np.char.startswith(prefixes, "<?xml") | np.char.startswith(prefixes, "<svg")] = DEPICTION_SVG
+    types[np.char.startswith(prefixes, "b64=")] = DEPICTION_BASE64
+    return types
+
+
+def DepictionTypes(texts, type: int = DEPICTION_AUTO, sample_size: int = 64) -> np.ndarray:
+    """Return the type of each depiction in `texts`, guessed from their content if `type` is DEPICTION_AUTO.
+
+    Columns usually hold a single type of depiction: the type of a sample of rows is checked first and, if they all
+    agree, it only remains to check that all rows have the expected prefix."""
+
+    if type != DEPICTION_AUTO:
+        return np.full(len(texts), type, dtype=np.int8)
+
+    if not texts:
+        return np.empty(0, dtype=np.int8)
+
+    # Only the first characters are needed, and copying full SVG strings to an array would be costly
+    prefixes = np.array([text[:6] for text in texts])
+    sample = prefixes[np.linspace(0, len(prefixes) - 1, min(sample_size, len(prefixes)), dtype=np.intp)]
+    sample_types = np.unique(_prefixesTypes(sample))
+    if len(sample_types) == 1:
+        column_type = sample_types[0]
+        if column_type == DEPICTION_INCHI:
+            matches = np.char.startswith(prefixes, "InChI=")
+        elif column_type == DEPICTION_BASE64:
+            matches = np.char.startswith(prefixes, "b64=")
+        else:
+            matches = None
+        if matches is not None and matches.all():
+            return np.full(len(texts), column_type, dtype=np.int8)
+
+    return _prefixesTypes(prefixes)
+
+
+def ParseStructure(text: str, type: int = DEPICTION_AUTO):
+    """Parse a SMILES or InChI string. Return a tuple with the molecule (None if parsing failed) and its status."""
+
+    if not text:
+        return None, DEPICTION_EMPTY
+
+    type = depictionType(text, type)
+    if type == DEPICTION_SMILES:
+        mol = MolFromSmiles(text)
+    elif type == DEPICTION_INCHI and INCHI_AVAILABLE:
+        mol = MolFromInchi(text)
+    else:
+        mol = None
+    return mol, DEPICTION_OK if mol is not None else DEPICTION_PARSE_ERROR
+
+
+def _parseChunk(texts, type):
+    mols = []
+    status = np.empty(len(texts), dtype=np.uint8)
+    timings = np.empty(len(texts), dtype=np.float64)
+    for i, text in enumerate(texts):
+        start = time.perf_counter()
+        mol, status[i] = ParseStructure(text, type)
+        timings[i] = time.perf_counter() - start
+        mols.append(mol)
+    return mols, status, timings
+
+
+def ParseStructures(texts, type: int = DEPICTION_AUTO, chunk_size: int = 1000, executor=None):
+    """Parse a list of SMILES or InChI strings in chunks, in parallel.
+
+    Return a tuple with the list of molecules (None for rows that failed), an array with the status of each row
+    and an array with the time spent parsing each row, in seconds. Chunks are processed by `executor`, a thread pool
+    by default. A `concurrent.futures.ProcessPoolExecutor` can be given as molecules can be pickled."""
+
+    texts = list(texts)
+    chunks = [texts[i:i+chunk_size] for i in range(0, len(texts), chunk_size)]
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor()
+    try:
+        results = list(executor.map(_parseChunk, chunks, itertools.repeat(type)))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    mols = [mol for chunk_mols, _, _ in results for mol in chunk_mols]
+    status = np.concatenate([chunk_status for _, chunk_status, _ in results] + [np.empty(0, dtype=np.uint8)])
+    timings = np.concatenate([chunk_timings for _, _, chunk_timings in results] + [np.empty(0)])
+    return mols, status, timings
+
+
+def _depict(text: str, type: int, size: QSize, mol: Mol = None):
+    # Render the depiction held by `text` and tell what went wrong if it failed. SMILES and InChI are only parsed
+    # if the molecule is not given.
+    if size.isNull() or not text:
+        return QImage(), DEPICTION_EMPTY
+
+    type = depictionType(text, type)
+    if type == DEPICTION_BASE64:
+        try:
+            data = base64.b64decode(text[4:] if text.startswith("b64=") else text, validate=True)
+        except (binascii.Error, ValueError):
+            return QImage(), DEPICTION_PARSE_ERROR
+        image = QImage()
+        if not image.loadFromData(data):
+            return QImage(), DEPICTION_ERROR
+        return image, DEPICTION_OK
+    elif type == DEPICTION_SVG:
+        svg_renderer = _svgRenderer(text)
+        if not svg_renderer.isValid():
+            return QImage(), DEPICTION_PARSE_ERROR
+        return _renderSvg(svg_renderer, size), DEPICTION_OK
+
+    if mol is None:
+        mol, status = ParseStructure(text, type)
+        if mol is None:
+            return QImage(), status
+
+    try:
+        image = SvgToImage(MolToSvg(mol, size), size)
+    except (RuntimeError, ValueError):
+        return QImage(), DEPICTION_ERROR
+    return image, DEPICTION_OK if not image.isNull() else DEPICTION_ERROR
+
+
+def DepictionToImage(text: str, type: int, size: QSize):
+    """Render the depiction held by `text` to a QImage. Unlike QPixmap, QImage can be used outside the GUI thread."""
+
+    return _depict(text, type, size)[0]
+
+
+def _depictChunk(texts, mols, type, size):
+    images = []
+    status = np.empty(len(texts), dtype=np.uint8)
+    timings = np.empty(len(texts), dtype=np.float64)
+    for i, text in enumerate(texts):
+        start = time.perf_counter()
+        if mols is not None and mols[i] is None and text \
+                and depictionType(text, type) in (DEPICTION_SMILES, DEPICTION_INCHI):
+            # Parsing has already failed, do not try again
+            image, status[i] = QImage(), DEPICTION_PARSE_ERROR
+        else:
+            image, status[i] = DepictionCache.depict(text, type, size, mols[i] if mols is not None else None)
+        timings[i] = time.perf_counter() - start
+        images.append(image)
+    return images, status, timings
+
+
+def DepictStructures(texts, type: int = DEPICTION_AUTO, size: QSize = QSize(300, 300), chunk_size: int = 100,
+                     max_workers: int = None, mols=None):
+    """Render a list of depictions in chunks, in a pool of threads, using the depiction cache.
+
+    `mols` may hold the molecules returned by ParseStructures for `texts`, SMILES and InChI are then drawn from these
+    molecules instead of being parsed again, and rows whose molecule is None are reported as parse errors.
+    Return a tuple with the list of images (null for rows that failed), an array with the status of each row and
+    an array with the time spent on each row, in seconds."""
+
+    texts = list(texts)
+    if mols is not None and len(mols) != len(texts):
+        raise ValueError("mols must have one molecule per text")
+    chunks = [texts[i:i+chunk_size] for i in range(0, len(texts), chunk_size)]
+    mols_chunks = ([mols[i:i+chunk_size] for i in range(0, len(texts), chunk_size)] if mols is not None
+                   else itertools.repeat(None))
+    with ThreadPoolExecutor(max_workers) as executor:
+        results = list(executor.map(_depictChunk, chunks, mols_chunks, itertools.repeat(type),
+                                    itertools.repeat(QSize(size))))
+
+    images = [image for chunk_images, _, _ in results for image in chunk_images]
+    status = np.concatenate([chunk_status for _, chunk_status, _ in results] + [np.empty(0, dtype=np.uint8)])
+    timings = np.concatenate([chunk_timings for _, _, chunk_timings in results] + [np.empty(0)])
+    return images, status, timings
+
+
+class DepictionCache:
+    """Cache of rendered depictions shared by all scenes.
+
+    Depictions are keyed by canonical structure, size and drawing options. Images are kept in memory until the
+    cache limit is reached, least recently used first being discarded. If a directory is set, they are also
+    stored there as PNG files, so that depictions are kept between sessions. Depictions that failed are
+    remembered with their status, so that they are not parsed again. All methods are thread-safe."""
+
+    _lock = threading.RLock()
+    _images = OrderedDict()
+    _failures = OrderedDict()  # key -> status
+    _failures_capacity = 65536
+    _structures = OrderedDict()  # SMILES -> canonical SMILES
+    _structures_capacity = 65536
+    _cost = 0
+    _cache_limit = 102400
+    _directory = ""
+
+    @staticmethod
+    def cacheLimit() -> int:
+        """Return the cache limit, in kilobytes."""
+
+        return DepictionCache._cache_limit
+
+    @staticmethod
+    def setCacheLimit(n: int):
+        with DepictionCache._lock:
+            DepictionCache._cache_limit = n
+            DepictionCache._trim()
+
+    @staticmethod
+    def directory() -> str:
+        return DepictionCache._directory
+
+    @staticmethod
+    def setDirectory(path: str):
+        """Set the directory where depictions are stored. Depictions are not stored on disk if `path` is empty."""
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+        DepictionCache._directory = path if path else ""
+
+    @staticmethod
+    def clear():
+        """Remove all depictions and failures from memory. Depictions stored on disk are kept."""
+
+        with DepictionCache._lock:
+            DepictionCache._images.clear()
+            DepictionCache._failures.clear()
+            DepictionCache._cost = 0
+
+    @staticmethod
+    def key(text: str, type: int, size: QSize, mol: Mol = None) -> str:
+        """Return the key of the depiction held by `text`. If `mol` is given, it is the molecule parsed from `text`
+        and the canonical structure is computed from it."""
+
+        type = depictionType(text, type)
+        structure = DepictionCache._cachedStructure(text, type)
+        if structure is None:
+            structure = DepictionCache._insertStructure(text, mol if mol is not None else MolFromSmiles(text))
+        return DepictionCache._key(type, size, structure)
+
+    @staticmethod
+    def _key(type: int, size: QSize, structure: str) -> str:
+        key = "|".join((rdkit.__version__, DRAWING_OPTIONS, str(type), f"{size.width()}x{size.height()}", structure))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    def _cachedStructure(text: str, type: int) -> Union[str, None]:
+        # Different SMILES of the same molecule share the same depiction. Return None if the canonical SMILES is not
+        # known yet and has to be computed from the parsed molecule.
+        if type != DEPICTION_SMILES:
+            return text
+        with DepictionCache._lock:
+            structure = DepictionCache._structures.get(text)
+            if structure is not None:
+                DepictionCache._structures.move_to_end(text)
+            return structure
+
+    @staticmethod
+    def _hasStructure(text: str, type: int) -> bool:
+        # Whether the key of `text` is computed without parsing it
+        return DepictionCache._cachedStructure(text, depictionType(text, type)) is not None
+
+    @staticmethod
+    def _insertStructure(text: str, mol: Mol) -> str:
+        structure = MolToSmiles(mol) if mol is not None else text
+        with DepictionCache._lock:
+            DepictionCache._structures[text] = structure
+            if len(DepictionCache._structures) > DepictionCache._structures_capacity:
+                DepictionCache._structures.popitem(last=False)
+        return structure
+
+    @staticmethod
+    def image(text: str, type: int, size: QSize) -> QImage:
+        """Return the depiction held by `text`, rendered only if it is not found in cache."""
+
+        return DepictionCache.depict(text, type, size)[0]
+
+    @staticmethod
+    def depict(text: str, type: int, size: QSize, mol: Mol = None):
+        """Same as `image` but return a tuple with the image and the status of the depiction. If `mol` is given, it
+        is the molecule parsed from `text` and it is drawn instead of parsing `text` again."""
+
+        if size.isNull() or not text:
+            return QImage(), DEPICTION_EMPTY
+
+        # SMILES are parsed at most once: the molecule gives the canonical structure of the key and is drawn if
+        # the depiction is not found in cache
+        type = depictionType(text, type)
+        status = DEPICTION_OK
+        structure = DepictionCache._cachedStructure(text, type)
+        if structure is None:
+            if mol is None:
+                mol, status = ParseStructure(text, type)
+            structure = DepictionCache._insertStructure(text, mol)
+        key = DepictionCache._key(type, size, structure)
+        with DepictionCache._lock:
+            image = DepictionCache._images.get(key)
+            if image is not None:
+                DepictionCache._images.move_to_end(key)
+                return image, DEPICTION_OK
+            failure = DepictionCache._failures.get(key)
+            if failure is not None:
+                return QImage(), failure
+
+        path = os.path.join(DepictionCache._directory, key + ".png") if DepictionCache._directory else None
+        image = QImage(path) if path is not None and os.path.exists(path) else QImage()
+        if image.isNull() and status == DEPICTION_OK:
+            image, status = _depict(text, type, size, mol)
+            if path is not None and not image.isNull():
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                if image.save(temp_path, "PNG"):
+                    os.replace(temp_path, path)
+
+        if not image.isNull():
+            DepictionCache._insert(key, image)
+        else:
+            DepictionCache._insertFailure(key, status)
+        return image, status
+
+    @staticmethod
+    def pixmap(text: str, type: int, size: QSize) -> QPixmap:
+        """Same as `image` but return a QPixmap. This can only be used in the GUI thread."""
+
+        image = DepictionCache.image(text, type, size)
+        return QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+
+    @staticmethod
+    def _insert(key: str, image: QImage):
+        with DepictionCache._lock:
+            if key in DepictionCache._images:
+                DepictionCache._cost -= DepictionCache._images.pop(key).sizeInBytes() // 1024
+            DepictionCache._images[key] = image
+            DepictionCache._cost += image.sizeInBytes() // 1024
+            DepictionCache._trim()
+
+    @staticmethod
+    def _insertFailure(key: str, status: int):
+        with DepictionCache._lock:
+            DepictionCache._failures[key] = status
+            if len(DepictionCache._failures) > DepictionCache._failures_capacity:
+                DepictionCache._failures.popitem(last=False)
+
+    @staticmethod
+    def _trim():
+        while DepictionCache._cost > DepictionCache._cache_limit and DepictionCache._images:
+            _, image = DepictionCache._images.popitem(last=False)
+            DepictionCache._cost -= image.sizeInBytes() // 1024
+
+
+class DepictionService(QObject):
+    """Render depictions of molecules in a pool of threads and give them to the nodes of a scene.
+
+    Structures are parsed, drawn and rasterized to QImage in worker threads. Images are sent back to the GUI thread
+    through a queued signal, where they are converted to pixmaps and set on nodes as soon as they are ready.
+    The status of each depiction and the time it took are available from `status` and `timings`."""
+
+    progress = Signal(int, int)
+    finished = Signal()
+    _imageReady = Signal(int, int, int, float, QImage)
+
+    def __init__(self, parent=None, max_workers: int = None):
+        super().__init__(parent)
+
+        self._max_workers = max_workers
+        self._executor = None
+        self._futures = []
+        self._generation = 0
+        self._done = 0
+        self._total = 0
+        self._scene = None
+        self._model = None
+        self._indexes = np.empty(0, dtype=np.int32)
+        self._status = np.empty(0, dtype=np.uint8)
+        self._timings = np.empty(0)
+
+        self._imageReady.connect(self._onImageReady, Qt.QueuedConnection)
+
+    def isRunning(self) -> bool:
+        return self._done < self._total
+
+    def indexes(self) -> np.ndarray:
+        """Return the indexes of nodes submitted by last call to `depict` or `depictModel`."""
+
+        return self._indexes.copy()
+
+    def status(self) -> np.ndarray:
+        """Return the status of depictions of nodes returned by `indexes`. Depictions not done yet are marked as
+        DEPICTION_EMPTY."""
+
+        return self._status.copy()
+
+    def timings(self) -> np.ndarray:
+        """Return the time spent on depictions of nodes returned by `indexes`, in seconds."""
+
+        return self._timings.copy()
+
+    def depictModel(self, scene, model, column_id: int, role=Qt.DisplayRole, type: int = DEPICTION_SMILES,
+                    size: QSize = QSize(300, 300)):
+        """Set pixmaps of `scene` nodes from structures in `model` without blocking the event loop.
+
+        Any running depiction is cancelled first, and depiction is cancelled if `model` changes before it has
+        finished. The service stops watching `model` once depiction has finished."""
+
+        items = []
+        for node in scene.nodes():
+            text = model.index(node.index(), column_id).data(role)
+            if text:
+                items.append((node.index(), text))
+
+        self.depict(scene, items, type, size)
+        if not self.isRunning():
+            return
+
+        # Results would not match the model anymore if it changes
+        self._model = weakref.ref(model)
+        for signal in self._modelSignals(model):
+            signal.connect(self.cancel)
+
+    def depict(self, scene, items, type: int = DEPICTION_SMILES, size: QSize = QSize(300, 300)):
+        """Set pixmaps of `scene` nodes from a list of (node index, structure) tuples without blocking the event
+        loop."""
+
+        self.cancel()
+        self._indexes = np.array([index for index, _ in items], dtype=np.int32)
+        self._status = np.full(len(items), DEPICTION_EMPTY, dtype=np.uint8)
+        self._timings = np.zeros(len(items))
+        if not items:
+            self.finished.emit()
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self._max_workers, thread_name_prefix="depiction")
+
+        self._scene = weakref.ref(scene)
+        self._done = 0
+        self._total = len(items)
+        generation = self._generation
+        self._futures = [self._executor.submit(self._depict, generation, position, text, type, QSize(size))
+                         for position, (_, text) in enumerate(items)]
+
+    def cancel(self):
+        """Cancel running depiction. Pixmaps that have already been set are kept."""
+
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self._done = self._total = 0
+        self._disconnectModel()
+
+    def _disconnectModel(self):
+        model = self._model() if self._model is not None else None
+        if model is not None:
+            for signal in self._modelSignals(model):
+                try:
+                    signal.disconnect(self.cancel)
+                except (RuntimeError, TypeError):
+                    pass
+        self._model = None
+
+    def shutdown(self):
+        """Cancel running depiction and stop worker threads."""
+
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def _modelSignals(model):
+        return (model.modelReset, model.layoutChanged, model.dataChanged, model.rowsInserted, model.rowsRemoved)
+
+    def _depict(self, generation, position, text, type, size):
+        # Runs in a worker thread
+        if generation != self._generation:
+            return
+        start = time.perf_counter()
+        image, status = DepictionCache.depict(text, type, size)
+        try:
+            self._imageReady.emit(generation, position, status, time.perf_counter() - start, image)
+        except RuntimeError:  # Service has been deleted
+            pass
+
+    def _onImageReady(self, generation, position, status, elapsed, image):
+        if generation != self._generation:
+            return
+
+        self._status[position] = status
+        self._timings[position] = elapsed
+        scene = self._scene() if self._scene is not None else None
+        node = scene.node(int(self._indexes[position])) if scene is not None else None
+        if node is not None and not image.isNull():
+            node.setPixmap(QPixmap.fromImage(image))
+
+        self._done += 1
+        self.progress.emit(self._done, self._total)
+        if self._done >= self._total:
+            self._futures = []
+            self._disconnectModel()
+            self.finished.emit()
@@ -1,13 +1,14 @@
 from .edge import Edge
 from .style import NetworkStyle
 from .config import Config
-from .mol_depiction import SmilesToPixmap, InchiToPixmap, SvgToPixmap
+from .mol_depiction import DepictionCache, DEPICTION_SMILES, DEPICTION_INCHI, DEPICTION_SVG, DEPICTION_AUTO
+from .label_metrics import LabelMetrics
 
 from typing import Set, Union
 from enum import Enum
 import base64
 
-from PySide6.QtGui import (QPen, QColor, QFont, QBrush, QFontMetrics, QPixmap,
+from PySide6.QtGui import (QPen, QColor, QFont, QBrush, QPixmap,
                          QPolygonF, QTransform, QPainterPath)
 from PySide6.QtWidgets import (QGraphicsItem, QGraphicsEllipseItem, QStyle,
                              QApplication)
@@ -40,6 +41,30 @@ class NodePolygon(Enum):
     Club = 20
 
 
+# itemChange is called several times for each node when selecting or moving many of them, looking up enum
+# members on the class each time is costly
+_ITEM_SCENE_POSITION_HAS_CHANGED = QGraphicsItem.ItemScenePositionHasChanged
+_ITEM_VISIBLE_HAS_CHANGED = QGraphicsItem.ItemVisibleHasChanged
+_ITEM_SELECTED_CHANGE = QGraphicsItem.ItemSelectedChange
+_ITEM_SELECTED_HAS_CHANGED = QGraphicsItem.ItemSelectedHasChanged
+_ITEM_SCENE_CHANGE = QGraphicsItem.ItemSceneChange
+
+# Defaults shared by all nodes until they are changed. Setters replace them and they are never modified in place,
+# so that a node with default state does not allocate its own objects. Qt value types are mutable, so getters
+# return copies.
+_NO_EDGES = frozenset()
+_NULL_PIXMAP = None  # QPixmap can't be created before the application, see _nullPixmap
+_NULL_SIZE = QSize()
+_EMPTY_POLYGON = QPolygonF()
+_NO_BRUSH = QBrush()
+_BLACK = QColor(Qt.black)
+_WHITE = QColor(Qt.white)
+
+# Shapes of nodes with a stock polygon only depend on their geometry, pen and label size, nodes with the same ones
+# share their shape instead of each uniting their polygon with their label
+_SHARED_SHAPES = {}
+_SHARED_SHAPES_LIMIT = 4096
+
 NODE_POLYGON_MAP = {
     NodePolygon.Square:        QPolygonF([QPointF(-50., 50.),    QPointF(50., 50.),
                                           QPointF(50., -50.),    QPointF(-50., -50.)]),
@@ -154,21 +179,38 @@ NODE_POLYGON_MAP = {
 }
 
 
+def _nullPixmap() -> QPixmap:
+    global _NULL_PIXMAP
+    if _NULL_PIXMAP is None:
+        _NULL_PIXMAP = QPixmap()
+    return _NULL_PIXMAP
+
+
 class Node(QGraphicsEllipseItem):
     Type = QGraphicsItem.UserType + 1
 
+    __slots__ = ('id', '_edges', '_pie', '_font', '_text_color', '_pixmap', '_depiction', '_depiction_size',
+                 '_stock_polygon', '_node_polygon', '_overlay_brush', '_shape', '_shape_key', '_pie_slices',
+                 '_label', '_label_rect')
+
     def __init__(self, index, label=None):
         super().__init__(-Config.Radius, -Config.Radius, 2 * Config.Radius, 2 * Config.Radius)
 
-        self._edges = set()
-        self._pie = []
+        self._edges = _NO_EDGES  # Replaced by a set when the first edge is added
+        self._pie = None
 
-        self._font = QApplication.font()
-        self._text_color = QColor()
-        self._pixmap = QPixmap()
+        self._font = None  # Application font
+        self._text_color = None  # Invalid color
+        self._pixmap = _nullPixmap()
+        self._depiction = None
+        self._depiction_size = _NULL_SIZE
         self._stock_polygon = NodePolygon.Circle
-        self._node_polygon = QPolygonF()
-        self._overlay_brush: QBrush = QBrush()
+        self._node_polygon = _EMPTY_POLYGON
+        self._overlay_brush: QBrush = _NO_BRUSH
+        self._shape = None
+        self._shape_key = None
+        self._pie_slices = None
+        self._label_rect = None
 
         self.id = index
         if label is None:
@@ -185,19 +227,23 @@ class Node(QGraphicsEllipseItem):
 
     def invalidateShape(self):
         # TODO: Can't find a good way to update shape
+        self._shape = None
         self.prepareGeometryChange()
         rect = self.rect()
         self.setRect(QRectF())
         self.setRect(rect)
         
     def updateLabelRect(self):
-        fm = QFontMetrics(self.font())
-        width = fm.horizontalAdvance(self.label())
-        height = fm.height()
-        # noinspection PyAttributeOutsideInit
-        self._label_rect = QRectF(-width/2, -height/2, width, height)
-
-        self.invalidateShape()
+        self._setLabelRect(LabelMetrics.labelRect(self.font(), self._label))
+
+    def _setLabelRect(self, rect: QRectF):
+        # Geometry is left untouched if the label keeps the same size, e.g. when the style is applied again, but the
+        # cached rendering of the node has to be repainted with the new text
+        previous, self._label_rect = self._label_rect, rect
+        if previous is None or rect != previous:
+            self.invalidateShape()
+        else:
+            self.update()
 
     def index(self) -> int:
         return self.id
@@ -209,16 +255,21 @@ class Node(QGraphicsEllipseItem):
         self.prepareGeometryChange()
         self.setRect(QRectF(-radius, -radius, 2 * radius, 2 * radius))
         self.scalePolygon()
+        scene = self.scene()
+        if scene is not None:
+            scene.invalidateNodesIndex()
+            scene.updateVisibleNodesBoundingRect(self)
+            scene.updateNodeState(self)
 
     def font(self) -> QFont:
-        return self._font
+        return self._font if self._font is not None else QApplication.font()
 
     def setFont(self, font: QFont):
         self._font = font
         self.updateLabelRect()
 
     def textColor(self) -> QColor:
-        return self._text_color
+        return QColor(self._text_color) if self._text_color is not None else QColor()
 
     def setTextColor(self, color: QColor):
         self._text_color = color
@@ -226,19 +277,22 @@ class Node(QGraphicsEllipseItem):
     # noinspection PyMethodOverriding
     def setBrush(self, brush: QBrush, autoTextColor: bool = True):
         super().setBrush(brush)
+        scene = self.scene()
+        if scene is not None:
+            scene.updateNodeState(self)
 
         if autoTextColor:
             # Calculate the perceptive luminance (aka luma) - human eye favors green color...
             # See https://stackoverflow.com/questions/1855884/determine-font-color-based-on-background-color
             color = QBrush(brush).color()
             if color.alpha() < 128:
-                self._text_color = QColor(Qt.black)
+                self._text_color = _BLACK
             else:
                 luma = (0.299 * color.red() + 0.587 * color.green() + 0.114 * color.blue()) / 255
-                self._text_color = QColor(Qt.black) if luma > 0.5 else QColor(Qt.white)
+                self._text_color = _BLACK if luma > 0.5 else _WHITE
 
     def overlayBrush(self) -> QBrush:
-        return self._overlay_brush
+        return QBrush(self._overlay_brush)
 
     def setOverlayBrush(self, brush: QBrush):
         self._overlay_brush = brush
@@ -251,71 +305,198 @@ class Node(QGraphicsEllipseItem):
         self._label = label
         self.updateLabelRect()
 
+    def _setLabel(self, label: str, rect: QRectF):
+        # Used by the scene to set many labels at once, `rect` is the rect of `label` in the font of the node
+        # noinspection PyAttributeOutsideInit
+        self._label = label
+        self._setLabelRect(rect)
+
     def pie(self) -> list:
-        return self._pie
+        return self._pie if self._pie is not None else []
 
     def setPie(self, values: list):
         if values is not None:
             sum_ = sum(values)
             values = [v / sum_ for v in values] if sum_ > 0 else []
-            self._pie = values
+            self._setPie(values)
         else:
-            self._pie = []
+            self._setPie([])
+
+    def _setPie(self, values: list):
+        # Values are expected to be already normalized
+        self._pie = values or None
+        self._pie_slices = None
         self.update()
 
     def pixmap(self):
-        return self._pixmap
+        return QPixmap(self._pixmap)
 
     def setPixmap(self, pixmap: QPixmap):
+        self._releaseSharedPixmap()
         self._pixmap = pixmap
+        self._depiction = None
+        self._depiction_size = _NULL_SIZE
+
+    def depiction(self) -> str:
+        return self._depiction[0] if self._depiction is not None else ""
+
+    def setDepiction(self, text: str, type: int = DEPICTION_AUTO, size: QSize = QSize(300, 300)):
+        """Keep `text` to generate the pixmap of the node the first time it needs to be painted.
+
+        The pixmap is rendered at the lowest resolution needed by the current level of detail, up to `size`, and
+        rendered again at a higher resolution when zooming in."""
+
+        self._releaseSharedPixmap()
+        self._pixmap = _nullPixmap()
+        self._depiction = (text, type, QSize(size)) if text else None
+        self._depiction_size = _NULL_SIZE
+        self.update()
+
+    def hasPendingDepiction(self) -> bool:
+        return self._depiction is not None and self._pixmap.isNull()
+
+    def depictionSize(self, lod: float) -> QSize:
+        """Return the size needed to paint the depiction at level of detail `lod`: the maximum size given to
+        `setDepiction` divided by a power of two."""
+
+        if self._depiction is None:
+            return QSize()
+
+        size = self._depiction[2]
+        rect = self.boundingRect()
+        needed = max(rect.width() * lod, rect.height() * lod, Config.MinDepictionSize)
+        width, height = size.width(), size.height()
+        while max(width, height) // 2 >= needed:
+            width //= 2
+            height //= 2
+        return QSize(width, height)
+
+    def renderDepiction(self, size: QSize = QSize()):
+        """Generate the pixmap from the depiction set with `setDepiction`, at `size` (maximum size by default), if
+        current pixmap is smaller."""
+
+        if self._depiction is None:
+            return
+
+        text, type, max_size = self._depiction
+        if not size.isValid():
+            size = max_size
+        if self._pixmap.isNull() or size.width() > self._depiction_size.width():
+            self._setSharedPixmap(text, type, size)
+            self._depiction_size = QSize(size)
+            self.update()
+
+    def releaseDepiction(self):
+        """Free the pixmap generated from the depiction. It will be generated again when needed."""
+
+        if self._depiction is not None:
+            self._releaseSharedPixmap()
+            self._pixmap = _nullPixmap()
+            self._depiction_size = _NULL_SIZE
 
     def setPixmapFromSmiles(self, smiles: str, size: QSize = QSize(300, 300)):
-        self._pixmap = SmilesToPixmap(smiles, size)
+        self._setSharedPixmap(smiles, DEPICTION_SMILES, size)
 
     def setPixmapFromInchi(self, smiles: str, size: QSize = QSize(300, 300)):
-        self._pixmap = InchiToPixmap(smiles, size)
+        self._setSharedPixmap(smiles, DEPICTION_INCHI, size)
         
     def setPixmapFromBase64(self, b64: bytes) -> None:
         pixmap = QPixmap()
         pixmap.loadFromData(base64.b64decode(b64))
+        self._releaseSharedPixmap()
         self._pixmap = pixmap
         
     def setPixmapFromSvg(self, svg: bytes, size: QSize = QSize(300, 300)):
-        self._pixmap = SvgToPixmap(svg, size)
+        if isinstance(svg, bytes):
+            svg = svg.decode('utf-8')
+        self._setSharedPixmap(svg, DEPICTION_SVG, size)
+
+    def _setSharedPixmap(self, text: str, type: int, size: QSize):
+        # Nodes of a scene share the pixmaps of identical depictions
+        scene = self.scene()
+        if scene is not None:
+            self._pixmap = scene.sharedPixmap(self, text, type, size)
+        else:
+            self._pixmap = DepictionCache.pixmap(text, type, size)
+
+    def _releaseSharedPixmap(self):
+        scene = self.scene()
+        if scene is not None:
+            scene.releaseSharedPixmap(self)
 
     def scalePolygon(self):
+        self._pie_slices = None
+        if self._node_polygon.isEmpty():
+            return
+
         rect_size = max(self.rect().width(), self.rect().height())
         polygon_size = max(self._node_polygon.boundingRect().width(), self._node_polygon.boundingRect().height())
         scale = rect_size / polygon_size if polygon_size > 0. else 1.
         self._node_polygon = QTransform().scale(scale, scale).map(self._node_polygon)
 
+    def _pieSlices(self):
+        # Slices of pie charts are only rebuilt when values or geometry have changed:
+        # (rect, start angle, span angle) tuples for circles, paths clipped to the polygon for other shapes
+        rect = self.rect()
+        if self._pie_slices is None or self._pie_slices[0] != rect:
+            slices = []
+            start = 0.
+            if self._stock_polygon == NodePolygon.Circle:
+                pie_rect = QTransform().scale(.85, .85).mapRect(rect)
+                for v in self._pie:
+                    slices.append((pie_rect, int(start * 5760), int(v * 5760)))
+                    start += v
+            else:
+                pie_rect = rect
+                if self._stock_polygon == NodePolygon.Square:
+                    pie_rect = QTransform().scale(1.2, 1.2).mapRect(rect)
+
+                clip_path = QPainterPath()
+                clip_path.addPolygon(QTransform().scale(.8, .8).map(self._node_polygon))
+                for v in self._pie:
+                    pie_path = QPainterPath()
+                    pie_path.arcTo(pie_rect, start*360, v*360)
+                    slices.append(clip_path.intersected(pie_path))
+                    start += v
+            self._pie_slices = (rect, slices)
+        return self._pie_slices[1]
+
     def polygon(self) -> NodePolygon:
         return self._stock_polygon
 
     def setPolygon(self, id: Union[NodePolygon, int]):
         if isinstance(id, int):
             id = NodePolygon(id)
-        self.setCustomPolygon(NODE_POLYGON_MAP.get(id, QPolygonF()))
-        self._stock_polygon = id
+        self._setPolygon(NODE_POLYGON_MAP.get(id, QPolygonF()), id)
 
     def customPolygon(self) -> QPolygonF:
-        return self._node_polygon
+        return QPolygonF(self._node_polygon)
 
     def setCustomPolygon(self, polygon: QPolygonF):
+        self._setPolygon(polygon, NodePolygon.Custom)
+
+    def _setPolygon(self, polygon: QPolygonF, id: NodePolygon):
         self.prepareGeometryChange()
-        self._stock_polygon = NodePolygon.Custom
+        self._stock_polygon = id
         self._node_polygon = polygon
         self.scalePolygon()
         self.invalidateShape()
+        scene = self.scene()
+        if scene is not None:
+            scene.updateNodeState(self)
 
     def addEdge(self, edge: Edge):
+        if self._edges is _NO_EDGES:
+            self._edges = set()
         self._edges.add(edge)
         
     def removeEdge(self, edge: Edge):
+        if self._edges is _NO_EDGES:
+            raise KeyError(edge)
         self._edges.remove(edge)
 
     def edges(self) -> Set[Edge]:
-        return self._edges
+        return self._edges if self._edges is not _NO_EDGES else set()
 
     def updateStyle(self, style: NetworkStyle, old: NetworkStyle = None):
         if old is None or self.brush().color() == old.nodeBrush().color():
@@ -326,12 +507,32 @@ class Node(QGraphicsEllipseItem):
         self.invalidateShape()
 
     def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemScenePositionHasChanged:
-            for edge in self._edges:
-                edge.adjust()
-        elif change == QGraphicsItem.ItemSelectedChange:
+        if change == _ITEM_SCENE_POSITION_HAS_CHANGED:
+            scene = self.scene()
+            if scene is None:
+                for edge in self._edges:
+                    edge.adjust()
+            else:
+                scene.invalidateNodesIndex()
+                scene.updateVisibleNodesBoundingRect(self)
+                if not scene.edgesAdjustmentSuspended():
+                    scene.scheduleEdgesAdjustment(self._edges)
+        elif change == _ITEM_VISIBLE_HAS_CHANGED:
+            scene = self.scene()
+            if scene is not None:
+                scene.updateVisibleNodesBoundingRect(self)
+        elif change == _ITEM_SELECTED_CHANGE:
             self.setZValue(20 if value else 10)  # Bring item to front
             self.setCacheMode(self.cacheMode())  # Force redraw
+        elif change == _ITEM_SELECTED_HAS_CHANGED:
+            scene = self.scene()
+            if scene is not None:
+                scene.updateItemSelection(self)
+        elif change == _ITEM_SCENE_CHANGE:
+            # Node is removed from the scene or moved to another one, only network scenes keep registries
+            unregister = getattr(self.scene(), '_unregisterNode', None)
+            if unregister is not None and value is not self.scene():
+                unregister(self)
         return super().itemChange(change, value)
 
     def mousePressEvent(self, event):
@@ -343,15 +544,33 @@ class Node(QGraphicsEllipseItem):
         super().mouseReleaseEvent(event)
 
     def shape(self):
-        if self._stock_polygon == NodePolygon.Circle:
-            path = super().shape()
-        else:
-            path = QPainterPath()
-            path.addPolygon(self._node_polygon)
-
-        label_path = QPainterPath()
-        label_path.addRect(self._label_rect)
-        return path.united(label_path)
+        # Shape is requested each time the node moves, only rebuild it when geometry or pen has changed
+        key = (self.rect(), self.startAngle(), self.spanAngle(), self.pen())
+        if self._shape is None or key != self._shape_key:
+            shared_key = None
+            if self._stock_polygon != NodePolygon.Custom:
+                rect, pen, label_rect = key[0], key[3], self._label_rect
+                shared_key = (self._stock_polygon, rect.x(), rect.y(), rect.width(), rect.height(), key[1], key[2],
+                              pen.widthF(), pen.style(), pen.capStyle(), pen.joinStyle(), pen.miterLimit(),
+                              label_rect.width(), label_rect.height())
+                self._shape = _SHARED_SHAPES.get(shared_key)
+
+            if shared_key is None or self._shape is None:
+                if self._stock_polygon == NodePolygon.Circle:
+                    path = super().shape()
+                else:
+                    path = QPainterPath()
+                    path.addPolygon(self._node_polygon)
+
+                label_path = QPainterPath()
+                label_path.addRect(self._label_rect)
+                self._shape = path.united(label_path)
+                if shared_key is not None:
+                    if len(_SHARED_SHAPES) >= _SHARED_SHAPES_LIMIT:
+                        _SHARED_SHAPES.clear()
+                    _SHARED_SHAPES[shared_key] = self._shape
+            self._shape_key = key
+        return QPainterPath(self._shape)
 
     # noinspection PyMethodOverriding
     def paint(self, painter, option, widget):
@@ -361,6 +580,10 @@ class Node(QGraphicsEllipseItem):
 
         style = scene.networkStyle()
 
+        # Get level of detail
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        rect = self.rect()
+
         # If selected, change brush to yellow
         if option.state & QStyle.State_Selected:
             brush = style.nodeBrush(True)
@@ -368,21 +591,19 @@ class Node(QGraphicsEllipseItem):
             if brush is None or not brush.color().isValid():
                 brush = self.brush()
                 text_color = self.textColor()
-            painter.setBrush(brush)
-            painter.setPen(style.nodePen(True))
+            pen = style.nodePen(True)
         else:
-            painter.setBrush(self.brush())
-            painter.setPen(self.pen())
+            brush = self.brush()
+            pen = self.pen()
             text_color = self.textColor()
-            
-        # Get level of detail
-        lod = option.levelOfDetailFromTransform(painter.worldTransform())
-        rect = self.rect()
-        
-        if lod < 0.1:
-            painter.fillRect(rect, painter.brush())
+
+        if lod < scene.levelOfDetailThreshold(scene.DetailShapes):
+            painter.fillRect(rect, brush)
             return
 
+        painter.setBrush(brush)
+        painter.setPen(pen)
+
         if self._stock_polygon == NodePolygon.Circle:
             # Draw ellipse
             if self.spanAngle() != 0 and abs(self.spanAngle()) % (360 * 16) == 0:
@@ -405,38 +626,37 @@ class Node(QGraphicsEllipseItem):
                 painter.drawPolygon(self._node_polygon)
 
         # Draw pies if any
-        if scene.pieChartsVisibility() and len(self._pie) > 0:
-            start = 0.
-            colors = self.scene().pieColors()
+        if (scene.pieChartsVisibility() and self._pie is not None
+                and lod >= scene.levelOfDetailThreshold(scene.DetailPieCharts)):
+            colors = scene.pieColors()
             painter.setPen(QPen(Qt.NoPen))
 
             if self._stock_polygon == NodePolygon.Circle:
-                rect = QTransform().scale(.85, .85).mapRect(rect)
-                for v, color in zip(self._pie, colors):
+                for (pie_rect, start, span), color in zip(self._pieSlices(), colors):
                     painter.setBrush(color)
-                    painter.drawPie(rect, int(start * 5760), int(v * 5760))
-                    start += v
+                    painter.drawPie(pie_rect, start, span)
             else:
-                if self._stock_polygon == NodePolygon.Square:
-                    rect = QTransform().scale(1.2, 1.2).mapRect(rect)
-
-                # Set clip path for pies
-                clip_path = QPainterPath()
-                clip_path.addPolygon(QTransform().scale(.8, .8).map(self._node_polygon))
-
-                for v, color in zip(self._pie, colors):
+                for pie_path, color in zip(self._pieSlices(), colors):
                     painter.setBrush(color)
-                    pie_path = QPainterPath()
-                    pie_path.arcTo(rect, start*360, v*360)
-                    painter.drawPath(clip_path.intersected(pie_path))
-                    start += v
+                    painter.drawPath(pie_path)
 
         # Draw text
-        if lod > 0.4:
+        if lod >= scene.levelOfDetailThreshold(scene.DetailLabels):
             bounding_rect = self.boundingRect()
             painter.setClipping(False)
             painter.setFont(self.font())
             painter.setPen(QPen(text_color, 0))
             painter.drawText(bounding_rect, Qt.AlignCenter, self._label)
-            if scene.pixmapVisibility() and not self._pixmap.isNull():
+
+        # Draw pixmap. Depictions set lazily are generated the first time they are needed, and again at higher
+        # resolution when zooming in
+        if scene.pixmapVisibility() and lod >= scene.levelOfDetailThreshold(scene.DetailPixmaps):
+            if self._depiction is not None:
+                size = self.depictionSize(lod)
+                if self._pixmap.isNull() or size.width() > self._depiction_size.width():
+                    scene.requestDepiction(self, size)
+
+            if not self._pixmap.isNull():
+                bounding_rect = self.boundingRect()
+                painter.setClipping(False)
                 painter.drawPixmap(bounding_rect.toRect(), self._pixmap, self._pixmap.rect())
@@ -25,6 +25,7 @@ NoneType = type(None)
 
 class Config(enum.IntEnum):
 
+    MinDepictionSize         : Config = ... # 0x10
     Radius                   : Config = ... # 0x1e
 
 
@@ -33,6 +34,28 @@ class DefaultStyle(qmn.NetworkStyle):
     def __init__(self) -> None: ...
 
 
+class DepictionCache(Shiboken.Object):
+
+    def __init__(self) -> None: ...
+
+    @staticmethod
+    def cacheLimit() -> int: ...
+    @staticmethod
+    def clear() -> None: ...
+    @staticmethod
+    def directory() -> str: ...
+    @staticmethod
+    def image(text: str, type: int, size: PySide6.QtCore.QSize) -> PySide6.QtGui.QImage: ...
+    @staticmethod
+    def key(text: str, type: int, size: PySide6.QtCore.QSize) -> str: ...
+    @staticmethod
+    def pixmap(text: str, type: int, size: PySide6.QtCore.QSize) -> PySide6.QtGui.QPixmap: ...
+    @staticmethod
+    def setCacheLimit(n: int) -> None: ...
+    @staticmethod
+    def setDirectory(path: str) -> None: ...
+
+
 class Edge(PySide6.QtWidgets.QGraphicsPathItem):
 
     def __init__(self, index: int, sourceNode: qmn.Node, destNode: qmn.Node, width: float = ...) -> None: ...
@@ -45,6 +68,7 @@ class Edge(PySide6.QtWidgets.QGraphicsPathItem):
     def itemChange(self, change: PySide6.QtWidgets.QGraphicsItem.GraphicsItemChange, value: Any) -> Any: ...
     def paint(self, painter: PySide6.QtGui.QPainter, option: PySide6.QtWidgets.QStyleOptionGraphicsItem, widget: PySide6.QtWidgets.QWidget) -> None: ...
     def setDestNode(self, node: qmn.Node) -> None: ...
+    def setEndPoints(self, source: PySide6.QtCore.QPointF, dest: PySide6.QtCore.QPointF) -> None: ...
     def setPen(self, pen: Union[PySide6.QtGui.QPen, PySide6.QtCore.Qt.PenStyle, PySide6.QtGui.QColor]) -> None: ...
     def setSourceNode(self, node: qmn.Node) -> None: ...
     def setWidth(self, width: float) -> None: ...
@@ -54,6 +78,19 @@ class Edge(PySide6.QtWidgets.QGraphicsPathItem):
     def width(self) -> float: ...
 
 
+class EdgesLayer(qmn.GraphicsItemLayer):
+
+    def __init__(self) -> None: ...
+
+    def batchRendering(self) -> bool: ...
+    def boundingRect(self) -> PySide6.QtCore.QRectF: ...
+    def invalidate(self) -> None: ...
+    def paint(self, painter: PySide6.QtGui.QPainter, option: PySide6.QtWidgets.QStyleOptionGraphicsItem, widget: PySide6.QtWidgets.QWidget) -> None: ...
+    def setBatchRendering(self, enabled: bool = ...) -> None: ...
+    def shape(self) -> PySide6.QtGui.QPainterPath: ...
+    def updateEdge(self, edge: qmn.Edge) -> None: ...
+
+
 class GraphicsItemLayer(PySide6.QtWidgets.QGraphicsItem):
 
     def __init__(self) -> None: ...
@@ -71,6 +108,13 @@ class NetworkScene(PySide6.QtWidgets.QGraphicsScene):
     pixmapVisibilityChanged  : ClassVar[Signal] = ... # pixmapVisibilityChanged(bool)
     scaleChanged             : ClassVar[Signal] = ... # scaleChanged(double)
 
+    class LevelOfDetail(enum.IntEnum):
+
+        DetailShapes             : NetworkScene.LevelOfDetail = ... # 0x0
+        DetailPieCharts          : NetworkScene.LevelOfDetail = ... # 0x1
+        DetailLabels             : NetworkScene.LevelOfDetail = ... # 0x2
+        DetailPixmaps            : NetworkScene.LevelOfDetail = ... # 0x3
+
     class Type(enum.IntEnum):
 
         PixmapsAuto              : NetworkScene.Type = ... # -0x1
@@ -86,47 +130,88 @@ class NetworkScene(PySide6.QtWidgets.QGraphicsScene):
     def addEdges(self, edges: Sequence[qmn.Edge]) -> None: ...
     def addNode(self, node: qmn.Node) -> None: ...
     def addNodes(self, nodes: Sequence[qmn.Node]) -> None: ...
+    @overload
+    def adjustEdges(self) -> None: ...
+    @overload
+    def adjustEdges(self, edges: Sequence[qmn.Edge]) -> None: ...
     def clear(self) -> None: ...
     def createEdges(self, indexes: Sequence[int], sourceNodes: Sequence[qmn.Node], destNodes: Sequence[qmn.Node], widths: Sequence[float]) -> List[qmn.Edge]: ...
+    def createEdgesFromArrays(self, indexes: object, sources: object, dests: object, widths: object) -> None: ...
     def createNodes(self, indexes: Sequence[int], labels: Sequence[str] = ..., positions: Sequence[PySide6.QtCore.QPointF] = ..., colors: Sequence[Any] = ..., radii: Sequence[Any] = ...) -> List[qmn.Node]: ...
+    def createNodesFromArrays(self, indexes: object, positions: object, radii: object, colors: object, labels: Sequence[str]) -> None: ...
+    def depictionsMemoryLimit(self) -> int: ...
+    def edge(self, index: int) -> qmn.Edge: ...
+    def edgeAt(self, pos: Union[PySide6.QtCore.QPointF, PySide6.QtCore.QPoint]) -> qmn.Edge: ...
     def edges(self) -> List[qmn.Edge]: ...
+    def edgesAdjustmentSuspended(self) -> bool: ...
+    def edgesAdjustmentSynchronous(self) -> bool: ...
+    def edgesBatchRendering(self) -> bool: ...
+    def edgesInRect(self, rect: Union[PySide6.QtCore.QRectF, PySide6.QtCore.QRect], mode: PySide6.QtCore.Qt.ItemSelectionMode = ...) -> List[qmn.Edge]: ...
+    def edgesWidthsArray(self) -> List[float]: ...
+    def flushDepictions(self) -> None: ...
+    def flushEdgesAdjustment(self) -> None: ...
     def hideAllItems(self) -> None: ...
     def hideItems(self, items: Sequence[PySide6.QtWidgets.QGraphicsItem]) -> None: ...
     def hideSelectedItems(self) -> None: ...
+    def invalidateEdgesIndex(self) -> None: ...
+    def invalidateNodesIndex(self) -> None: ...
     def isLocked(self) -> bool: ...
+    def lazyPixmaps(self) -> bool: ...
+    def levelOfDetailThreshold(self, detail: int) -> float: ...
     def lock(self, lock: bool = ...) -> None: ...
     def networkStyle(self) -> qmn.NetworkStyle: ...
+    def node(self, index: int) -> qmn.Node: ...
+    def nodeAt(self, pos: Union[PySide6.QtCore.QPointF, PySide6.QtCore.QPoint]) -> qmn.Node: ...
     def nodes(self) -> List[qmn.Node]: ...
     def nodesColors(self) -> List[PySide6.QtGui.QColor]: ...
+    def nodesColorsArray(self) -> List[int]: ...
+    def nodesInRect(self, rect: Union[PySide6.QtCore.QRectF, PySide6.QtCore.QRect], mode: PySide6.QtCore.Qt.ItemSelectionMode = ...) -> List[qmn.Node]: ...
     def nodesOverlayBrushes(self) -> List[PySide6.QtGui.QBrush]: ...
     def nodesPolygons(self) -> List[int]: ...
+    def nodesPolygonsArray(self) -> List[int]: ...
     def nodesRadii(self) -> List[int]: ...
+    def nodesRadiiArray(self) -> List[int]: ...
     def pieChartsVisibility(self) -> bool: ...
     def pieColors(self) -> List[PySide6.QtGui.QColor]: ...
     def pixmapVisibility(self) -> bool: ...
+    def releaseSharedPixmap(self, node: qmn.Node) -> None: ...
     def removeAllEdges(self) -> None: ...
     def removeAllNodes(self) -> None: ...
     def removeEdges(self, edges: Sequence[qmn.Edge]) -> None: ...
     def removeNodes(self, nodes: Sequence[qmn.Node]) -> None: ...
     def render(self, painter: PySide6.QtGui.QPainter, target: Union[PySide6.QtCore.QRectF, PySide6.QtCore.QRect] = ..., source: Union[PySide6.QtCore.QRectF, PySide6.QtCore.QRect] = ..., aspectRatioMode: PySide6.QtCore.Qt.AspectRatioMode = ...) -> None: ...
+    def requestDepiction(self, node: qmn.Node, size: PySide6.QtCore.QSize = ...) -> None: ...
     def resetLabels(self) -> None: ...
     def resetNodesRadii(self) -> None: ...
     def resetPieCharts(self) -> None: ...
     def resetPixmaps(self) -> None: ...
     def scale(self) -> float: ...
+    def scheduleEdgesAdjustment(self, edges: Sequence[qmn.Edge]) -> None: ...
     def selectedEdges(self) -> List[qmn.Edge]: ...
+    def selectedEdgesIndexes(self) -> List[int]: ...
     def selectedNodes(self) -> List[qmn.Node]: ...
     def selectedNodesBoundingRect(self) -> PySide6.QtCore.QRectF: ...
+    def selectedNodesIndexes(self) -> List[int]: ...
+    def setDepictionsMemoryLimit(self, limit: int) -> None: ...
+    def setEdgesAdjustmentSynchronous(self, synchronous: bool = ...) -> None: ...
+    def setEdgesBatchRendering(self, enabled: bool = ...) -> None: ...
     @overload
     def setEdgesSelection(self, edges: Sequence[qmn.Edge]) -> None: ...
     @overload
     def setEdgesSelection(self, indexes: Sequence[int]) -> None: ...
+    def setEdgesSelectionFromArray(self, indexes: object) -> None: ...
+    def setEdgesVisibleFromArray(self, indexes: object) -> None: ...
+    def setItemsSelection(self, items: Sequence[PySide6.QtWidgets.QGraphicsItem]) -> None: ...
+    def setItemsVisibleFromArrays(self, nodes: object, edges: object) -> None: ...
     def setLabels(self, labels: Sequence[str]) -> None: ...
     def setLabelsFromModel(self, model: PySide6.QtCore.QAbstractItemModel, column_id: int, role: int = ...) -> None: ...
+    def setLazyPixmaps(self, lazy: bool = ...) -> None: ...
     @overload
     def setLayout(self, layout: Sequence[PySide6.QtCore.QPointF], scale: float = ..., isolated_nodes: Sequence[int] = ...) -> None: ...
     @overload
     def setLayout(self, layout: Sequence[float], scale: float = ..., isolated_nodes: Sequence[int] = ...) -> None: ...
+    def setLayoutFromArray(self, layout: object, scale: float, isolated_mask: object) -> None: ...
+    def setLevelOfDetailThreshold(self, detail: int, threshold: float) -> None: ...
     def setNetworkStyle(self, style: Optional[qmn.NetworkStyle] = ...) -> None: ...
     def setNodesColors(self, colors: Sequence[Any]) -> None: ...
     def setNodesOverlayBrushes(self, brushes: Sequence[Any]) -> None: ...
@@ -140,6 +225,9 @@ class NetworkScene(PySide6.QtWidgets.QGraphicsScene):
     def setNodesSelection(self, indexes: Sequence[int]) -> None: ...
     @overload
     def setNodesSelection(self, nodes: Sequence[qmn.Node]) -> None: ...
+    def setNodesSelectionFromArray(self, indexes: object) -> None: ...
+    def setNodesVisibleFromArray(self, indexes: object) -> None: ...
+    def setPieChartsFromArray(self, values: object, columns: int) -> None: ...
     def setPieChartsFromModel(self, model: PySide6.QtCore.QAbstractItemModel, column_ids: Sequence[int], role: int = ...) -> None: ...
     def setPieChartsVisibility(self, visibility: bool = ...) -> None: ...
     def setPieColors(self, colors: Sequence[PySide6.QtGui.QColor]) -> None: ...
@@ -150,9 +238,13 @@ class NetworkScene(PySide6.QtWidgets.QGraphicsScene):
     def setSelectedNodesOverlayBrush(self, brush: Union[PySide6.QtGui.QBrush, PySide6.QtCore.Qt.BrushStyle, PySide6.QtCore.Qt.GlobalColor, PySide6.QtGui.QColor, PySide6.QtGui.QGradient, PySide6.QtGui.QImage, PySide6.QtGui.QPixmap]) -> None: ...
     def setSelectedNodesPolygon(self, polygon: int) -> None: ...
     def setSelectedNodesRadius(self, radius: int) -> None: ...
+    def sharedPixmap(self, node: qmn.Node, text: str, type: int, size: PySide6.QtCore.QSize) -> PySide6.QtGui.QPixmap: ...
+    def sharedPixmapsCount(self) -> int: ...
     def showAllItems(self) -> None: ...
     def showItems(self, items: Sequence[PySide6.QtWidgets.QGraphicsItem]) -> None: ...
     def unlock(self) -> None: ...
+    def updateItemSelection(self, item: PySide6.QtWidgets.QGraphicsItem) -> None: ...
+    def updateVisibleNodesBoundingRect(self, node: qmn.Node) -> None: ...
     def visibleNodesBoundingRect(self) -> PySide6.QtCore.QRectF: ...
 
 
@@ -185,8 +277,11 @@ class Node(PySide6.QtWidgets.QGraphicsEllipseItem):
 
     def addEdge(self, edge: qmn.Edge) -> None: ...
     def customPolygon(self) -> PySide6.QtGui.QPolygonF: ...
+    def depiction(self) -> str: ...
+    def depictionSize(self, lod: float) -> PySide6.QtCore.QSize: ...
     def edges(self) -> Set[qmn.Edge]: ...
     def font(self) -> PySide6.QtGui.QFont: ...
+    def hasPendingDepiction(self) -> bool: ...
     def index(self) -> int: ...
     def invalidateShape(self) -> None: ...
     def itemChange(self, change: PySide6.QtWidgets.QGraphicsItem.GraphicsItemChange, value: Any) -> Any: ...
@@ -199,10 +294,13 @@ class Node(PySide6.QtWidgets.QGraphicsEllipseItem):
     def pixmap(self) -> PySide6.QtGui.QPixmap: ...
     def polygon(self) -> qmn.NodePolygon: ...
     def radius(self) -> int: ...
+    def releaseDepiction(self) -> None: ...
+    def renderDepiction(self, size: PySide6.QtCore.QSize = ...) -> None: ...
     def removeEdge(self, edge: qmn.Edge) -> None: ...
     def scalePolygon(self) -> None: ...
     def setBrush(self, brush: Union[PySide6.QtGui.QBrush, PySide6.QtCore.Qt.BrushStyle, PySide6.QtCore.Qt.GlobalColor, PySide6.QtGui.QColor, PySide6.QtGui.QGradient, PySide6.QtGui.QImage, PySide6.QtGui.QPixmap], autoTextColor: bool = ...) -> None: ...
     def setCustomPolygon(self, polygon: Union[PySide6.QtGui.QPolygonF, Sequence[PySide6.QtCore.QPointF], PySide6.QtGui.QPolygon, PySide6.QtCore.QRectF]) -> None: ...
+    def setDepiction(self, text: str, type: int = ..., size: PySide6.QtCore.QSize = ...) -> None: ...
     def setFont(self, font: Union[PySide6.QtGui.QFont, str, Sequence[str]]) -> None: ...
     def setLabel(self, label: str) -> None: ...
     def setOverlayBrush(self, brush: Union[PySide6.QtGui.QBrush, PySide6.QtCore.Qt.BrushStyle, PySide6.QtCore.Qt.GlobalColor, PySide6.QtGui.QColor, PySide6.QtGui.QGradient, PySide6.QtGui.QImage, PySide6.QtGui.QPixmap]) -> None: ...
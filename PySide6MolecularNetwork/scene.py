@@ -1,20 +1,33 @@
 from typing import List
 
 import itertools
+import time
+import weakref
+
+import numpy as np
 
 from PySide6.QtGui import QColor, QPixmap, QBrush
-from PySide6.QtCore import Qt, Signal, QRectF
+from PySide6.QtCore import Qt, Signal, QPointF, QRectF, QSize, QBasicTimer
 from PySide6.QtGui import QPainter
-from PySide6.QtWidgets import QGraphicsScene, QGraphicsItem
+from PySide6.QtWidgets import QGraphicsScene, QGraphicsItem, QStyleOptionGraphicsItem
     
 from .config import Config
 from .node import Node, NodePolygon
 from .edge import Edge
-from .graphicsitem import GraphicsItemLayer
+from .graphicsitem import GraphicsItemLayer, EdgesLayer
 from .style import NetworkStyle, DefaultStyle
+from .mol_depiction import DepictionCache, DepictionTypes, DepictStructures
+from .spatial_index import SpatialIndex
+from .label_metrics import LabelMetrics
+from .attributes import AttributesFiltersMixin, ColumnStore
+from ._utils import to_mask, to_array, to_indexes
+
+
+_NODE_POLYGONS = {polygon.value: polygon for polygon in NodePolygon}
+_NODE_POLYGONS_VALUES = {polygon: polygon.value for polygon in NodePolygon}
 
 
-class NetworkScene(QGraphicsScene):
+class NetworkScene(AttributesFiltersMixin, QGraphicsScene):
     scaleChanged = Signal(float)
     layoutChanged = Signal()
     itemsVisibilityChanged = Signal()
@@ -28,6 +41,12 @@ class NetworkScene(QGraphicsScene):
     PixmapsSvg = 3
     PixmapsAuto = -1
 
+    # Levels of detail from which each part of the nodes is painted. Below DetailShapes, nodes are painted as dots.
+    DetailShapes = 0
+    DetailPieCharts = 1
+    DetailLabels = 2
+    DetailPixmaps = 3
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -37,6 +56,20 @@ class NetworkScene(QGraphicsScene):
         self._pie_charts_visibility = True
         self._pixmap_visibility = True
         self._is_locked = False
+        self._edges_adjustment_suspended = False
+        self._edges_adjustment_synchronous = False
+        self._edges_batch_rendering = False
+        self._lod_thresholds = [0.1, 0.1, 0.4, 0.4]
+        self._lazy_pixmaps = False
+        self._depictions_synchronous = False
+        self._depictions_memory_limit = 262144
+
+        # Edges of moving nodes are adjusted all at once on next event loop iteration.
+        # A QBasicTimer is used so that the scene does not hold a reference to itself through a connection.
+        self._edges_adjustment_timer = QBasicTimer()
+
+        # Depictions requested by nodes while painting are generated a few at a time, without blocking the event loop
+        self._depictions_timer = QBasicTimer()
 
         self.clear()
 
@@ -45,9 +78,9 @@ class NetworkScene(QGraphicsScene):
 
     def setNetworkStyle(self, style: NetworkStyle = None):
         new_style = style if style is not None else DefaultStyle()
-        for node in self.nodes():
+        for node in self._nodesList():
             node.updateStyle(new_style, old=self._style)
-        for edge in self.edges():
+        for edge in self._edgesList():
             edge.updateStyle(new_style, old=self._style)
         self.setBackgroundBrush(new_style.backgroundBrush())
         self._style = new_style
@@ -55,32 +88,165 @@ class NetworkScene(QGraphicsScene):
     def clear(self):
         super().clear()
 
+        # Registries of nodes and edges keyed by their index, and cached views sorted by index.
+        # Items are owned by their layer, registries only keep weak references to them.
+        self._nodes = weakref.WeakValueDictionary()
+        self._edges = weakref.WeakValueDictionary()
+        self._sorted_nodes = []
+        self._sorted_edges = []
+        self._pending_edges = set()
+        self._edges_hidden_by_nodes = set()
+        self._pending_depictions = {}
+        self._depicted_nodes = {}
+        self._depicted_pixmaps = {}
+        self._depictions_cost = 0
+        self._evicted_depictions = set()
+
+        # Selected nodes and edges with their index, updated when items are selected or deselected
+        self._selected_nodes = {}
+        self._selected_edges = {}
+
+        # Spatial indexes of nodes and edges, rebuilt at once on next query when items have been added, moved or
+        # removed
+        self._nodes_index = None
+        self._edges_index = None
+
+        # Extents of visible nodes (left, top, right, bottom) and the nodes defining each of them. They are extended
+        # when nodes move outwards, and computed again only when one of these nodes moves inwards or is hidden.
+        self._visible_extents = None
+        self._visible_extents_nodes = None
+        self._isolated_mask = np.zeros(0, dtype=bool)
+
+        # Pixmaps of identical depictions are shared by nodes: key -> [pixmap, number of nodes using it]
+        self._shared_pixmaps = {}
+        self._nodes_pixmap_keys = {}
+
+        # Radius, color (QRgb) and polygon of nodes and width of edges, kept in arrays indexed by item index so
+        # that bulk getters do not iterate items. Items update them when they change.
+        self._nodes_state = ColumnStore({'radius': (np.int32, Config.Radius), 'color': (np.uint32, 0),
+                                         'polygon': (np.int8, NodePolygon.Circle.value)})
+        self._edges_state = ColumnStore({'width': (np.float64, 1.)})
+
+        # Numeric attributes of nodes and edges, and expressions over them deciding which items are visible
+        self._resetAttributes()
+
         self.nodesLayer = GraphicsItemLayer()
         self.addItem(self.nodesLayer)
         self.nodesLayer.setZValue(1)
 
-        self.edgesLayer = GraphicsItemLayer()
+        self.edgesLayer = EdgesLayer()
+        self.edgesLayer.setBatchRendering(self._edges_batch_rendering)
         self.addItem(self.edgesLayer)
         self.edgesLayer.setZValue(0)
 
     def render(self, painter: QPainter, target: QRectF = QRectF(), source: QRectF = QRectF(),
                mode: Qt.AspectRatioMode = Qt.KeepAspectRatio):
         
-        for node in self.nodes():
+        self.flushEdgesAdjustment()
+        for node in self._nodesList():
             node.setCacheMode(QGraphicsItem.NoCache)
-        super().render(painter, target, source, mode)
-        for node in self.nodes():
+        self._depictions_synchronous = True
+        try:
+            super().render(painter, target, source, mode)
+        finally:
+            self._depictions_synchronous = False
+        for node in self._nodesList():
             node.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         
+    def _registerNode(self, node: Node):
+        index = node.index()
+        sorted_nodes = self._sorted_nodes
+        if sorted_nodes is not None and (not sorted_nodes or sorted_nodes[-1].index() < index):
+            sorted_nodes.append(node)
+        else:
+            self._sorted_nodes = None
+        self._nodes[index] = node
+        self._nodes_state.add(index, *self._nodeState(node))
+        self._nodes_index = None
+        self._visible_extents = None
+        if node.isSelected():
+            self._selected_nodes[node] = index
+
+    def _unregisterNode(self, node: Node):
+        index = node.index()
+        if self._nodes.get(index) is node:
+            del self._nodes[index]
+            self._nodes_state.remove(index)
+            self._sorted_nodes = None
+        self._nodes_index = None
+        self._visible_extents = None
+        self._selected_nodes.pop(node, None)
+        self._pending_depictions.pop(node, None)
+        self._evicted_depictions.discard(node)
+        self._forgetDepiction(node)
+        self.releaseSharedPixmap(node)
+
+    def _registerEdge(self, edge: Edge):
+        index = edge.index()
+        sorted_edges = self._sorted_edges
+        if sorted_edges is not None and (not sorted_edges or sorted_edges[-1].index() < index):
+            sorted_edges.append(edge)
+        else:
+            self._sorted_edges = None
+        self._edges[index] = edge
+        self._edges_state.add(index, edge.width())
+        self._edges_index = None
+        if edge.isSelected():
+            self._selected_edges[edge] = index
+
+    def _unregisterEdge(self, edge: Edge):
+        index = edge.index()
+        if self._edges.get(index) is edge:
+            del self._edges[index]
+            self._edges_state.remove(index)
+            self._sorted_edges = None
+        self._edges_index = None
+        self._selected_edges.pop(edge, None)
+        self._pending_edges.discard(edge)
+        self._edges_hidden_by_nodes.discard(edge)
+
+    @staticmethod
+    def _nodeState(node: Node) -> tuple:
+        # Values in the order of the columns of the nodes state
+        return node.radius(), node.brush().color().rgba(), _NODE_POLYGONS_VALUES[node.polygon()]
+
+    def updateNodeState(self, node: Node):
+        """Tell that the radius, color or polygon of `node` has changed."""
+
+        index = node.index()
+        if self._nodes.get(index) is node:
+            self._nodes_state.set(index, *self._nodeState(node))
+
+    def updateEdgeState(self, edge: Edge):
+        """Tell that the width of `edge` has changed."""
+
+        index = edge.index()
+        if self._edges.get(index) is edge:
+            self._edges_state.set(index, edge.width())
+            self._edges_index = None
+
+    def _nodesList(self) -> List[Node]:
+        if self._sorted_nodes is None:
+            self._sorted_nodes = [self._nodes[index] for index in sorted(self._nodes)]
+        return self._sorted_nodes
+
+    def _edgesList(self) -> List[Edge]:
+        if self._sorted_edges is None:
+            self._sorted_edges = [self._edges[index] for index in sorted(self._edges)]
+        return self._sorted_edges
+
     def addNode(self, node: Node):
         node.setParentItem(self.nodesLayer)
+        self._registerNode(node)
         
     def addEdge(self, edge: Edge):
         edge.setParentItem(self.edgesLayer)
+        self._registerEdge(edge)
         
     def addNodes(self, nodes: List[Node]):
         for node in nodes:
             node.setParentItem(self.nodesLayer)
+            self._registerNode(node)
 
     def createNodes(self, indexes, labels=None, positions=None, colors=None, radii=None):
         if len(indexes) == 0:
@@ -112,13 +278,62 @@ class NetworkScene(QGraphicsScene):
                 node.setRadius(radius)
 
             node.setParentItem(self.nodesLayer)
+            self._registerNode(node)
             nodes.append(node)
 
         return nodes
     
+    def createNodesFromArrays(self, indexes, positions=None, radii=None, colors=None, labels=None):
+        """Create nodes from arrays: int32 `indexes`, float64 (N, 2) `positions`, int32 `radii`,
+        uint32 `colors` as QRgb values (0xAARRGGBB, fully transparent colors are ignored) and a list of `labels`.
+
+        Unlike createNodes, created nodes are not returned, use node() or nodes() to retrieve them."""
+
+        indexes = np.ascontiguousarray(indexes, dtype=np.int32).ravel()
+        size = len(indexes)
+        positions = to_array(positions, np.float64, size, "positions", 2)
+        radii = to_array(radii, np.int32, size, "radii")
+        colors = to_array(colors, np.uint32, size, "colors")
+        if labels is not None and len(labels) < size:
+            raise ValueError("labels must have one value per index")
+
+        # Convert to Python objects once instead of unboxing numpy scalars for each node
+        indexes = indexes.tolist()
+        positions = positions.tolist() if positions is not None else None
+        radii = radii.tolist() if radii is not None else None
+        colors = colors.tolist() if colors is not None else None
+
+        style = self._style
+        if style is not None:
+            brush = style.nodeBrush()
+            text_color = style.nodeTextColor()
+            pen = style.nodePen()
+            font = style.nodeFont()
+
+        for i, index in enumerate(indexes):
+            node = Node(index, label=str(labels[i]) if labels is not None else None)
+            if positions is not None:
+                node.setPos(*positions[i])
+
+            if style is not None:
+                node.setBrush(brush, autoTextColor=False)
+                node.setTextColor(text_color)
+                node.setPen(pen)
+                node.setFont(font)
+
+            if colors is not None and colors[i] >> 24:
+                node.setBrush(QColor.fromRgba(colors[i]))
+
+            if radii is not None and radii[i] > 0:
+                node.setRadius(radii[i])
+
+            node.setParentItem(self.nodesLayer)
+            self._registerNode(node)
+
     def addEdges(self, edges: List[Edge]):
         for edge in edges:
             edge.setParentItem(self.edgesLayer)
+            self._registerEdge(edge)
 
     def createEdges(self, indexes, sourceNodes, destNodes, widths):
         if len(indexes) == 0:
@@ -130,10 +345,41 @@ class NetworkScene(QGraphicsScene):
             if self._style is not None:
                 edge.updateStyle(self._style)
             edge.setParentItem(self.edgesLayer)
-            edge.adjust()
+            self._registerEdge(edge)
             edges.append(edge)
+        self.adjustEdges(edges)
         return edges
 
+    def createEdgesFromArrays(self, indexes, sources, dests, widths=None):
+        """Create edges from arrays: int32 `indexes`, int32 `sources` and `dests` holding indexes of nodes
+        already in the scene and float64 `widths`. Edges referencing a missing node are skipped.
+
+        Unlike createEdges, created edges are not returned, use edge() or edges() to retrieve them."""
+
+        indexes = np.ascontiguousarray(indexes, dtype=np.int32).ravel()
+        size = len(indexes)
+        sources = to_array(sources, np.int32, size, "sources").tolist()
+        dests = to_array(dests, np.int32, size, "dests").tolist()
+        widths = to_array(widths, np.float64, size, "widths")
+        widths = widths.tolist() if widths is not None else [1.] * size
+
+        pen = self._style.edgePen() if self._style is not None else None
+
+        edges = []
+        for index, source, dest, width in zip(indexes.tolist(), sources, dests, widths):
+            source = self._nodes.get(source)
+            dest = self._nodes.get(dest)
+            if source is None or dest is None:
+                continue
+
+            edge = Edge(index, source, dest, width)
+            if pen is not None:
+                edge.setPen(pen)
+            edge.setParentItem(self.edgesLayer)
+            self._registerEdge(edge)
+            edges.append(edge)
+        self.adjustEdges(edges)
+
     def removeAllNodes(self):
         for node in self.nodes():
             self.removeItem(node)
@@ -150,37 +396,147 @@ class NetworkScene(QGraphicsScene):
         for edge in edges:
             self.removeItem(edge)
 
-    def nodes(self):
-        try:
-            return sorted(self.nodesLayer.childItems(), key=lambda node: node.index())
-        except RuntimeError:
-            return []
+    def nodes(self) -> List[Node]:
+        return list(self._nodesList())
+
+    def node(self, index: int) -> Node:
+        return self._nodes.get(index)
+
+    def updateItemSelection(self, item: QGraphicsItem):
+        """Tell that `item`, a node or an edge of the scene, has been selected or deselected."""
+
+        if isinstance(item, Node):
+            selected_items, index = self._selected_nodes, item.index()
+            if self._nodes.get(index) is not item:
+                return
+        elif isinstance(item, Edge):
+            selected_items, index = self._selected_edges, item.index()
+            if self._edges.get(index) is not item:
+                return
+        else:
+            return
+
+        if item.isSelected():
+            selected_items[item] = index
+        else:
+            selected_items.pop(item, None)
 
     def selectedNodes(self):
+        selected = self._selected_nodes
+        return sorted(selected, key=selected.__getitem__)
+
+    def selectedNodesIndexes(self) -> np.ndarray:
+        """Return the sorted indexes of selected nodes."""
+
+        return np.sort(np.fromiter(self._selected_nodes.values(), dtype=np.intp, count=len(self._selected_nodes)))
+
+    def setItemsSelection(self, items):
+        """Select `items`, nodes or edges of the scene, and deselect the others. selectionChanged is emitted once."""
+
+        # Items are selected with signals blocked, so that selectionChanged is emitted only once. Items already in
+        # the right state are left untouched.
+        keep = set(items)
+        changed = False
+        blocked = self.blockSignals(True)
         try:
-            return [item for item in self.selectedItems() if self.nodesLayer.isAncestorOf(item)]
-        except RuntimeError:
-            return []
+            for item in self.selectedItems():
+                if item not in keep:
+                    item.setSelected(False)
+                    changed = True
+            for item in items:
+                if not item.isSelected():
+                    item.setSelected(True)
+                    changed = changed or item.isSelected()
+        finally:
+            self.blockSignals(blocked)
+
+        if changed and not blocked:
+            self.selectionChanged.emit()
 
     def setNodesSelection(self, items):
-        self.clearSelection()
-
         # Look if items are Nodes or indexes
-        for _ in items:
-            is_nodes = isinstance(_, Node)
-            break
-
-        if len(items) > 0:
-            # noinspection PyUnboundLocalVariable
-            if is_nodes:
-                for node in items:
-                    node.setSelected(True)
-            else:
-                nodes = self.nodes()
-                nodes_len = len(nodes)
-                for index in items:
-                    if 0 <= index < nodes_len:
-                        nodes[index].setSelected(True)
+        if not isinstance(items, np.ndarray):
+            items = list(items)
+            if items and isinstance(items[0], Node):
+                self.setItemsSelection(items)
+                return
+
+        self.setNodesSelectionFromArray(items)
+
+    def setNodesSelectionFromArray(self, indexes):
+        """Select nodes from an array of indexes or a boolean mask. Other items are deselected."""
+
+        nodes = self._nodes
+        self.setItemsSelection([nodes[index] for index in to_indexes(indexes).tolist() if index in nodes])
+
+    def invalidateNodesIndex(self):
+        """Tell that the geometry of nodes has changed. The spatial index will be rebuilt on next query."""
+
+        self._nodes_index = None
+
+    def _nodesIndex(self):
+        if self._nodes_index is None:
+            nodes = self._nodesList()
+            rects = np.array([node.sceneBoundingRect().getCoords() for node in nodes], dtype=np.float64)
+            self._nodes_index = (nodes, SpatialIndex(rects))
+        return self._nodes_index
+
+    @staticmethod
+    def _isPickable(node: Node) -> bool:
+        # Isolated nodes are not painted and can't be picked
+        return node.isVisible() and not node.flags() & QGraphicsItem.ItemHasNoContents
+
+    def nodeAt(self, pos: QPointF) -> Node:
+        """Return the topmost visible node at `pos`, or None if there is no node there."""
+
+        nodes, index = self._nodesIndex()
+        found = None
+        for i in index.query(pos.x(), pos.y(), pos.x(), pos.y()).tolist():
+            node = nodes[i]
+            if (self._isPickable(node) and (found is None or node.zValue() >= found.zValue())
+                    and node.contains(node.mapFromScene(pos))):
+                found = node
+        return found
+
+    def nodesInRect(self, rect: QRectF, mode: Qt.ItemSelectionMode = Qt.IntersectsItemBoundingRect) -> List[Node]:
+        """Return visible nodes whose bounding rect intersects `rect`, or is contained in `rect` with
+        Qt.ContainsItemBoundingRect and Qt.ContainsItemShape modes."""
+
+        nodes, index = self._nodesIndex()
+        contains = mode in (Qt.ContainsItemBoundingRect, Qt.ContainsItemShape)
+        return [nodes[i] for i in index.query(*rect.getCoords(), contains).tolist() if self._isPickable(nodes[i])]
+
+    def invalidateEdgesIndex(self):
+        """Tell that the geometry of edges has changed. The spatial index of edges will be rebuilt on next query."""
+
+        self._edges_index = None
+
+    def _edgesIndex(self):
+        if self._edges_index is None:
+            edges = self._edgesList()
+            rects = np.array([edge.sceneBoundingRect().getCoords() for edge in edges], dtype=np.float64)
+            self._edges_index = (edges, SpatialIndex(rects))
+        return self._edges_index
+
+    def edgeAt(self, pos: QPointF) -> Edge:
+        """Return the topmost visible edge at `pos`, or None if there is no edge there."""
+
+        edges, index = self._edgesIndex()
+        found = None
+        for i in index.query(pos.x(), pos.y(), pos.x(), pos.y()).tolist():
+            edge = edges[i]
+            if (edge.isVisible() and (found is None or edge.zValue() >= found.zValue())
+                    and edge.contains(edge.mapFromScene(pos))):
+                found = edge
+        return found
+
+    def edgesInRect(self, rect: QRectF, mode: Qt.ItemSelectionMode = Qt.IntersectsItemBoundingRect) -> List[Edge]:
+        """Return visible edges whose bounding rect intersects `rect`, or is contained in `rect` with
+        Qt.ContainsItemBoundingRect and Qt.ContainsItemShape modes."""
+
+        edges, index = self._edgesIndex()
+        contains = mode in (Qt.ContainsItemBoundingRect, Qt.ContainsItemShape)
+        return [edges[i] for i in index.query(*rect.getCoords(), contains).tolist() if edges[i].isVisible()]
 
     def selectedNodesBoundingRect(self):
         bounding_rect = QRectF()
@@ -189,146 +545,310 @@ class NetworkScene(QGraphicsScene):
         return bounding_rect
         
     def visibleNodesBoundingRect(self):
-        bounding_rect = QRectF()
-        for node in self.nodes():
-            if node.isVisible() and not (node.flags() & QGraphicsItem.ItemHasNoContents):
-                bounding_rect |= node.sceneBoundingRect()
-        return bounding_rect
+        if self._visible_extents is None:
+            self._computeVisibleExtents()
+
+        left, top, right, bottom = self._visible_extents
+        if left > right:
+            return QRectF()
+        return QRectF(left, top, right - left, bottom - top)
+
+    def updateVisibleNodesBoundingRect(self, node: Node):
+        """Tell that `node` has moved, has been resized, hidden or shown."""
+
+        if self._visible_extents is None:
+            return
+
+        if any(extent_node is node for extent_node in self._visible_extents_nodes):
+            self._visible_extents = None
+        elif self._isPickable(node):
+            extents = self._visible_extents
+            for side, value in enumerate(node.sceneBoundingRect().getCoords()):
+                if value < extents[side] if side < 2 else value > extents[side]:
+                    extents[side] = value
+                    self._visible_extents_nodes[side] = node
+
+    def _computeVisibleExtents(self):
+        nodes, index = self._nodesIndex()
+        visible = np.fromiter((node.isVisible() for node in nodes), dtype=bool, count=len(nodes))
+        if len(self._isolated_mask) > 0:
+            indexes = np.fromiter((node.index() for node in nodes), dtype=np.intp, count=len(nodes))
+            in_mask = indexes < len(self._isolated_mask)
+            visible[in_mask] &= ~self._isolated_mask[indexes[in_mask]]
+
+        visible = np.flatnonzero(visible)
+        if len(visible) == 0:
+            self._visible_extents = [np.inf, np.inf, -np.inf, -np.inf]
+            self._visible_extents_nodes = [None] * 4
+            return
+
+        rects = index.rects()[visible]
+        sides = [visible[rects[:, 0].argmin()], visible[rects[:, 1].argmin()],
+                 visible[rects[:, 2].argmax()], visible[rects[:, 3].argmax()]]
+        self._visible_extents = [index.rects()[i, side].item() for side, i in enumerate(sides)]
+        self._visible_extents_nodes = [nodes[i] for i in sides]
     
-    def edges(self):
-        try:
-            return sorted(self.edgesLayer.childItems(), key=lambda node: node.index())
-        except RuntimeError:
-            return []
+    def edges(self) -> List[Edge]:
+        return list(self._edgesList())
+
+    def edge(self, index: int) -> Edge:
+        return self._edges.get(index)
 
     def selectedEdges(self):
-        try:
-            return [item for item in self.selectedItems() if self.edgesLayer.isAncestorOf(item)]
-        except RuntimeError:
-            return []
+        selected = self._selected_edges
+        return sorted(selected, key=selected.__getitem__)
 
-    def setEdgesSelection(self, items):
-        self.clearSelection()
+    def selectedEdgesIndexes(self) -> np.ndarray:
+        """Return the sorted indexes of selected edges."""
+
+        return np.sort(np.fromiter(self._selected_edges.values(), dtype=np.intp, count=len(self._selected_edges)))
 
+    def setEdgesSelection(self, items):
         # Look if items are Edges or indexes
-        for _ in items:
-            is_edges = isinstance(_, Edge)
-            break
-
-        if len(items) > 0:
-            # noinspection PyUnboundLocalVariable
-            if is_edges:
-                for edge in items:
-                    edge.setSelected(True)
-            else:
-                edges = self.edges()
-                for edge in edges:
-                    if edge.index() in items:
-                        edge.setSelected(True)
+        if not isinstance(items, np.ndarray):
+            items = list(items)
+            if items and isinstance(items[0], Edge):
+                self.setItemsSelection(items)
+                return
+
+        self.setEdgesSelectionFromArray(items)
+
+    def setEdgesSelectionFromArray(self, indexes):
+        """Select edges from an array of indexes or a boolean mask. Other items are deselected."""
+
+        edges = self._edges
+        self.setItemsSelection([edges[index] for index in to_indexes(indexes).tolist() if index in edges])
 
     def setLayout(self, positions, scale=None, isolated_nodes=None):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.setLayoutFromArray(positions, scale, to_mask(isolated_nodes, len(positions)))
+
+    def setLayoutFromArray(self, positions: np.ndarray, scale=None, isolated_mask: np.ndarray = None):
         if scale is None or scale <= 0:
             scale = self._scale
-            
-        if isolated_nodes is None:
-            isolated_nodes = []
-            
-        nodes = self.nodes()
-        
+
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        nodes = self._nodesList()
         if len(positions) < len(nodes):
             return
 
-        scale = scale if scale is not None else self._scale
-        isolated_nodes = set(isolated_nodes)
-        
-        for node in nodes:
-            i = node.index()
-            if i in isolated_nodes:
-                node.setFlag(QGraphicsItem.ItemHasNoContents, True)
-                node.setFlag(QGraphicsItem.ItemIsSelectable, False)
-                node.setFlag(QGraphicsItem.ItemIsMovable, False)
-                node.setFlag(QGraphicsItem.ItemIgnoresTransformations, True)
-            else:
-                node.setFlag(QGraphicsItem.ItemHasNoContents, False)
-                node.setFlag(QGraphicsItem.ItemIsSelectable, True)
-                node.setFlag(QGraphicsItem.ItemIsMovable, not self._is_locked)
-                node.setFlag(QGraphicsItem.ItemIgnoresTransformations, False)
-                
-                node.setFlag(QGraphicsItem.ItemSendsScenePositionChanges, False)
-                pos = positions[i]
-                node.setPos(*pos * scale)
-                node.setFlag(QGraphicsItem.ItemSendsScenePositionChanges)
+        mask = to_mask(isolated_mask, len(positions))
+        self._isolated_mask = mask
+        self._visible_extents = None
 
-        for edge in self.edges():
-            edge.adjust()
+        # Convert to Python objects once instead of unboxing numpy scalars for each node
+        positions = (positions * scale).tolist()
+        mask = mask.tolist()
+
+        no_flags = QGraphicsItem.GraphicsItemFlag(0)
+        movable = QGraphicsItem.ItemIsMovable
+        isolated_set = QGraphicsItem.ItemHasNoContents | QGraphicsItem.ItemIgnoresTransformations
+        isolated_unset = QGraphicsItem.ItemIsSelectable | QGraphicsItem.ItemIsMovable
+        connected_set = QGraphicsItem.ItemIsSelectable | (no_flags if self._is_locked else movable)
+        connected_unset = isolated_set | (movable if self._is_locked else no_flags)
+
+        # Edges are adjusted all at once when every node has been moved
+        self._edges_adjustment_suspended = True
+        try:
+            for node in nodes:
+                i = node.index()
+                if i >= len(positions):
+                    continue
+
+                flags = node.flags()
+                if mask[i]:
+                    new_flags = (flags | isolated_set) & ~isolated_unset
+                else:
+                    new_flags = (flags | connected_set) & ~connected_unset
+                    node.setPos(*positions[i])
+                if new_flags != flags:
+                    node.setFlags(new_flags)
+        finally:
+            self._edges_adjustment_suspended = False
+
+        self.adjustEdges()
+        self._nodes_index = None
 
         self.layoutChanged.emit()
 
+    def edgesAdjustmentSuspended(self) -> bool:
+        return self._edges_adjustment_suspended
+
+    def edgesAdjustmentSynchronous(self) -> bool:
+        return self._edges_adjustment_synchronous
+
+    def setEdgesAdjustmentSynchronous(self, synchronous: bool = True):
+        self._edges_adjustment_synchronous = synchronous
+        if synchronous:
+            self.flushEdgesAdjustment()
+
+    def scheduleEdgesAdjustment(self, edges):
+        """Mark `edges` to be adjusted on next event loop iteration, or right now in synchronous mode.
+
+        Edges scheduled several times before the next iteration are only adjusted once."""
+
+        if self._edges_adjustment_synchronous:
+            self.adjustEdges(edges)
+            return
+
+        self._pending_edges.update(edges)
+        if self._pending_edges and not self._edges_adjustment_timer.isActive():
+            self._edges_adjustment_timer.start(0, self)
+
+    def flushEdgesAdjustment(self):
+        self._edges_adjustment_timer.stop()
+        if self._pending_edges:
+            edges, self._pending_edges = self._pending_edges, set()
+            self.adjustEdges(edges)
+
+    def timerEvent(self, event):
+        if event.timerId() == self._edges_adjustment_timer.timerId():
+            self.flushEdgesAdjustment()
+        elif event.timerId() == self._depictions_timer.timerId():
+            self._processDepictions()
+        else:
+            super().timerEvent(event)
+
+    def adjustEdges(self, edges=None):
+        """Recompute the end points of `edges` (all edges of the scene by default) in a single pass.
+
+        Paths are only rebuilt for edges whose end points actually changed."""
+
+        edges = self._edgesList() if edges is None else edges
+        edges = [edge for edge in edges if edge.sourceNode() is not None and edge.destNode() is not None]
+        if not edges:
+            return
+
+        # Gather geometry of each node once, even if it is shared by many edges
+        sources = [edge.sourceNode() for edge in edges]
+        dests = [edge.destNode() for edge in edges]
+        rows = {node: row for row, node in enumerate(dict.fromkeys(itertools.chain(sources, dests)))}
+        geometry = [(pos.x(), pos.y(), node.radius(), node.pen().widthF())
+                    for node in rows for pos in (node.pos(),)]
+        sources = np.fromiter(map(rows.__getitem__, sources), dtype=np.intp, count=len(edges))
+        dests = np.fromiter(map(rows.__getitem__, dests), dtype=np.intp, count=len(edges))
+
+        # Nodes and edges live in untransformed layers, so node positions are also edges coordinates
+        geometry = np.array(geometry, dtype=np.float64)
+        source = geometry[sources]
+        dest = geometry[dests]
+        p1 = source[:, :2]
+        p2 = dest[:, :2]
+        delta = p2 - p1
+        length = np.hypot(delta[:, 0], delta[:, 1])[:, np.newaxis]
+        min_len = source[:, 2:3] + dest[:, 2:3] + source[:, 3:4] + dest[:, 3:4]
+        far = length > min_len
+        with np.errstate(divide='ignore', invalid='ignore'):
+            source_points = np.where(far, p1 + (delta * (source[:, 2:3]/2 + source[:, 3:4] + 1)) / length, p1)
+            dest_points = np.where(far, p2 - (delta * (dest[:, 2:3]/2 + dest[:, 3:4] + 1)) / length, p1)
+
+        for edge, (sx, sy, dx, dy) in zip(edges, np.hstack((source_points, dest_points)).tolist()):
+            edge._setEndPoints(sx, sy, dx, dy)
+        self._edges_index = None
+
     def scale(self):
         return self._scale
 
     def setScale(self, scale=1):
         scale = 1 if scale <= 0 else scale
-    
-        for node in self.nodes():
-            node.setFlag(QGraphicsItem.ItemSendsScenePositionChanges, False)
-            node.setPos(node.pos() * scale / self._scale)
-            node.setFlag(QGraphicsItem.ItemSendsScenePositionChanges)
 
-        for edge in self.edges():
-            edge.adjust()
+        self._visible_extents = None
+        self._edges_adjustment_suspended = True
+        try:
+            for node in self._nodesList():
+                node.setPos(node.pos() * scale / self._scale)
+        finally:
+            self._edges_adjustment_suspended = False
+
+        self.adjustEdges()
 
         self._scale = scale
         self.scaleChanged.emit(scale)
 
+    def _setNodesLabels(self, nodes, labels):
+        # Nodes are grouped by font, usually the one of the style, so that label rects of each group are computed
+        # at once with the same font metrics
+        groups = {}
+        for node, label in zip(nodes, labels):
+            groups.setdefault(node.font(), []).append((node, label))
+
+        for font, items in groups.items():
+            rects = LabelMetrics.labelRects(font, [label for _, label in items])
+            for (node, label), rect in zip(items, rects):
+                node._setLabel(label, rect)
+
     def setLabelsFromModel(self, model, column_id, role=Qt.DisplayRole):
-        for node in self.nodes():
-            label = model.index(node.index(), column_id).data(role)
-            node.setLabel(str(label))
+        nodes = self._nodesList()
+        self._setNodesLabels(nodes, [str(model.index(node.index(), column_id).data(role)) for node in nodes])
 
     def setLabels(self, labels):
-        for node, label in zip(self.nodes(), labels):
-                node.setLabel(label)
+        self._setNodesLabels(self._nodesList(), labels)
 
     def resetLabels(self):
-        for node in self.nodes():
-            label = str(node.index() + 1)
-            node.setLabel(label)
+        nodes = self._nodesList()
+        self._setNodesLabels(nodes, [str(node.index() + 1) for node in nodes])
             
     def setNodesRadiiFromModel(self, model, column_id, func=None, role=Qt.DisplayRole):
+        self._visible_extents = None
         if func is not None:
-            for node in self.nodes():
+            for node in self._nodesList():
                 node.setRadius(func(model.index(node.index(), column_id).data(role)))
         else:
-            for node in self.nodes():
+            for node in self._nodesList():
                 node.setRadius(model.index(node.index(), column_id).data(role))
                 
-        for edge in self.edges():
-            edge.adjust()
+        self.adjustEdges()
             
     def resetNodesRadii(self):
-        for node in self.nodes():
+        self._visible_extents = None
+        for node in self._nodesList():
             node.setRadius(Config.Radius)
             
-        for edge in self.edges():
-            edge.adjust()
+        self.adjustEdges()
 
     def pieColors(self):
         return self._colors
 
     def setPieColors(self, colors):
         self._colors = colors
+        for node in self._nodesList():
+            if node.pie():
+                node.update()
+
+    def setPieCharts(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        nodes = self._nodesList()
+        if len(values) < len(nodes):
+            return
+
+        # Normalize all rows at once, rows which do not sum to a positive value give empty pie charts
+        sums = values.sum(axis=1, keepdims=True)
+        valid = sums > 0
+        values = np.divide(values, sums, out=np.zeros_like(values), where=valid).tolist()
+        valid = valid.ravel().tolist()
+
+        for node in nodes:
+            i = node.index()
+            if i < len(values):
+                node._setPie(values[i] if valid[i] else [])
 
     def setPieChartsFromModel(self, model, column_ids, role=Qt.DisplayRole):
         if len(column_ids) > len(self._colors):
             return
 
-        for node in self.nodes():
+        # Models which can be converted to an array of numbers are read at once
+        if role == Qt.DisplayRole and hasattr(model, '__array__'):
+            self.setPieCharts(np.asarray(model)[:, list(column_ids)])
+            return
+
+        for node in self._nodesList():
             values = [model.index(node.index(), cid).data(role) for cid in column_ids]
             node.setPie(values)
 
     def resetPieCharts(self):
-        for node in self.nodes():
+        for node in self._nodesList():
             node.setPie(None)
             
     def pieChartsVisibility(self):
@@ -340,22 +860,197 @@ class NetworkScene(QGraphicsScene):
             self.pieChartsVisibilityChanged.emit(visibility)
             
     def setPixmapsFromModel(self, model, column_id, role=Qt.DisplayRole, type=PixmapsSmiles):
-        for node in self.nodes():
+        nodes = []
+        texts = []
+        for node in self._nodesList():
             text = model.index(node.index(), column_id).data(role)
-            if not text:
+            if text:
+                nodes.append(node)
+                texts.append(text)
+
+        # Type is detected for the whole column at once, then rows are processed by type
+        types = DepictionTypes(texts, type)
+        if self._lazy_pixmaps:
+            for node, text, text_type in zip(nodes, texts, types.tolist()):
+                node.setDepiction(text, text_type)
+            return
+
+        for i in np.flatnonzero(types == NetworkScene.PixmapsBase64).tolist():
+            text = texts[i]
+            nodes[i].setPixmapFromBase64(text[4:].encode() if text.startswith("b64=") else text.encode())
+
+        # Other depictions are rendered in parallel, once per distinct structure
+        for pixmap_type, set_pixmap in ((NetworkScene.PixmapsSvg, Node.setPixmapFromSvg),
+                                        (NetworkScene.PixmapsInchi, Node.setPixmapFromInchi),
+                                        (NetworkScene.PixmapsSmiles, Node.setPixmapFromSmiles)):
+            indexes = np.flatnonzero(types == pixmap_type).tolist()
+            self._prepareSharedPixmaps([texts[i] for i in indexes], pixmap_type, QSize(300, 300))
+            for i in indexes:
+                set_pixmap(nodes[i], texts[i])
+
+    def lazyPixmaps(self) -> bool:
+        return self._lazy_pixmaps
+
+    def setLazyPixmaps(self, lazy: bool = True):
+        """In lazy mode, `setPixmapsFromModel` only keeps structures on nodes. Pixmaps are generated when nodes are
+        first painted at a level of detail high enough to show them, and for nodes just outside of the views."""
+
+        self._lazy_pixmaps = bool(lazy)
+
+    def requestDepiction(self, node: Node, size: QSize = QSize()):
+        """Schedule generation of the pixmap of `node` from its depiction, at `size` (maximum size by default)."""
+
+        if not node.depiction():
+            return
+
+        if self._depictions_synchronous:
+            self._renderDepiction(node, size)
+            return
+
+        pending = self._pending_depictions.get(node)
+        if pending is None or size.width() > pending.width():
+            self._pending_depictions[node] = QSize(size)
+        if not self._depictions_timer.isActive():
+            self._evicted_depictions = set()
+            self._depictions_timer.start(0, self)
+
+    def flushDepictions(self):
+        """Generate all requested pixmaps right now."""
+
+        self._depictions_timer.stop()
+        depictions, self._pending_depictions = self._pending_depictions, {}
+        for node, size in depictions.items():
+            self._renderDepiction(node, size)
+
+    def sharedPixmap(self, node: Node, text: str, type: int, size: QSize) -> QPixmap:
+        """Return the pixmap of a depiction for `node`. Nodes with identical depictions share the same pixmap, which
+        is kept until no node uses it."""
+
+        # Structures not seen yet are rendered first, SMILES are then parsed once for both the depiction and its key
+        image = DepictionCache.image(text, type, size) if not DepictionCache._hasStructure(text, type) else None
+        key = DepictionCache.key(text, type, size)
+        if self._nodes_pixmap_keys.get(node) == key:
+            return self._shared_pixmaps[key][0]
+
+        shared = self._shared_pixmaps.get(key)
+        if shared is None:
+            if image is None:
+                image = DepictionCache.image(text, type, size)
+            shared = self._shared_pixmaps[key] = [QPixmap.fromImage(image) if not image.isNull() else QPixmap(), 0]
+        self.releaseSharedPixmap(node)
+        shared[1] += 1
+        self._nodes_pixmap_keys[node] = key
+        return shared[0]
+
+    def _prepareSharedPixmaps(self, texts, type: int, size: QSize):
+        # Render depictions not shared yet in a pool of threads, nodes will then find them in the store. Structures
+        # not seen yet are rendered first, SMILES are then parsed once for both the depiction and its key.
+        texts = list(dict.fromkeys(texts))
+        new_texts = [text for text in texts if not DepictionCache._hasStructure(text, type)]
+        images = dict(zip(new_texts, DepictStructures(new_texts, type, size)[0])) if new_texts else {}
+
+        keys = {}
+        for text in texts:
+            key = DepictionCache.key(text, type, size)
+            if key not in self._shared_pixmaps:
+                keys.setdefault(key, text)
+        if not keys:
+            return
+
+        missing = [text for text in keys.values() if text not in images]
+        if missing:
+            images.update(zip(missing, DepictStructures(missing, type, size)[0]))
+        for key, text in keys.items():
+            image = images[text]
+            if not image.isNull():
+                self._shared_pixmaps[key] = [QPixmap.fromImage(image), 0]
+
+    def releaseSharedPixmap(self, node: Node):
+        """Tell that `node` does not use its shared pixmap anymore."""
+
+        key = self._nodes_pixmap_keys.pop(node, None)
+        if key is not None:
+            shared = self._shared_pixmaps[key]
+            shared[1] -= 1
+            if shared[1] <= 0:
+                del self._shared_pixmaps[key]
+
+    def sharedPixmapsCount(self) -> int:
+        return len(self._shared_pixmaps)
+
+    def depictionsMemoryLimit(self) -> int:
+        """Return the maximum memory used by pixmaps generated from depictions, in kilobytes."""
+
+        return self._depictions_memory_limit
+
+    def setDepictionsMemoryLimit(self, limit: int):
+        self._depictions_memory_limit = limit
+        self._trimDepictions()
+
+    def _renderDepiction(self, node: Node, size: QSize):
+        node.renderDepiction(size)
+
+        # Keep track of memory used by pixmaps, least recently rendered nodes first. A pixmap shared by several nodes
+        # is only counted once, until no depicted node uses it anymore.
+        self._forgetDepiction(node)
+        pixmap = node.pixmap()
+        if not pixmap.isNull():
+            key = pixmap.cacheKey()
+            depicted = self._depicted_pixmaps.get(key)
+            if depicted is None:
+                cost = pixmap.width() * pixmap.height() * pixmap.depth() // 8 // 1024
+                depicted = self._depicted_pixmaps[key] = [cost, 0]
+                self._depictions_cost += cost
+            depicted[1] += 1
+            self._depicted_nodes[node] = key
+        self._trimDepictions()
+
+    def _forgetDepiction(self, node: Node):
+        key = self._depicted_nodes.pop(node, None)
+        if key is not None:
+            depicted = self._depicted_pixmaps[key]
+            depicted[1] -= 1
+            if depicted[1] <= 0:
+                del self._depicted_pixmaps[key]
+                self._depictions_cost -= depicted[0]
+
+    def _trimDepictions(self):
+        # Release least recently rendered pixmaps until memory limit is respected, but keep the last one
+        while self._depictions_cost > self._depictions_memory_limit and len(self._depicted_nodes) > 1:
+            node = next(iter(self._depicted_nodes))
+            self._forgetDepiction(node)
+            node.releaseDepiction()
+            self._evicted_depictions.add(node)
+
+    def _processDepictions(self, budget: float = 0.015):
+        # Generate requested pixmaps until time budget (in seconds) is elapsed, then let the event loop run
+        start = time.perf_counter()
+        while self._pending_depictions:
+            node = next(iter(self._pending_depictions))
+            self._renderDepiction(node, self._pending_depictions.pop(node))
+            if time.perf_counter() - start > budget:
+                return
+
+        # Once pixmaps had to be released to respect the memory limit, nothing more fits: prefetching would release
+        # other pixmaps to be requested again, and never end
+        if self._evicted_depictions or not self._prefetchDepictions():
+            self._depictions_timer.stop()
+            self._evicted_depictions = set()
+
+    def _prefetchDepictions(self) -> bool:
+        # Request depictions of nodes in the surroundings of the views, so that they are ready when scrolling
+        for view in self.views():
+            lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(view.viewportTransform())
+            if lod < self._lod_thresholds[NetworkScene.DetailPixmaps]:
                 continue
-            
-            if type == NetworkScene.PixmapsBase64 or (type == NetworkScene.PixmapsAuto and text.startswith("b64=")):
-                if text.startswith("b64="):
-                    node.setPixmapFromBase64(text[4:].encode())
-                else:
-                    node.setPixmapFromBase64(text.encode())
-            elif type == NetworkScene.PixmapsSvg or (type == NetworkScene.PixmapsAuto and (text.startswith("<?xml") or text.startswith("<svg"))):
-                node.setPixmapFromSvg(text.encode())
-            elif type == NetworkScene.PixmapsInchi or (type == NetworkScene.PixmapsAuto and text.startswith("InChI=")):
-                node.setPixmapFromInchi(text)
-            elif type == NetworkScene.PixmapsSmiles or type == NetworkScene.PixmapsAuto:
-                node.setPixmapFromSmiles(text)
+
+            rect = view.mapToScene(view.viewport().rect()).boundingRect()
+            rect.adjust(-rect.width() / 2, -rect.height() / 2, rect.width() / 2, rect.height() / 2)
+            for node in self.nodesInRect(rect):
+                if node.hasPendingDepiction() and node not in self._evicted_depictions:
+                    self._pending_depictions[node] = node.depictionSize(lod)
+
+        return bool(self._pending_depictions)
 
     def pixmapVisibility(self):
         return self._pixmap_visibility
@@ -366,8 +1061,34 @@ class NetworkScene(QGraphicsScene):
             self.pixmapVisibilityChanged.emit(visibility)
             
     def resetPixmaps(self):
-        for node in self.nodes():
+        self._depictions_timer.stop()
+        self._pending_depictions = {}
+        self._depicted_nodes = {}
+        self._depicted_pixmaps = {}
+        self._depictions_cost = 0
+        self._evicted_depictions = set()
+        for node in self._nodesList():
             node.setPixmap(QPixmap())
+        self._shared_pixmaps = {}
+        self._nodes_pixmap_keys = {}
+
+    def levelOfDetailThreshold(self, detail: int) -> float:
+        return self._lod_thresholds[detail]
+
+    def setLevelOfDetailThreshold(self, detail: int, threshold: float):
+        if threshold != self._lod_thresholds[detail]:
+            self._lod_thresholds[detail] = float(threshold)
+            for node in self._nodesList():
+                node.update()
+
+    def edgesBatchRendering(self) -> bool:
+        return self._edges_batch_rendering
+
+    def setEdgesBatchRendering(self, enabled: bool = True):
+        """Let the edges layer draw all unselected straight edges at once instead of painting edges one by one."""
+
+        self._edges_batch_rendering = bool(enabled)
+        self.edgesLayer.setBatchRendering(self._edges_batch_rendering)
 
     def hideItems(self, items):
         for item in items:
@@ -387,21 +1108,91 @@ class NetworkScene(QGraphicsScene):
         self.itemsVisibilityChanged.emit()
 
     def showAllItems(self):
-        for item in self.items():
-            item.show()
+        self._setItemsVisibility(self._nodes.keys(), self._edges.keys())
         self.itemsVisibilityChanged.emit()
             
     def hideAllItems(self):
-        for item in self.items():
-            item.hide()
+        self._setItemsVisibility((), ())
         self.itemsVisibilityChanged.emit()
 
+    def _setItemsVisibility(self, nodes_indexes, edges_indexes=None) -> bool:
+        # Nodes are shown or hidden first, then edges are shown only if both of their ends are visible. If
+        # `nodes_indexes` is None, visibility of nodes is left untouched. If `edges_indexes` is None, only edges
+        # with a hidden end are hidden, and edges hidden that way are shown again once both of their ends are
+        # visible, the visibility of other edges is left untouched. Only items whose visibility changes are updated.
+        changed = False
+        if nodes_indexes is not None:
+            nodes_indexes = set(nodes_indexes)
+            # Extents of visible nodes are computed again once instead of being updated for each node
+            self._visible_extents = None
+            for index, node in self._nodes.items():
+                visible = index in nodes_indexes
+                if node.isVisible() != visible:
+                    node.setVisible(visible)
+                    changed = True
+
+        hidden_by_nodes = self._edges_hidden_by_nodes
+        if edges_indexes is not None:
+            edges_indexes = set(edges_indexes)
+            hidden_by_nodes.clear()
+            for index, edge in self._edges.items():
+                visible = index in edges_indexes
+                if visible and not (edge.sourceNode().isVisible() and edge.destNode().isVisible()):
+                    hidden_by_nodes.add(edge)
+                    visible = False
+                if edge.isVisible() != visible:
+                    edge.setVisible(visible)
+                    changed = True
+        else:
+            for edge in self._edges.values():
+                ends_visible = edge.sourceNode().isVisible() and edge.destNode().isVisible()
+                if edge.isVisible() and not ends_visible:
+                    hidden_by_nodes.add(edge)
+                    edge.setVisible(False)
+                    changed = True
+                elif ends_visible and edge in hidden_by_nodes:
+                    hidden_by_nodes.discard(edge)
+                    if not edge.isVisible():
+                        edge.setVisible(True)
+                        changed = True
+        return changed
+
+    def setNodesVisible(self, items):
+        """Show nodes from an array of indexes or a boolean mask and hide the others. Edges with a hidden end are
+        hidden and shown again once both of their ends are visible, visibility of other edges is left untouched.
+        itemsVisibilityChanged is emitted once if visibility of items changed."""
+
+        if self._setItemsVisibility(to_indexes(items).tolist()):
+            self.itemsVisibilityChanged.emit()
+
+    def setEdgesVisible(self, items):
+        """Show edges from an array of indexes or a boolean mask and hide the others. Edges with a hidden end are
+        hidden anyway. itemsVisibilityChanged is emitted once if visibility of edges changed."""
+
+        if self._setItemsVisibility(None, to_indexes(items).tolist()):
+            self.itemsVisibilityChanged.emit()
+
+    def setItemsVisible(self, nodes=None, edges=None):
+        """Show nodes and edges from arrays of indexes or boolean masks and hide the others. If `nodes` or `edges`
+        is None, all nodes or edges are shown. Edges with a hidden end are hidden anyway."""
+
+        nodes = self._nodes.keys() if nodes is None else to_indexes(nodes).tolist()
+        edges = self._edges.keys() if edges is None else to_indexes(edges).tolist()
+        if self._setItemsVisibility(nodes, edges):
+            self.itemsVisibilityChanged.emit()
+
     def nodesColors(self):
-        return [node.brush().color() if node.brush().color() != self.networkStyle().nodeBrush().color()
-                else QColor() for node in self.nodes()]
+        default = self.networkStyle().nodeBrush().color().rgba()
+        return [QColor.fromRgba(color) if color != default else QColor()
+                for color in self._nodes_state.values('color').tolist()]
+
+    def nodesColorsArray(self) -> np.ndarray:
+        """Return colors of nodes sorted by index, as QRgb values (0xAARRGGBB)."""
+
+        return self._nodes_state.values('color')
 
     def setNodesColors(self, colors: List[QColor]):
-        nodes = self.nodes()
+        nodes = self._nodesList()
         if len(colors) < len(nodes):
             return
         
@@ -416,10 +1207,10 @@ class NetworkScene(QGraphicsScene):
                 node.setBrush(color)
 
     def nodesOverlayBrushes(self):
-        return [node.overlayBrush() for node in self.nodes()]
+        return [node.overlayBrush() for node in self._nodesList()]
 
     def setNodesOverlayBrushes(self, brushes: List[QBrush]):
-        nodes = self.nodes()
+        nodes = self._nodesList()
         if len(brushes) < len(nodes):
             return
 
@@ -432,30 +1223,46 @@ class NetworkScene(QGraphicsScene):
             node.setOverlayBrush(brush)
 
     def nodesRadii(self):
-        return [node.radius() if node.radius() != Config.Radius else 0 for node in self.nodes()]
+        radii = self._nodes_state.values('radius')
+        return np.where(radii != Config.Radius, radii, 0).tolist()
+
+    def nodesRadiiArray(self) -> np.ndarray:
+        """Return radii of nodes sorted by index."""
+
+        return self._nodes_state.values('radius')
 
     def setNodesRadii(self, radii):
-        nodes = self.nodes()
+        nodes = self._nodesList()
         if len(radii) < len(nodes):
             return
         
+        self._visible_extents = None
         for node in nodes:
             radius = radii[node.index()]
             node.setRadius(radius)
-            for edge in node.edges():
-                edge.adjust()
+        self.adjustEdges()
 
     def setSelectedNodesRadius(self, radius: int):
-        for node in self.selectedNodes():
+        nodes = self.selectedNodes()
+        for node in nodes:
             node.setRadius(radius)
-            for edge in node.edges():
-                edge.adjust()
+        self.adjustEdges({edge for node in nodes for edge in node.edges()})
 
     def nodesPolygons(self):
-        return [node.polygon() for node in self.nodes()]
+        return [_NODE_POLYGONS[polygon] for polygon in self._nodes_state.values('polygon').tolist()]
+
+    def nodesPolygonsArray(self) -> np.ndarray:
+        """Return ids of the polygons of nodes sorted by index, -1 for custom polygons."""
+
+        return self._nodes_state.values('polygon')
+
+    def edgesWidthsArray(self) -> np.ndarray:
+        """Return widths of edges sorted by index."""
+
+        return self._edges_state.values('width')
 
     def setNodesPolygons(self, polygons):
-        nodes = self.nodes()
+        nodes = self._nodesList()
         if len(polygons) < len(nodes):
             return
 
@@ -464,16 +1271,16 @@ class NetworkScene(QGraphicsScene):
             node.setPolygon(polygon)
 
     def setSelectedNodesPolygon(self, polygon: NodePolygon):
-        for node in self.selectedNodes():
+        nodes = self.selectedNodes()
+        for node in nodes:
             node.setPolygon(polygon)
-            for edge in node.edges():
-                edge.adjust()
+        self.adjustEdges({edge for node in nodes for edge in node.edges()})
 
     def lock(self, lock: bool = True):
         if lock == self._is_locked:
             return
         
-        for node in self.nodes():
+        for node in self._nodesList():
             node.setFlag(QGraphicsItem.ItemIsMovable, not lock)
         self._is_locked = lock
         self.locked.emit(lock)
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class SpatialIndex:
+    """Uniform grid of rectangles, built at once from an array of rectangles.
+
+    Rectangles are bucketed by their center, cells are stored contiguously row by row so that the cells of a row
+    overlapping a query are a single slice. Queries are grown by half of the largest rectangle to find rectangles
+    whose center is outside of the queried area."""
+
+    def __init__(self, rects: np.ndarray):
+        # Rectangles as rows of left, top, right, bottom coordinates
+        self._rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        count = len(self._rects)
+        if count == 0:
+            self._order = np.empty(0, dtype=np.intp)
+            return
+
+        centers = (self._rects[:, :2] + self._rects[:, 2:]) / 2
+        self._margin = (self._rects[:, 2:] - self._rects[:, :2]).max(axis=0) / 2
+        self._origin = centers.min(axis=0)
+        width, height = centers.max(axis=0) - self._origin
+
+        # About one rectangle per cell if rectangles are evenly spread, and never more cells than rectangles in a
+        # row or column
+        cell_size = np.sqrt(width * height / count)
+        self._cell_size = max(cell_size, width / count, height / count, 1e-6)
+        self._columns = int(width / self._cell_size) + 1
+        self._rows = int(height / self._cell_size) + 1
+
+        cells = np.floor((centers - self._origin) / self._cell_size).astype(np.intp)
+        np.clip(cells[:, 0], 0, self._columns - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, self._rows - 1, out=cells[:, 1])
+        cell_ids = cells[:, 1] * self._columns + cells[:, 0]
+        self._order = np.argsort(cell_ids, kind='stable')
+        self._starts = np.searchsorted(cell_ids[self._order], np.arange(self._rows * self._columns + 1))
+
+    def __len__(self):
+        return len(self._rects)
+
+    def rects(self) -> np.ndarray:
+        return self._rects
+
+    def _cellsRange(self, low: float, high: float, axis: int, size: int):
+        first = int(np.floor((low - self._margin[axis] - self._origin[axis]) / self._cell_size))
+        last = int(np.floor((high + self._margin[axis] - self._origin[axis]) / self._cell_size))
+        return max(first, 0), min(last, size - 1)
+
+    def query(self, left: float, top: float, right: float, bottom: float, contains: bool = False) -> np.ndarray:
+        """Return the sorted indexes of rectangles intersecting the given area, or fully contained in it if
+        `contains` is True."""
+
+        if len(self._order) == 0:
+            return self._order
+
+        first_column, last_column = self._cellsRange(left, right, 0, self._columns)
+        first_row, last_row = self._cellsRange(top, bottom, 1, self._rows)
+        if first_column > last_column or first_row > last_row:
+            return np.empty(0, dtype=np.intp)
+
+        starts = self._starts
+        candidates = np.concatenate([self._order[starts[row * self._columns + first_column]:
+                                                 starts[row * self._columns + last_column + 1]]
+                                     for row in range(first_row, last_row + 1)])
+        rects = self._rects[candidates]
+        if contains:
+            mask = (rects[:, 0] >= left) & (rects[:, 1] >= top) & (rects[:, 2] <= right) & (rects[:, 3] <= bottom)
+        else:
+            mask = (rects[:, 0] <= right) & (rects[:, 2] >= left) & (rects[:, 1] <= bottom) & (rects[:, 3] >= top)
+        return np.sort(candidates[mask])
@@ -1,6 +1,6 @@
 import sys
 
-from PySide6.QtCore import Signal, Qt
+from PySide6.QtCore import Signal, Qt, QRect
 from PySide6.QtGui import QPainter, QSurfaceFormat, QFocusEvent
 from PySide6.QtWidgets import QGraphicsView, QRubberBand, QFormLayout, QSizePolicy
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
@@ -101,6 +101,13 @@ class NetworkView(QGraphicsView):
         else:
             self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
 
+        # Rubber band selection is done with the spatial index of the scene instead of the scene's own index.
+        # The rubber band is a child of the viewport, so it must be created once the viewport has been set.
+        self._rubber_band = QRubberBand(QRubberBand.Rectangle, self.viewport())
+        self._rubber_band.hide()
+        self._rubber_band_origin = None
+        self._rubber_band_selection = []
+
         layout = QFormLayout(self)
         layout.setContentsMargins(0, 0, 6, 0)
         layout.setFormAlignment(Qt.AlignRight | Qt.AlignBottom)
@@ -131,15 +138,29 @@ class NetworkView(QGraphicsView):
         scene.layoutChanged.connect(self.on_layout_changed)
         scene.itemsVisibilityChanged.connect(self.on_items_visibility_changed)
 
+    def _hasItemAt(self, pos) -> bool:
+        scene = self.scene()
+        if scene is None:
+            return False
+
+        # Nodes and edges are looked up in the spatial indexes of the scene instead of the scene's BSP index
+        pos = self.mapToScene(pos)
+        return scene.nodeAt(pos) is not None or scene.edgeAt(pos) is not None
+
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton and not self.itemAt(event.position().toPoint()):
+        if event.button() == Qt.LeftButton and not self._hasItemAt(event.position().toPoint()):
             self.setDragMode(QGraphicsView.ScrollHandDrag)
         elif event.button() == Qt.RightButton:
-            if self.itemAt(event.position().toPoint()):
+            if self._hasItemAt(event.position().toPoint()):
                 return  # ignore event if right click occurs on an item to prevent selection to be lost
             else:
                 self.setDragMode(QGraphicsView.RubberBandDrag)
                 self.setRubberBandSelectionMode(Qt.IntersectsItemBoundingRect)
+                self._rubber_band_origin = event.position().toPoint()
+                if event.modifiers() & Qt.ControlModifier and self.scene() is not None:
+                    self._rubber_band_selection = self.scene().selectedNodes() + self.scene().selectedEdges()
+                else:
+                    self._rubber_band_selection = []
         super().mousePressEvent(event)
 
     def mouseReleaseEvent(self, event):
@@ -147,6 +168,9 @@ class NetworkView(QGraphicsView):
             super().mouseReleaseEvent(event)
             
         if event.button() == Qt.RightButton:
+            self._rubber_band.hide()
+            self._rubber_band_origin = None
+            self._rubber_band_selection = []
             self.setDragMode(QGraphicsView.NoDrag)
         elif event.button() == Qt.LeftButton:
             self.setDragMode(QGraphicsView.NoDrag)
@@ -157,9 +181,24 @@ class NetworkView(QGraphicsView):
         if self.dragMode() == QGraphicsView.ScrollHandDrag:
             self.minimap.adjustRubberband()
             self._is_moving = True
+        elif self.dragMode() == QGraphicsView.RubberBandDrag and self._rubber_band_origin is not None:
+            self._updateRubberBand(event.position().toPoint())
+            return
 
         super().mouseMoveEvent(event)
 
+    def _updateRubberBand(self, pos):
+        rect = QRect(self._rubber_band_origin, pos).normalized()
+        self._rubber_band.setGeometry(rect)
+        self._rubber_band.show()
+
+        scene = self.scene()
+        if scene is not None:
+            scene_rect = self.mapToScene(rect).boundingRect()
+            mode = self.rubberBandSelectionMode()
+            scene.setItemsSelection(self._rubber_band_selection + scene.nodesInRect(scene_rect, mode)
+                                    + scene.edgesInRect(scene_rect, mode))
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.minimap.adjustRubberband()
@@ -0,0 +1,41 @@
+import gc
+import resource
+import sys
+import tracemalloc
+
+import numpy as np
+
+from PySide6.QtWidgets import QApplication
+
+app = QApplication(sys.argv)
+
+if '--pure' in sys.argv:
+    from PySide6MolecularNetwork._pure import NetworkScene
+else:
+    from PySide6MolecularNetwork import NetworkScene
+
+count = 100000
+rng = np.random.default_rng(0)
+positions = rng.random((count, 2)) * 10000
+
+scene = NetworkScene()
+gc.collect()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+
+scene.createNodesFromArrays(np.arange(count), positions=positions)
+gc.collect()
+nodes_memory, _ = tracemalloc.get_traced_memory()
+
+scene.createEdgesFromArrays(np.arange(count), np.arange(count), (np.arange(count) + 1) % count)
+gc.collect()
+memory, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+# ru_maxrss is in kilobytes on Linux
+rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) * 1024
+
+print(f"{count} nodes and {count} edges")
+print(f"Python heap per node: {nodes_memory / count:.0f} bytes")
+print(f"Python heap per edge: {(memory - nodes_memory) / count:.0f} bytes")
+print(f"Resident memory per node and edge: {rss / count:.0f} bytes")
@@ -20,4 +20,103 @@ const std::function<int (qreal)> &func = [callable](qreal value) -> int
 
 };
 %CPPSELF.%FUNCTION_NAME(%1, %2, func, %4);
-// @snippet scene-setnodesradii
\ No newline at end of file
+// @snippet scene-setnodesradii
+// @snippet scene-setlayoutfromarray
+// layout and isolated_mask are bytes objects holding contiguous float64 (N, 2) and bool (N,) arrays
+char *layout = nullptr;
+char *isolated_mask = nullptr;
+Py_ssize_t layout_size = 0;
+Py_ssize_t isolated_mask_size = 0;
+if (PyBytes_AsStringAndSize(%PYARG_1, &layout, &layout_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_3, &isolated_mask, &isolated_mask_size) != -1) {
+    int size = int(layout_size / Py_ssize_t(2 * sizeof(qreal)));
+    if (isolated_mask_size < size)
+        PyErr_SetString(PyExc_ValueError, "isolated_mask must have one value per row of layout");
+    else
+        %CPPSELF.%FUNCTION_NAME(reinterpret_cast<const qreal *>(layout), size, %2,
+                                reinterpret_cast<const bool *>(isolated_mask));
+}
+// @snippet scene-setlayoutfromarray
+// @snippet scene-createnodesfromarrays
+// indexes, positions, radii and colors are bytes objects holding contiguous int32 (N,), float64 (N, 2),
+// int32 (N,) and uint32 (N,) arrays. Optional arrays are passed as empty bytes and labels as an empty list.
+char *indexes = nullptr;
+char *positions = nullptr;
+char *radii = nullptr;
+char *colors = nullptr;
+Py_ssize_t indexes_size = 0;
+Py_ssize_t positions_size = 0;
+Py_ssize_t radii_size = 0;
+Py_ssize_t colors_size = 0;
+if (PyBytes_AsStringAndSize(%PYARG_1, &indexes, &indexes_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_2, &positions, &positions_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_3, &radii, &radii_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_4, &colors, &colors_size) != -1) {
+    Py_ssize_t size = indexes_size / Py_ssize_t(sizeof(int));
+    if ((positions_size > 0 && positions_size < size * Py_ssize_t(2 * sizeof(qreal)))
+        || (radii_size > 0 && radii_size < size * Py_ssize_t(sizeof(int)))
+        || (colors_size > 0 && colors_size < size * Py_ssize_t(sizeof(QRgb)))
+        || (!%5.isEmpty() && %5.size() < size))
+        PyErr_SetString(PyExc_ValueError, "arrays must have one value per index");
+    else
+        %CPPSELF.%FUNCTION_NAME(reinterpret_cast<const int *>(indexes), int(size),
+                                positions_size > 0 ? reinterpret_cast<const qreal *>(positions) : nullptr,
+                                radii_size > 0 ? reinterpret_cast<const int *>(radii) : nullptr,
+                                colors_size > 0 ? reinterpret_cast<const QRgb *>(colors) : nullptr,
+                                %5);
+}
+// @snippet scene-createnodesfromarrays
+// @snippet scene-createedgesfromarrays
+// indexes, sources, dests and widths are bytes objects holding contiguous int32 (N,), int32 (N,),
+// int32 (N,) and float64 (N,) arrays. widths may be passed as empty bytes.
+char *indexes = nullptr;
+char *sources = nullptr;
+char *dests = nullptr;
+char *widths = nullptr;
+Py_ssize_t indexes_size = 0;
+Py_ssize_t sources_size = 0;
+Py_ssize_t dests_size = 0;
+Py_ssize_t widths_size = 0;
+if (PyBytes_AsStringAndSize(%PYARG_1, &indexes, &indexes_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_2, &sources, &sources_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_3, &dests, &dests_size) != -1
+    && PyBytes_AsStringAndSize(%PYARG_4, &widths, &widths_size) != -1) {
+    Py_ssize_t size = indexes_size / Py_ssize_t(sizeof(int));
+    if (sources_size < size * Py_ssize_t(sizeof(int))
+        || dests_size < size * Py_ssize_t(sizeof(int))
+        || (widths_size > 0 && widths_size < size * Py_ssize_t(sizeof(qreal))))
+        PyErr_SetString(PyExc_ValueError, "arrays must have one value per index");
+    else
+        %CPPSELF.%FUNCTION_NAME(reinterpret_cast<const int *>(indexes), int(size),
+                                reinterpret_cast<const int *>(sources),
+                                reinterpret_cast<const int *>(dests),
+                                widths_size > 0 ? reinterpret_cast<const qreal *>(widths) : nullptr);
+}
+// @snippet scene-createedgesfromarrays
+// @snippet scene-setpiechartsfromarray
+// values is a bytes object holding a contiguous float64 (N, columns) array
+char *values = nullptr;
+Py_ssize_t values_size = 0;
+if (PyBytes_AsStringAndSize(%PYARG_1, &values, &values_size) != -1) {
+    int rows = %2 > 0 ? int(values_size / Py_ssize_t(%2 * sizeof(qreal))) : 0;
+    %CPPSELF.%FUNCTION_NAME(reinterpret_cast<const qreal *>(values), rows, %2);
+}
+// @snippet scene-setpiechartsfromarray
+// @snippet scene-setitemsfromindexes
+// indexes is a bytes object holding a contiguous int32 (N,) array
+char *indexes = nullptr;
+Py_ssize_t indexes_size = 0;
+if (PyBytes_AsStringAndSize(%PYARG_1, &indexes, &indexes_size) != -1)
+    %CPPSELF.%FUNCTION_NAME(reinterpret_cast<const int *>(indexes), int(indexes_size / Py_ssize_t(sizeof(int))));
+// @snippet scene-setitemsfromindexes
+// @snippet scene-setitemsvisiblefromarrays
+// nodes and edges are bytes objects holding contiguous int32 (N,) arrays of indexes, or None to show all items
+char *nodes = nullptr;
+char *edges = nullptr;
+Py_ssize_t nodes_size = 0;
+Py_ssize_t edges_size = 0;
+if ((%PYARG_1 == Py_None || PyBytes_AsStringAndSize(%PYARG_1, &nodes, &nodes_size) != -1)
+    && (%PYARG_2 == Py_None || PyBytes_AsStringAndSize(%PYARG_2, &edges, &edges_size) != -1))
+    %CPPSELF.%FUNCTION_NAME(reinterpret_cast<const int *>(nodes), int(nodes_size / Py_ssize_t(sizeof(int))),
+                            reinterpret_cast<const int *>(edges), int(edges_size / Py_ssize_t(sizeof(int))));
+// @snippet scene-setitemsvisiblefromarrays
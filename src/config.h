@@ -12,7 +12,8 @@
 #endif
 
 enum Config: int {
-    Radius = 30
+    Radius = 30,
+    MinDepictionSize = 16
 };
 
 #endif // CONFIG_H
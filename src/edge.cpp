@@ -2,6 +2,7 @@
 #include "node.h"
 #include "networkscene.h"
 #include "style.h"
+#include "graphicsitem.h"
 
 #include <QtGui>
 #include <QtCore>
@@ -26,6 +27,16 @@ Edge::Edge(int index, Node *sourceNode, Node *destNode, qreal width)
     setZValue(0);
 }
 
+Edge::~Edge()
+{
+    invalidateLayer();
+
+    // Deleted items do not notify the scene, do not let it keep a dangling pointer
+    NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+    if (scene != nullptr)
+        scene->unregisterEdge(this);
+}
+
 int Edge::index()
 {
     return this->id;
@@ -62,6 +73,7 @@ void Edge::setPen(const QPen &pen)
     QPen new_pen = QPen(pen);
     new_pen.setWidthF(this->pen().widthF());
     QGraphicsPathItem::setPen(new_pen);
+    invalidateLayer();
 }
 
 qreal Edge::width()
@@ -81,6 +93,7 @@ void Edge::setWidth(qreal width)
         pen.setWidth(1);
     }
     QGraphicsPathItem::setPen(pen);
+    invalidateLayer();
 }
 
 bool Edge::isSelfLoop()
@@ -96,8 +109,6 @@ void Edge::adjust()
     QLineF line(mapFromItem(source, 0., 0.), mapFromItem(dest, 0., 0.));
     qreal length = line.length();
 
-    prepareGeometryChange();
-
     qreal min_len = source->radius() + dest->radius() + source->pen().widthF() + dest->pen().widthF();
 
     if (length > min_len) {
@@ -111,6 +122,24 @@ void Edge::adjust()
         sourcePoint = destPoint = line.p1();
     }
 
+    updatePath();
+}
+
+void Edge::setEndPoints(const QPointF &source, const QPointF &dest)
+{
+    // Self-loops also depend on the radius of their node, always rebuild them
+    if (source == sourcePoint && dest == destPoint && !path().isEmpty() && this->source != this->dest)
+        return;
+
+    sourcePoint = source;
+    destPoint = dest;
+    updatePath();
+}
+
+void Edge::updatePath()
+{
+    prepareGeometryChange();
+
     QPainterPath path;
 
     if (source == dest)
@@ -128,6 +157,18 @@ void Edge::adjust()
         path.lineTo(destPoint);
     }
     setPath(path);
+    invalidateLayer();
+
+    NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+    if (scene != nullptr)
+        scene->invalidateEdgesIndex();
+}
+
+void Edge::invalidateLayer()
+{
+    EdgesLayer *layer = dynamic_cast<EdgesLayer *>(parentItem());
+    if (layer != nullptr)
+        layer->invalidate();
 }
 
 void Edge::updateStyle(NetworkStyle *style, NetworkStyle *old)
@@ -144,6 +185,35 @@ QVariant Edge::itemChange(QGraphicsItem::GraphicsItemChange change, const QVaria
         setZValue(value.toBool() ? 5 : 0); // Bring item to front
         setCacheMode(cacheMode()); // Force redraw
     }
+    else if (change == QGraphicsItem::ItemSceneChange)
+    {
+        // Edge is removed from the scene, or moved to another one
+        NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+        if (scene != nullptr && value.value<QGraphicsScene *>() != scene)
+            scene->unregisterEdge(this);
+    }
+    else if (change == QGraphicsItem::ItemParentChange)
+    {
+        // The layer the edge leaves has to draw its batches again
+        invalidateLayer();
+    }
+    else if (change == QGraphicsItem::ItemSelectedHasChanged || change == QGraphicsItem::ItemParentHasChanged)
+    {
+        // Selected edges are not drawn by the edges layer, edges outside of a layer paint themselves
+        EdgesLayer *layer = dynamic_cast<EdgesLayer *>(parentItem());
+        if (layer != nullptr)
+            layer->updateEdge(this);
+        else if (change == QGraphicsItem::ItemParentHasChanged)
+            setFlag(ItemHasNoContents, false);
+
+        NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+        if (change == QGraphicsItem::ItemSelectedHasChanged && scene != nullptr)
+            scene->updateItemSelection(this);
+    }
+    else if (change == QGraphicsItem::ItemVisibleHasChanged)
+    {
+        invalidateLayer();
+    }
     return QGraphicsPathItem::itemChange(change, value);
 }
 
@@ -14,6 +14,7 @@ class QMN_EXPORT Edge : public QGraphicsPathItem
 {
 public:
     Edge(int index, Node *sourceNode, Node *destNode, qreal width=1.);
+    ~Edge() override;
 
     int index();
     Node *sourceNode() const;
@@ -25,6 +26,7 @@ public:
     void setDestNode(Node *node);
     bool isSelfLoop();
     void adjust();
+    void setEndPoints(const QPointF &source, const QPointF &dest);
 
     void updateStyle(NetworkStyle *style, NetworkStyle *old=nullptr);
     QVariant itemChange(QGraphicsItem::GraphicsItemChange change, const QVariant &value) override;
@@ -36,6 +38,11 @@ public:
     void paint(QPainter *painter, const QStyleOptionGraphicsItem *option, QWidget *widget) override;
 
 private:
+    friend class EdgesLayer;
+
+    void updatePath();
+    void invalidateLayer();
+
     int id;
     QPointF sourcePoint;
     QPointF destPoint;
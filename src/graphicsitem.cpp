@@ -0,0 +1,121 @@
+#include "graphicsitem.h"
+#include "edge.h"
+
+#include <QPainter>
+#include <QStyleOptionGraphicsItem>
+
+bool EdgesLayer::batchRendering() const
+{
+    return batch_rendering_;
+}
+
+void EdgesLayer::setBatchRendering(bool enabled)
+{
+    if (enabled == batch_rendering_)
+        return;
+
+    prepareGeometryChange();
+    batch_rendering_ = enabled;
+    dirty_ = true;
+    batches_.clear();
+    foreach (QGraphicsItem *item, childItems())
+        updateEdge(static_cast<Edge *>(item));
+}
+
+void EdgesLayer::updateEdge(Edge *edge)
+{
+    // Update flags of edge to let it paint itself only if it is not drawn by the layer
+    bool batched = batch_rendering_ && edge->parentItem() == this && !edge->isSelected() && !edge->isSelfLoop();
+    edge->setFlag(ItemHasNoContents, batched);
+    invalidate();
+}
+
+void EdgesLayer::invalidate()
+{
+    if (batch_rendering_ && !dirty_)
+    {
+        prepareGeometryChange();
+        dirty_ = true;
+    }
+}
+
+void EdgesLayer::updateBatches() const
+{
+    if (!dirty_)
+        return;
+    dirty_ = false;
+
+    batches_.clear();
+    qreal x_min = 0, y_min = 0, x_max = 0, y_max = 0, margin = 0;
+    bool empty = true;
+    foreach (QGraphicsItem *item, childItems())
+    {
+        if (!(item->flags() & ItemHasNoContents) || !item->isVisible())
+            continue;
+
+        Edge *edge = static_cast<Edge *>(item);
+        QLineF line(edge->sourcePoint, edge->destPoint);
+        if (line.isNull())
+            continue;
+
+        const QPen pen = edge->pen();
+        int i = 0;
+        while (i < batches_.size() && batches_[i].first != pen)
+            i++;
+        if (i == batches_.size())
+        {
+            batches_.append(qMakePair(pen, QVector<QLineF>()));
+            margin = qMax(margin, pen.widthF() / 2);
+        }
+        batches_[i].second.append(line);
+
+        if (empty)
+        {
+            x_min = x_max = line.x1();
+            y_min = y_max = line.y1();
+            empty = false;
+        }
+        x_min = qMin(x_min, qMin(line.x1(), line.x2()));
+        x_max = qMax(x_max, qMax(line.x1(), line.x2()));
+        y_min = qMin(y_min, qMin(line.y1(), line.y2()));
+        y_max = qMax(y_max, qMax(line.y1(), line.y2()));
+    }
+
+    if (empty)
+        rect_ = QRectF();
+    else
+        rect_ = QRectF(QPointF(x_min, y_min), QPointF(x_max, y_max)).adjusted(-margin, -margin, margin, margin);
+}
+
+QRectF EdgesLayer::boundingRect() const
+{
+    if (!batch_rendering_)
+        return GraphicsItemLayer::boundingRect();
+
+    updateBatches();
+    return rect_;
+}
+
+QPainterPath EdgesLayer::shape() const
+{
+    // The layer covers all batched edges but must not be picked in place of the background, edges are picked as
+    // individual items
+    return QPainterPath();
+}
+
+void EdgesLayer::paint(QPainter *painter, const QStyleOptionGraphicsItem *option, QWidget *)
+{
+    if (!batch_rendering_)
+        return;
+
+    // Same level of detail as the one used by edges to skip painting
+    if (option->levelOfDetailFromTransform(painter->worldTransform()) < 0.1)
+        return;
+
+    updateBatches();
+    for (const auto &batch: qAsConst(batches_))
+    {
+        painter->setPen(batch.first);
+        painter->drawLines(batch.second);
+    }
+}
@@ -2,8 +2,12 @@
 #define GRAPHICSITEM_H
 
 #include <QGraphicsItem>
+#include <QPen>
+#include <QPainterPath>
 #include "config.h"
 
+class Edge;
+
 class QMN_EXPORT GraphicsItemLayer : public QGraphicsItem
 {
 public:
@@ -17,4 +21,28 @@ public:
     }
 };
 
-#endif // GRAPHICSITEM_H
\ No newline at end of file
+// Layer holding the edges of a scene. In batch rendering mode, unselected straight edges do not paint
+// themselves: the layer draws all of them at once, with one drawLines call per pen. Edges are still
+// individual items that can be picked and selected.
+class QMN_EXPORT EdgesLayer : public GraphicsItemLayer
+{
+public:
+    bool batchRendering() const;
+    void setBatchRendering(bool enabled=true);
+    void updateEdge(Edge *edge);
+    void invalidate();
+
+    QRectF boundingRect() const override;
+    QPainterPath shape() const override;
+    void paint(QPainter *painter, const QStyleOptionGraphicsItem *option, QWidget *widget) override;
+
+private:
+    void updateBatches() const;
+
+    bool batch_rendering_ = false;
+    mutable bool dirty_ = true;
+    mutable QRectF rect_;
+    mutable QList<QPair<QPen, QVector<QLineF>>> batches_;
+};
+
+#endif // GRAPHICSITEM_H
@@ -0,0 +1,90 @@
+#include "label_metrics.h"
+
+#include <QFontMetrics>
+#include <QHash>
+#include <QQueue>
+
+namespace {
+
+struct FontLabels
+{
+    explicit FontLabels(const QFont &font) : metrics(font), height(metrics.height()) {}
+
+    QFontMetrics metrics;
+    int height;
+    QHash<QString, QRectF> rects;
+    QQueue<QString> order;  // Texts in insertion order, for eviction
+};
+
+QHash<QFont, FontLabels *> fonts;
+int label_capacity = 65536;
+
+FontLabels *entry(const QFont &font)
+{
+    FontLabels *labels = fonts.value(font, nullptr);
+    if (labels == nullptr)
+    {
+        labels = new FontLabels(font);
+        fonts.insert(font, labels);
+    }
+    return labels;
+}
+
+void trim(FontLabels *labels)
+{
+    while (labels->rects.size() > label_capacity)
+        labels->rects.remove(labels->order.dequeue());
+}
+
+QRectF rectOf(FontLabels *labels, const QString &text)
+{
+    auto it = labels->rects.constFind(text);
+    if (it != labels->rects.constEnd())
+        return it.value();
+
+    int width = labels->metrics.horizontalAdvance(text);
+    int height = labels->height;
+    QRectF rect = QRectF(-width/2, -height/2, width, height);
+    labels->rects.insert(text, rect);
+    labels->order.enqueue(text);
+    return rect;
+}
+
+}
+
+int LabelMetrics::capacity()
+{
+    return label_capacity;
+}
+
+void LabelMetrics::setCapacity(int n)
+{
+    label_capacity = qMax(n, 1);
+    for (FontLabels *labels: qAsConst(fonts))
+        trim(labels);
+}
+
+void LabelMetrics::clear()
+{
+    qDeleteAll(fonts);
+    fonts.clear();
+}
+
+QRectF LabelMetrics::labelRect(const QFont &font, const QString &text)
+{
+    FontLabels *labels = entry(font);
+    QRectF rect = rectOf(labels, text);
+    trim(labels);
+    return rect;
+}
+
+QList<QRectF> LabelMetrics::labelRects(const QFont &font, const QList<QString> &texts)
+{
+    FontLabels *labels = entry(font);
+    QList<QRectF> rects;
+    rects.reserve(texts.size());
+    for (const QString &text: texts)
+        rects.append(rectOf(labels, text));
+    trim(labels);
+    return rects;
+}
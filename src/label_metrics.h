@@ -0,0 +1,21 @@
+#ifndef LABEL_METRICS_H
+#define LABEL_METRICS_H
+
+#include <QFont>
+#include <QList>
+#include <QRectF>
+#include <QString>
+
+// Rectangles of node labels memoised by font and text, shared by all scenes.
+// One QFontMetrics is kept per font. Once the capacity is reached for a font, oldest texts are evicted first.
+class LabelMetrics
+{
+public:
+    static int capacity();
+    static void setCapacity(int n);
+    static void clear();
+    static QRectF labelRect(const QFont &font, const QString &text);
+    static QList<QRectF> labelRects(const QFont &font, const QList<QString> &texts);
+};
+
+#endif // LABEL_METRICS_H
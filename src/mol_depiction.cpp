@@ -1,37 +1,54 @@
 #include "mol_depiction.h"
+#include "networkscene.h"
+
+#include <algorithm>
 
 #include <QByteArray>
+#include <QCache>
+#include <QCryptographicHash>
+#include <QDir>
+#include <QFileInfo>
+#include <QMutex>
+#include <QMutexLocker>
+#include <QSaveFile>
 #include <QtSvg/QSvgRenderer>
 #include <QPixmap>
 #include <QPainter>
 
+#include <RDGeneral/versions.h>
 #include <GraphMol/SmilesParse/SmilesParse.h>
+#include <GraphMol/SmilesParse/SmilesWrite.h>
 #include <GraphMol/Depictor/RDDepictor.h>
 #include <GraphMol/MolDraw2D/MolDraw2DSVG.h>
 #include <GraphMol/inchi.h>
 
-QPixmap SvgToPixmap(const QByteArray &svg_data, const QSize &size)
+QImage SvgToImage(const QByteArray &svg_data, const QSize &size)
 {
     if (size.isNull())
-            return QPixmap();
+        return QImage();
 
-     QSvgRenderer svgRenderer(svg_data);
-     QPixmap pixmap(size);
-     QPainter painter;
+    QSvgRenderer svgRenderer(svg_data);
+    QImage image(size, QImage::Format_ARGB32_Premultiplied);
+    QPainter painter;
 
-     pixmap.fill(Qt::transparent);
-     painter.begin(&pixmap);
-     svgRenderer.render(&painter);
-     painter.end();
+    image.fill(Qt::transparent);
+    painter.begin(&image);
+    svgRenderer.render(&painter);
+    painter.end();
 
-     return pixmap;
+    return image;
 }
 
-QPixmap MolToPixmap(RDKit::ROMol &mol, const QSize &size)
+QPixmap SvgToPixmap(const QByteArray &svg_data, const QSize &size)
 {
     if (size.isNull())
         return QPixmap();
 
+    return QPixmap::fromImage(SvgToImage(svg_data, size));
+}
+
+QByteArray MolToSvg(RDKit::ROMol &mol, const QSize &size)
+{
     if (!mol.getNumConformers())
         RDDepict::compute2DCoords( mol, nullptr, true );
     RDKit::MolDraw2DSVG svg_drawer(size.width(), size.height());
@@ -39,8 +56,15 @@ QPixmap MolToPixmap(RDKit::ROMol &mol, const QSize &size)
     svg_drawer.drawMolecule( mol );
     svg_drawer.finishDrawing();
     std::string drawing_text = svg_drawer.getDrawingText();
-    QByteArray svg_data(drawing_text.c_str(), drawing_text.length());
-    return SvgToPixmap(svg_data, size);
+    return QByteArray(drawing_text.c_str(), drawing_text.length());
+}
+
+QPixmap MolToPixmap(RDKit::ROMol &mol, const QSize &size)
+{
+    if (size.isNull())
+        return QPixmap();
+
+    return SvgToPixmap(MolToSvg(mol, size), size);
 }
 
 QPixmap SmilesToPixmap(const QString &smiles, const QSize &size)
@@ -74,3 +98,234 @@ QPixmap InchiToPixmap(const QString &inchi, const QSize &size)
     }
     return QPixmap();
 }
+
+static int depictionType(const QString &text, int type)
+{
+    if (type != NetworkScene::PixmapsAuto)
+        return type;
+    if (text.startsWith(QString("b64=")))
+        return NetworkScene::PixmapsBase64;
+    if (text.startsWith(QString("<?xml")) || text.startsWith(QString("<svg")))
+        return NetworkScene::PixmapsSvg;
+    if (text.startsWith(QString("InChI=")))
+        return NetworkScene::PixmapsInchi;
+    return NetworkScene::PixmapsSmiles;
+}
+
+QVector<int> DepictionTypes(const QStringList &texts, int type, int sample_size)
+{
+    if (type != NetworkScene::PixmapsAuto || texts.isEmpty())
+        return QVector<int>(texts.size(), type);
+
+    // Columns usually hold a single type of depiction: if a sample of rows agree, only check that all rows have
+    // the expected prefix
+    int n = std::min(sample_size, static_cast<int>(texts.size()));
+    int column_type = depictionType(texts.first(), type);
+    bool homogeneous = true;
+    for (int i=1; i<n && homogeneous; i++) {
+        int row = static_cast<int>(qint64(i) * (texts.size() - 1) / (n - 1));
+        homogeneous = depictionType(texts[row], type) == column_type;
+    }
+
+    if (homogeneous && (column_type == NetworkScene::PixmapsInchi || column_type == NetworkScene::PixmapsBase64)) {
+        QString prefix = column_type == NetworkScene::PixmapsInchi ? QString("InChI=") : QString("b64=");
+        if (std::all_of(texts.cbegin(), texts.cend(), [&prefix](const QString &text) { return text.startsWith(prefix); }))
+            return QVector<int>(texts.size(), column_type);
+    }
+
+    QVector<int> types(texts.size());
+    for (int i=0; i<texts.size(); i++)
+        types[i] = depictionType(texts[i], type);
+    return types;
+}
+
+QImage DepictionToImage(const QString &text, int type, const QSize &size)
+{
+    if (size.isNull() || text.isEmpty())
+        return QImage();
+
+    type = depictionType(text, type);
+    if (type == NetworkScene::PixmapsBase64) {
+        QImage image;
+        image.loadFromData(QByteArray::fromBase64(text.startsWith(QString("b64=")) ? text.mid(4).toUtf8() : text.toUtf8()));
+        return image;
+    } else if (type == NetworkScene::PixmapsSvg) {
+        return SvgToImage(text.toUtf8(), size);
+    }
+
+    try
+    {
+        std::shared_ptr<RDKit::ROMol> mol;
+        if (type == NetworkScene::PixmapsInchi) {
+            RDKit::ExtraInchiReturnValues rv;
+            mol.reset(RDKit::InchiToMol( text.toStdString(), rv ));
+        } else {
+            mol.reset(RDKit::SmilesToMol( text.toStdString() ));
+        }
+        if (mol != nullptr)
+            return SvgToImage(MolToSvg(*mol, size), size);
+    } catch( ... ) {
+    }
+
+    return QImage();
+}
+
+// Options used to draw molecules, part of the keys of cached depictions
+static const char *DRAWING_OPTIONS = "clearBackground=0";
+
+static QMutex cache_mutex;
+static QCache<QString, QImage> cache_images(102400);
+// Keys of depictions that failed, so that they are not parsed again
+static QCache<QString, bool> cache_failures(65536);
+// Canonical structures of SMILES, so that they are not parsed again to compute keys
+static QCache<QString, QString> cache_structures(65536);
+static QString cache_directory;
+
+// Return the canonical structure of `text`. If SMILES had to be parsed, `parsed` is set and the molecule is
+// given in `mol`, null if parsing failed, so that it can be drawn without being parsed again.
+static QString canonicalStructure(const QString &text, int type, std::shared_ptr<RDKit::ROMol> *mol = nullptr,
+                                  bool *parsed = nullptr)
+{
+    // Different SMILES of the same molecule share the same depiction
+    if (type != NetworkScene::PixmapsSmiles)
+        return text;
+
+    {
+        QMutexLocker locker(&cache_mutex);
+        QString *cached = cache_structures.object(text);
+        if (cached != nullptr)
+            return *cached;
+    }
+
+    std::shared_ptr<RDKit::ROMol> smiles_mol;
+    try
+    {
+        smiles_mol.reset(RDKit::SmilesToMol( text.toStdString() ));
+    } catch( ... ) {
+    }
+    QString structure = smiles_mol != nullptr ? QString::fromStdString(RDKit::MolToSmiles(*smiles_mol)) : text;
+    {
+        QMutexLocker locker(&cache_mutex);
+        cache_structures.insert(text, new QString(structure));
+    }
+
+    if (mol != nullptr)
+        *mol = smiles_mol;
+    if (parsed != nullptr)
+        *parsed = true;
+    return structure;
+}
+
+static QString depictionKey(int type, const QSize &size, const QString &structure)
+{
+    QStringList parts = {QString(RDKit::rdkitVersion), QString(DRAWING_OPTIONS), QString::number(type),
+                         QString("%1x%2").arg(size.width()).arg(size.height()), structure};
+    return QString(QCryptographicHash::hash(parts.join('|').toUtf8(), QCryptographicHash::Sha1).toHex());
+}
+
+int DepictionCache::cacheLimit()
+{
+    QMutexLocker locker(&cache_mutex);
+    return cache_images.maxCost();
+}
+
+void DepictionCache::setCacheLimit(int n)
+{
+    QMutexLocker locker(&cache_mutex);
+    cache_images.setMaxCost(n);
+}
+
+QString DepictionCache::directory()
+{
+    QMutexLocker locker(&cache_mutex);
+    return cache_directory;
+}
+
+void DepictionCache::setDirectory(const QString &path)
+{
+    if (!path.isEmpty())
+        QDir().mkpath(path);
+
+    QMutexLocker locker(&cache_mutex);
+    cache_directory = path;
+}
+
+void DepictionCache::clear()
+{
+    QMutexLocker locker(&cache_mutex);
+    cache_images.clear();
+    cache_failures.clear();
+}
+
+QString DepictionCache::key(const QString &text, int type, const QSize &size)
+{
+    type = depictionType(text, type);
+    return depictionKey(type, size, canonicalStructure(text, type));
+}
+
+bool DepictionCache::hasStructure(const QString &text, int type)
+{
+    // Whether the key of `text` is computed without parsing it
+    if (depictionType(text, type) != NetworkScene::PixmapsSmiles)
+        return true;
+
+    QMutexLocker locker(&cache_mutex);
+    return cache_structures.contains(text);
+}
+
+QImage DepictionCache::image(const QString &text, int type, const QSize &size)
+{
+    if (size.isNull() || text.isEmpty())
+        return QImage();
+
+    // SMILES are parsed at most once: the molecule gives the canonical structure of the key and is drawn if the
+    // depiction is not found in cache
+    type = depictionType(text, type);
+    std::shared_ptr<RDKit::ROMol> mol;
+    bool parsed = false;
+    QString key = depictionKey(type, size, canonicalStructure(text, type, &mol, &parsed));
+    QString path;
+    {
+        QMutexLocker locker(&cache_mutex);
+        QImage *cached = cache_images.object(key);
+        if (cached != nullptr)
+            return *cached;
+        if (cache_failures.contains(key))
+            return QImage();
+        if (!cache_directory.isEmpty())
+            path = QDir(cache_directory).filePath(key + ".png");
+    }
+
+    QImage image;
+    if (!path.isEmpty() && QFileInfo::exists(path))
+        image.load(path);
+    if (image.isNull() && (!parsed || mol != nullptr)) {
+        if (mol != nullptr) {
+            try
+            {
+                image = SvgToImage(MolToSvg(*mol, size), size);
+            } catch( ... ) {
+            }
+        } else {
+            image = DepictionToImage(text, type, size);
+        }
+        if (!path.isEmpty() && !image.isNull()) {
+            QSaveFile file(path);
+            if (file.open(QIODevice::WriteOnly) && image.save(&file, "PNG"))
+                file.commit();
+        }
+    }
+
+    QMutexLocker locker(&cache_mutex);
+    if (!image.isNull())
+        cache_images.insert(key, new QImage(image), static_cast<int>(image.sizeInBytes() / 1024));
+    else
+        cache_failures.insert(key, new bool(true));
+    return image;
+}
+
+QPixmap DepictionCache::pixmap(const QString &text, int type, const QSize &size)
+{
+    QImage image = DepictionCache::image(text, type, size);
+    return image.isNull() ? QPixmap() : QPixmap::fromImage(image);
+}
@@ -1,11 +1,30 @@
 #ifndef MOL_DEPICTION_H
 #define MOL_DEPICTION_H
 
+#include <QImage>
 #include <QPixmap>
 #include <QSize>
+#include <QStringList>
+#include <QVector>
 
 QPixmap SvgToPixmap(const QByteArray &svg_data, const QSize &size);
 QPixmap SmilesToPixmap(const QString &smiles, const QSize &size);
 QPixmap InchiToPixmap(const QString &inchi, const QSize &size);
+QImage DepictionToImage(const QString &text, int type, const QSize &size);
+QVector<int> DepictionTypes(const QStringList &texts, int type, int sample_size = 64);
+
+class DepictionCache
+{
+public:
+    static int cacheLimit();
+    static void setCacheLimit(int n);
+    static QString directory();
+    static void setDirectory(const QString &path);
+    static void clear();
+    static QString key(const QString &text, int type, const QSize &size);
+    static bool hasStructure(const QString &text, int type);
+    static QImage image(const QString &text, int type, const QSize &size);
+    static QPixmap pixmap(const QString &text, int type, const QSize &size);
+};
 
 #endif // MOL_DEPICTION_H
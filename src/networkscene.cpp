@@ -1,9 +1,15 @@
 #include <algorithm>
 
+#include <QElapsedTimer>
+#include <QGraphicsView>
+#include <QStyleOptionGraphicsItem>
+
 #include "networkscene.h"
 #include "edge.h"
 #include "style.h"
 #include "config.h"
+#include "mol_depiction.h"
+#include "label_metrics.h"
 
 bool NodeLessThan(Node *n1, Node *n2)
 {
@@ -53,8 +59,31 @@ void NetworkScene::clear()
 {
     QGraphicsScene::clear();
 
+    nodes_map_.clear();
+    edges_map_.clear();
+    sorted_nodes_.clear();
+    sorted_edges_.clear();
+    sorted_nodes_valid_ = true;
+    sorted_edges_valid_ = true;
+    pending_edges_.clear();
+    edges_hidden_by_nodes_.clear();
+    pending_depictions_.clear();
+    depicted_nodes_.clear();
+    depicted_order_.clear();
+    depicted_pixmaps_.clear();
+    depictions_cost_ = 0;
+    evicted_depictions_.clear();
+    shared_pixmaps_.clear();
+    nodes_pixmap_keys_.clear();
+    selected_nodes_.clear();
+    selected_edges_.clear();
+    invalidateNodesIndex();
+    invalidateEdgesIndex();
+    visible_extents_valid_ = false;
+
     nodesLayer = new GraphicsItemLayer;
-    edgesLayer = new GraphicsItemLayer;
+    edgesLayer = new EdgesLayer;
+    edgesLayer->setBatchRendering(edges_batch_rendering_);
 
     addItem(nodesLayer);
     nodesLayer->setZValue(1);
@@ -64,25 +93,88 @@ void NetworkScene::clear()
 
 void NetworkScene::render(QPainter *painter, const QRectF &target, const QRectF &source, Qt::AspectRatioMode aspectRatioMode)
 {
+    flushEdgesAdjustment();
     foreach(Node* node, nodes())
     {
         node->setCacheMode(QGraphicsItem::NoCache);
     }
+    depictions_synchronous_ = true;
     QGraphicsScene::render(painter, target, source, aspectRatioMode);
+    depictions_synchronous_ = false;
     foreach(Node* node, nodes())
     {
         node->setCacheMode(QGraphicsItem::DeviceCoordinateCache);
     }
 }
 
+void NetworkScene::registerNode(Node *node)
+{
+    int index = node->index();
+    if (sorted_nodes_valid_ && (sorted_nodes_.isEmpty() || sorted_nodes_.last()->index() < index))
+        sorted_nodes_.append(node);
+    else
+        sorted_nodes_valid_ = false;
+    nodes_map_.insert(index, node);
+    invalidateNodesIndex();
+    visible_extents_valid_ = false;
+    if (node->isSelected())
+        selected_nodes_.insert(node, index);
+}
+
+void NetworkScene::unregisterNode(Node *node)
+{
+    int index = node->index();
+    if (nodes_map_.value(index) == node)
+    {
+        nodes_map_.remove(index);
+        sorted_nodes_valid_ = false;
+    }
+    invalidateNodesIndex();
+    visible_extents_valid_ = false;
+    selected_nodes_.remove(node);
+    pending_depictions_.remove(node);
+    evicted_depictions_.remove(node);
+    forgetDepiction(node);
+    releaseSharedPixmap(node);
+}
+
+void NetworkScene::registerEdge(Edge *edge)
+{
+    int index = edge->index();
+    if (sorted_edges_valid_ && (sorted_edges_.isEmpty() || sorted_edges_.last()->index() < index))
+        sorted_edges_.append(edge);
+    else
+        sorted_edges_valid_ = false;
+    edges_map_.insert(index, edge);
+    invalidateEdgesIndex();
+    if (edge->isSelected())
+        selected_edges_.insert(edge, index);
+}
+
+void NetworkScene::unregisterEdge(Edge *edge)
+{
+    int index = edge->index();
+    if (edges_map_.value(index) == edge)
+    {
+        edges_map_.remove(index);
+        sorted_edges_valid_ = false;
+    }
+    invalidateEdgesIndex();
+    selected_edges_.remove(edge);
+    pending_edges_.remove(edge);
+    edges_hidden_by_nodes_.remove(edge);
+}
+
 void NetworkScene::addNode(Node *node)
 {
     node->setParentItem(nodesLayer);
+    registerNode(node);
 }
 
 void NetworkScene::addEdge(Edge *edge)
 {
     edge->setParentItem(edgesLayer);
+    registerEdge(edge);
 }
 
 void NetworkScene::addNodes(QList<Node *> nodes)
@@ -90,6 +182,7 @@ void NetworkScene::addNodes(QList<Node *> nodes)
     foreach(Node* node, nodes)
     {
         node->setParentItem(nodesLayer);
+        registerNode(node);
     }
 }
 
@@ -98,6 +191,7 @@ void NetworkScene::addEdges(QList<Edge *> edges)
     foreach(Edge* edge, edges)
     {
         edge->setParentItem(edgesLayer);
+        registerEdge(edge);
     }
 }
 
@@ -139,6 +233,7 @@ QList<Node *> NetworkScene::createNodes(QList<int> indexes, QList<QString> label
         }
 
         node->setParentItem(nodesLayer);
+        registerNode(node);
         nodes.append(node);
     }
 
@@ -154,13 +249,90 @@ QList<Edge *> NetworkScene::createEdges(QList<int> indexes, QList<Node *> source
         if (this->style_ != nullptr)
             edge->updateStyle(this->style_);
         edge->setParentItem(edgesLayer);
-        edge->adjust();
+        registerEdge(edge);
         edges.append(edge);
     }
 
+    adjustEdges(edges);
+
     return edges;
 }
 
+void NetworkScene::createNodesFromArrays(const int *indexes, int size, const qreal *positions, const int *radii,
+                                         const QRgb *colors, const QList<QString> &labels)
+{
+    if (size <= 0)
+        return;
+
+    // Labels are optional, the bindings reject lists holding fewer labels than indexes
+    const bool has_labels = labels.size() >= size;
+    QBrush brush;
+    QColor text_color;
+    QPen pen;
+    QFont font;
+    if (this->style_ != nullptr)
+    {
+        brush = this->style_->nodeBrush();
+        text_color = this->style_->nodeTextColor();
+        pen = this->style_->nodePen();
+        font = this->style_->nodeFont();
+    }
+
+    nodes_map_.reserve(nodes_map_.size() + size);
+    for (int i=0; i<size; i++) {
+        Node *node = has_labels ? new Node(indexes[i], labels[i]) : new Node(indexes[i]);
+
+        if (positions != nullptr)
+            node->setPos(positions[2*i], positions[2*i+1]);
+
+        if (this->style_ != nullptr)
+        {
+            node->setBrush(brush, false);
+            node->setTextColor(text_color);
+            node->setPen(pen);
+            node->setFont(font);
+        }
+
+        if (colors != nullptr && qAlpha(colors[i]) > 0)
+            node->setBrush(QColor::fromRgba(colors[i]));
+
+        if (radii != nullptr && radii[i] > 0)
+            node->setRadius(radii[i]);
+
+        node->setParentItem(nodesLayer);
+        registerNode(node);
+    }
+}
+
+void NetworkScene::createEdgesFromArrays(const int *indexes, int size, const int *sources, const int *dests, const qreal *widths)
+{
+    if (size <= 0)
+        return;
+
+    QPen pen;
+    if (this->style_ != nullptr)
+        pen = this->style_->edgePen();
+
+    QList<Edge *> edges;
+    edges.reserve(size);
+    edges_map_.reserve(edges_map_.size() + size);
+    for (int i=0; i<size; i++) {
+        Node *source = nodes_map_.value(sources[i]);
+        Node *dest = nodes_map_.value(dests[i]);
+        if (!source || !dest)
+            continue;
+
+        Edge *edge = new Edge(indexes[i], source, dest, widths != nullptr ? widths[i] : 1.);
+        if (this->style_ != nullptr)
+            edge->setPen(pen);
+        edge->setParentItem(edgesLayer);
+        registerEdge(edge);
+        edges.append(edge);
+    }
+
+    adjustEdges(edges);
+}
+
 void NetworkScene::removeAllNodes()
 {
     foreach(Node* node, nodes())
@@ -195,47 +367,171 @@ void NetworkScene::removeEdges(QList<Edge *> edges)
 
 QList<Node *> NetworkScene::nodes() const
 {
-    QList<Node *> nodes;
-    
-    foreach(QGraphicsItem *item, nodesLayer->childItems())
+    if (!sorted_nodes_valid_)
     {
-        nodes.append(qgraphicsitem_cast<Node *>(item));
+        sorted_nodes_ = nodes_map_.values();
+        std::sort(sorted_nodes_.begin(), sorted_nodes_.end(), NodeLessThan);
+        sorted_nodes_valid_ = true;
     }
 
-    std::sort(nodes.begin(), nodes.end(), NodeLessThan);
+    return sorted_nodes_;
+}
 
-    return nodes;
+Node *NetworkScene::node(int index) const
+{
+    return nodes_map_.value(index, nullptr);
 }
 
 QList<Node *> NetworkScene::selectedNodes() const
 {
     QList<Node *> nodes;
-    foreach(QGraphicsItem *item, selectedItems())
+    foreach(int index, selectedNodesIndexes())
+        nodes.append(nodes_map_.value(index));
+    return nodes;
+}
+
+QList<int> NetworkScene::selectedNodesIndexes() const
+{
+    QList<int> indexes = selected_nodes_.values();
+    std::sort(indexes.begin(), indexes.end());
+    return indexes;
+}
+
+void NetworkScene::updateItemSelection(QGraphicsItem *item)
+{
+    Node *node = qgraphicsitem_cast<Node *>(item);
+    if (node != nullptr)
     {
-        if (nodesLayer->isAncestorOf(item))
-            nodes.append(qgraphicsitem_cast<Node *>(item));
+        if (nodes_map_.value(node->index()) != node)
+            return;
+        if (node->isSelected())
+            selected_nodes_.insert(node, node->index());
+        else
+            selected_nodes_.remove(node);
+        return;
+    }
+
+    Edge *edge = qgraphicsitem_cast<Edge *>(item);
+    if (edge != nullptr)
+    {
+        if (edges_map_.value(edge->index()) != edge)
+            return;
+        if (edge->isSelected())
+            selected_edges_.insert(edge, edge->index());
+        else
+            selected_edges_.remove(edge);
     }
-    return nodes;
 }
 
-void NetworkScene::setNodesSelection(QList<int> indexes)
+void NetworkScene::setItemsSelection(const QList<QGraphicsItem *> &items)
 {
-    clearSelection();
-    QList<Node *> nodes = this->nodes();
-    foreach (int index, indexes)
+    // Items are selected with signals blocked, so that selectionChanged is emitted only once. Items already in
+    // the right state are left untouched.
+    QSet<QGraphicsItem *> keep(items.cbegin(), items.cend());
+    bool changed = false;
+    bool blocked = blockSignals(true);
+    foreach (QGraphicsItem *item, selectedItems())
     {
-        if (0 <= index && index < nodes.size())
-            nodes[index]->setSelected(true);
+        if (!keep.contains(item))
+        {
+            item->setSelected(false);
+            changed = true;
+        }
+    }
+    foreach (QGraphicsItem *item, items)
+    {
+        if (!item->isSelected())
+        {
+            item->setSelected(true);
+            changed = changed || item->isSelected();
+        }
     }
+    blockSignals(blocked);
+
+    if (changed && !blocked)
+        emit selectionChanged();
+}
+
+void NetworkScene::setNodesSelection(QList<int> indexes)
+{
+    setNodesSelectionFromArray(indexes.constData(), indexes.size());
 }
 
 void NetworkScene::setNodesSelection(QList<Node *> nodes)
 {
-    clearSelection();
+    QList<QGraphicsItem *> items;
+    items.reserve(nodes.size());
     foreach (Node *node, nodes)
+        items.append(node);
+    setItemsSelection(items);
+}
+
+void NetworkScene::setNodesSelectionFromArray(const int *indexes, int size)
+{
+    QList<QGraphicsItem *> items;
+    items.reserve(size);
+    for (int i=0; i<size; i++)
+    {
+        Node *node = nodes_map_.value(indexes[i], nullptr);
+        if (node != nullptr)
+            items.append(node);
+    }
+    setItemsSelection(items);
+}
+
+void NetworkScene::invalidateNodesIndex()
+{
+    nodes_index_valid_ = false;
+    indexed_nodes_.clear();
+}
+
+void NetworkScene::buildNodesIndex()
+{
+    if (nodes_index_valid_)
+        return;
+
+    indexed_nodes_ = nodes();
+    QVector<QRectF> rects;
+    rects.reserve(indexed_nodes_.size());
+    foreach (Node *node, indexed_nodes_)
+        rects.append(node->sceneBoundingRect());
+    nodes_index_ = SpatialIndex(rects);
+    nodes_index_valid_ = true;
+}
+
+static bool isPickable(Node *node)
+{
+    // Isolated nodes are not painted and can't be picked
+    return node->isVisible() && !(node->flags() & QGraphicsItem::ItemHasNoContents);
+}
+
+Node *NetworkScene::nodeAt(const QPointF &pos)
+{
+    buildNodesIndex();
+
+    Node *found = nullptr;
+    foreach (int i, nodes_index_.query(QRectF(pos, pos)))
+    {
+        Node *node = indexed_nodes_[i];
+        if (isPickable(node) && (found == nullptr || node->zValue() >= found->zValue())
+                && node->contains(node->mapFromScene(pos)))
+            found = node;
+    }
+    return found;
+}
+
+QList<Node *> NetworkScene::nodesInRect(const QRectF &rect, Qt::ItemSelectionMode mode)
+{
+    buildNodesIndex();
+
+    QList<Node *> nodes;
+    bool contains = mode == Qt::ContainsItemBoundingRect || mode == Qt::ContainsItemShape;
+    foreach (int i, nodes_index_.query(rect, contains))
     {
-        node->setSelected(true);
+        if (isPickable(indexed_nodes_[i]))
+            nodes.append(indexed_nodes_[i]);
     }
+    return nodes;
 }
 
 QRectF NetworkScene::selectedNodesBoundingRect()
@@ -248,138 +544,330 @@ QRectF NetworkScene::selectedNodesBoundingRect()
 
 QRectF NetworkScene::visibleNodesBoundingRect()
 {
-    QRectF boundingRect;
-    foreach (Node* node, nodes())
+    if (!visible_extents_valid_)
+        computeVisibleExtents();
+
+    if (visible_extents_nodes_[0] == nullptr)
+        return QRectF();
+    return QRectF(QPointF(visible_extents_[0], visible_extents_[1]), QPointF(visible_extents_[2], visible_extents_[3]));
+}
+
+void NetworkScene::updateVisibleNodesBoundingRect(Node *node)
+{
+    if (!visible_extents_valid_)
+        return;
+
+    if (std::find(visible_extents_nodes_, visible_extents_nodes_ + 4, node) != visible_extents_nodes_ + 4)
+        visible_extents_valid_ = false;
+    else if (isPickable(node))
+    {
+        qreal coords[4];
+        node->sceneBoundingRect().getCoords(&coords[0], &coords[1], &coords[2], &coords[3]);
+        for (int side=0; side<4; side++)
+        {
+            if (side < 2 ? coords[side] < visible_extents_[side] : coords[side] > visible_extents_[side])
+            {
+                visible_extents_[side] = coords[side];
+                visible_extents_nodes_[side] = node;
+            }
+        }
+    }
+}
+
+void NetworkScene::computeVisibleExtents()
+{
+    std::fill(visible_extents_nodes_, visible_extents_nodes_ + 4, nullptr);
+    foreach (Node *node, nodes())
     {
-        if (node->isVisible() and !(node->flags() & QGraphicsItem::ItemHasNoContents))
-            boundingRect |= node->sceneBoundingRect();
+        if (!isPickable(node))
+            continue;
+
+        qreal coords[4];
+        node->sceneBoundingRect().getCoords(&coords[0], &coords[1], &coords[2], &coords[3]);
+        for (int side=0; side<4; side++)
+        {
+            if (visible_extents_nodes_[side] == nullptr
+                    || (side < 2 ? coords[side] < visible_extents_[side] : coords[side] > visible_extents_[side]))
+            {
+                visible_extents_[side] = coords[side];
+                visible_extents_nodes_[side] = node;
+            }
+        }
     }
-    return boundingRect;
+    visible_extents_valid_ = true;
 }
 
 QList<Edge *> NetworkScene::edges() const
 {
-    QList<Edge *> edges;
-    foreach(QGraphicsItem *item, edgesLayer->childItems())
+    if (!sorted_edges_valid_)
     {
-        edges.append(qgraphicsitem_cast<Edge *>(item));
+        sorted_edges_ = edges_map_.values();
+        std::sort(sorted_edges_.begin(), sorted_edges_.end(), EdgeLessThan);
+        sorted_edges_valid_ = true;
     }
 
-    std::sort(edges.begin(), edges.end(), EdgeLessThan);
+    return sorted_edges_;
+}
 
-    return edges;
+Edge *NetworkScene::edge(int index) const
+{
+    return edges_map_.value(index, nullptr);
 }
 
 QList<Edge *> NetworkScene::selectedEdges() const
 {
     QList<Edge *> edges;
-    foreach(QGraphicsItem *item, selectedItems())
-    {
-        if (edgesLayer->isAncestorOf(item))
-            edges.append(qgraphicsitem_cast<Edge *>(item));
-    }
+    foreach(int index, selectedEdgesIndexes())
+        edges.append(edges_map_.value(index));
     return edges;
 }
 
+QList<int> NetworkScene::selectedEdgesIndexes() const
+{
+    QList<int> indexes = selected_edges_.values();
+    std::sort(indexes.begin(), indexes.end());
+    return indexes;
+}
+
 void NetworkScene::setEdgesSelection(QList<int> indexes)
 {
-    clearSelection();
-    foreach(Edge * edge, edges())
-    {
-        if (indexes.contains(edge->index()))
-            edge->setSelected(true);
-    }
+    setEdgesSelectionFromArray(indexes.constData(), indexes.size());
 }
 
 void NetworkScene::setEdgesSelection(QList<Edge *> edges)
 {
-    clearSelection();
+    QList<QGraphicsItem *> items;
+    items.reserve(edges.size());
     foreach (Edge *edge, edges)
+        items.append(edge);
+    setItemsSelection(items);
+}
+
+void NetworkScene::setEdgesSelectionFromArray(const int *indexes, int size)
+{
+    QList<QGraphicsItem *> items;
+    items.reserve(size);
+    for (int i=0; i<size; i++)
     {
-        edge->setSelected(true);
+        Edge *edge = edges_map_.value(indexes[i], nullptr);
+        if (edge != nullptr)
+            items.append(edge);
     }
+    setItemsSelection(items);
 }
 
-void NetworkScene::setLayout(QList<QPointF> layout, qreal scale, QList<int> isolated_nodes)
+void NetworkScene::invalidateEdgesIndex()
 {
-    if (scale <= 0)
-        scale = this->scale_;
-
-    QList<Node *> nodes = this->nodes();
-    int j;
+    edges_index_valid_ = false;
+    indexed_edges_.clear();
+}
 
-    if (layout.size() < nodes.size())
+void NetworkScene::buildEdgesIndex()
+{
+    if (edges_index_valid_)
         return;
 
-    for (int i=0; i<nodes.size(); i++) {
-        Node *node = nodes[i];
-        j = node->index();
-        if (isolated_nodes.contains(j))
-        {
-            node->setFlag(QGraphicsItem::ItemHasNoContents, true);
-            node->setFlag(QGraphicsItem::ItemIsSelectable, false);
-            node->setFlag(QGraphicsItem::ItemIsMovable, false);
-            node->setFlag(QGraphicsItem::ItemIgnoresTransformations, true);
-        }
-        else
-        {
-            node->setFlag(QGraphicsItem::ItemHasNoContents, false);
-            node->setFlag(QGraphicsItem::ItemIsSelectable, true);
-            node->setFlag(QGraphicsItem::ItemIsMovable, !is_locked);
-            node->setFlag(QGraphicsItem::ItemIgnoresTransformations, false);
-            node->setFlag(QGraphicsItem::ItemSendsScenePositionChanges, false);
-            node->setPos(layout[j] * scale);
-            node->setFlag(QGraphicsItem::ItemSendsScenePositionChanges, true);
-        }
+    indexed_edges_ = edges();
+    QVector<QRectF> rects;
+    rects.reserve(indexed_edges_.size());
+    foreach (Edge *edge, indexed_edges_)
+        rects.append(edge->sceneBoundingRect());
+    edges_index_ = SpatialIndex(rects);
+    edges_index_valid_ = true;
+}
+
+Edge *NetworkScene::edgeAt(const QPointF &pos)
+{
+    buildEdgesIndex();
+
+    Edge *found = nullptr;
+    foreach (int i, edges_index_.query(QRectF(pos, pos)))
+    {
+        Edge *edge = indexed_edges_[i];
+        if (edge->isVisible() && (found == nullptr || edge->zValue() >= found->zValue())
+                && edge->contains(edge->mapFromScene(pos)))
+            found = edge;
     }
+    return found;
+}
 
-    foreach(Edge* edge, edges())
+QList<Edge *> NetworkScene::edgesInRect(const QRectF &rect, Qt::ItemSelectionMode mode)
+{
+    buildEdgesIndex();
+
+    QList<Edge *> edges;
+    bool contains = mode == Qt::ContainsItemBoundingRect || mode == Qt::ContainsItemShape;
+    foreach (int i, edges_index_.query(rect, contains))
     {
-        edge->adjust();
+        if (indexed_edges_[i]->isVisible())
+            edges.append(indexed_edges_[i]);
     }
+    return edges;
+}
 
-    emit this->layoutChanged();
+QVector<bool> IsolatedMask(const QList<int> &isolated_nodes, int size)
+{
+    QVector<bool> mask(size, false);
+    foreach (int index, isolated_nodes)
+    {
+        if (0 <= index && index < size)
+            mask[index] = true;
+    }
+    return mask;
+}
+
+void NetworkScene::setLayout(QList<QPointF> layout, qreal scale, QList<int> isolated_nodes)
+{
+    QVector<qreal> positions(2*layout.size());
+    for (int i=0; i<layout.size(); i++) {
+        positions[2*i] = layout[i].x();
+        positions[2*i+1] = layout[i].y();
+    }
+
+    setLayoutFromArray(positions.constData(), layout.size(), scale,
+                       IsolatedMask(isolated_nodes, layout.size()).constData());
 }
 
 void NetworkScene::setLayout(QList<qreal> layout, qreal scale, QList<int> isolated_nodes)
+{
+    setLayoutFromArray(layout.constData(), layout.size() / 2, scale,
+                       IsolatedMask(isolated_nodes, layout.size() / 2).constData());
+}
+
+void NetworkScene::setLayoutFromArray(const qreal *layout, int size, qreal scale, const bool *isolated_mask)
 {
     if (scale <= 0)
         scale = this->scale_;
 
-    QList<Node *> nodes(this->nodes());
-    int j;
+    QList<Node *> nodes = this->nodes();
 
-    if (layout.size() < 2*nodes.size())
+    if (size < nodes.size())
         return;
 
-    for (int i=0; i<nodes.size(); i++) {
-        Node *node = nodes[i];
-        j = node->index();
-        if (isolated_nodes.contains(j))
-        {
-            node->setFlag(QGraphicsItem::ItemHasNoContents, true);
-            node->setFlag(QGraphicsItem::ItemIgnoresTransformations, true);
-            node->setFlag(QGraphicsItem::ItemIsSelectable, false);
-            node->setFlag(QGraphicsItem::ItemIsMovable, false);
-        }
+    visible_extents_valid_ = false;
+
+    const QGraphicsItem::GraphicsItemFlags isolated_set = QGraphicsItem::ItemHasNoContents | QGraphicsItem::ItemIgnoresTransformations;
+    const QGraphicsItem::GraphicsItemFlags isolated_unset = QGraphicsItem::ItemIsSelectable | QGraphicsItem::ItemIsMovable;
+    QGraphicsItem::GraphicsItemFlags connected_set = QGraphicsItem::ItemIsSelectable;
+    QGraphicsItem::GraphicsItemFlags connected_unset = isolated_set;
+    if (is_locked)
+        connected_unset |= QGraphicsItem::ItemIsMovable;
+    else
+        connected_set |= QGraphicsItem::ItemIsMovable;
+
+    // Edges are adjusted all at once when every node has been moved
+    edges_adjustment_suspended_ = true;
+    foreach (Node *node, nodes)
+    {
+        int j = node->index();
+        if (j < 0 || j >= size)
+            continue;
+
+        QGraphicsItem::GraphicsItemFlags flags = node->flags();
+        QGraphicsItem::GraphicsItemFlags new_flags;
+        if (isolated_mask != nullptr && isolated_mask[j])
+            new_flags = (flags | isolated_set) & ~isolated_unset;
         else
         {
-            node->setFlag(QGraphicsItem::ItemHasNoContents, false);
-            node->setFlag(QGraphicsItem::ItemIgnoresTransformations, false);
-            node->setFlag(QGraphicsItem::ItemIsSelectable, true);
-            node->setFlag(QGraphicsItem::ItemIsMovable, !is_locked);
-            node->setFlag(QGraphicsItem::ItemSendsScenePositionChanges, false);
-            node->setPos(layout[j*2] * scale, layout[j*2+1] * scale);
-            node->setFlag(QGraphicsItem::ItemSendsScenePositionChanges);
+            new_flags = (flags | connected_set) & ~connected_unset;
+            node->setPos(layout[2*j] * scale, layout[2*j+1] * scale);
         }
+
+        if (new_flags != flags)
+            node->setFlags(new_flags);
     }
+    edges_adjustment_suspended_ = false;
 
-    foreach(Edge* edge, edges())
+    adjustEdges();
+    invalidateNodesIndex();
+
+    emit this->layoutChanged();
+}
+
+bool NetworkScene::edgesAdjustmentSuspended() const
+{
+    return edges_adjustment_suspended_;
+}
+
+bool NetworkScene::edgesAdjustmentSynchronous() const
+{
+    return edges_adjustment_synchronous_;
+}
+
+void NetworkScene::setEdgesAdjustmentSynchronous(bool synchronous)
+{
+    edges_adjustment_synchronous_ = synchronous;
+    if (synchronous)
+        flushEdgesAdjustment();
+}
+
+void NetworkScene::scheduleEdgesAdjustment(const QList<Edge *> &edges)
+{
+    if (edges_adjustment_synchronous_)
     {
-        edge->adjust();
+        adjustEdges(edges);
+        return;
     }
 
-    emit this->layoutChanged();
+    foreach (Edge *edge, edges)
+        pending_edges_.insert(edge);
+
+    if (!pending_edges_.isEmpty() && !edges_adjustment_timer_.isActive())
+        edges_adjustment_timer_.start(0, this);
+}
+
+void NetworkScene::flushEdgesAdjustment()
+{
+    edges_adjustment_timer_.stop();
+    if (!pending_edges_.isEmpty())
+    {
+        QList<Edge *> edges = pending_edges_.values();
+        pending_edges_.clear();
+        adjustEdges(edges);
+    }
+}
+
+void NetworkScene::timerEvent(QTimerEvent *event)
+{
+    if (event->timerId() == edges_adjustment_timer_.timerId())
+        flushEdgesAdjustment();
+    else if (event->timerId() == depictions_timer_.timerId())
+        processDepictions();
+    else
+        QGraphicsScene::timerEvent(event);
+}
+
+void NetworkScene::adjustEdges()
+{
+    adjustEdges(edges());
+}
+
+void NetworkScene::adjustEdges(const QList<Edge *> &edges)
+{
+    // Nodes and edges live in untransformed layers, so node positions are also edges coordinates
+    foreach (Edge *edge, edges)
+    {
+        Node *source = edge->sourceNode();
+        Node *dest = edge->destNode();
+        if (!source || !dest)
+            continue;
+
+        const QPointF p1 = source->pos();
+        const QPointF p2 = dest->pos();
+        const int source_radius = source->radius();
+        const qreal source_width = source->pen().widthF();
+        const int dest_radius = dest->radius();
+        const qreal dest_width = dest->pen().widthF();
+
+        const QPointF delta = p2 - p1;
+        const qreal length = QLineF(p1, p2).length();
+
+        if (length > source_radius + dest_radius + source_width + dest_width)
+            edge->setEndPoints(p1 + (delta * (source_radius/2 + source_width + 1)) / length,
+                               p2 - (delta * (dest_radius/2 + dest_width + 1)) / length);
+        else
+            edge->setEndPoints(p1, p1);
+    }
 }
 
 qreal NetworkScene::scale()
@@ -392,77 +880,94 @@ void NetworkScene::setScale(qreal scale)
     if (scale <= 0)
         scale = 1;
 
+    visible_extents_valid_ = false;
+    edges_adjustment_suspended_ = true;
     foreach (Node* node, this->nodes()) {
-        node->setFlag(QGraphicsItem::ItemSendsScenePositionChanges, false);
         node->setPos(node->pos() * scale / this->scale_);
-        node->setFlag(QGraphicsItem::ItemSendsScenePositionChanges);
     }
+    edges_adjustment_suspended_ = false;
 
-    foreach(Edge* edge, edges())
-    {
-        edge->adjust();
-    }
+    adjustEdges();
 
     this->scale_ = scale;
     emit this->scaleChanged(scale);
 }
 
-void NetworkScene::setLabelsFromModel(QAbstractItemModel *model, int column_id, int role)
+void NetworkScene::setNodesLabels(const QList<Node *> &nodes, const QList<QString> &labels)
 {
-    foreach (Node* node, this->nodes()) {
-        QVariant label = model->index(node->index(), column_id).data(role);
-        node->setLabel(label.toString());
+    // Nodes are grouped by font, usually the one of the style, so that label rects of each group are computed at
+    // once with the same font metrics
+    QHash<QFont, QList<int>> groups;
+    for (int i=0; i<nodes.size(); i++)
+        groups[nodes[i]->font()].append(i);
+
+    for (auto it = groups.constBegin(); it != groups.constEnd(); ++it) {
+        QList<QString> group_labels;
+        group_labels.reserve(it.value().size());
+        for (int i: it.value())
+            group_labels.append(labels[i]);
+
+        QList<QRectF> rects = LabelMetrics::labelRects(it.key(), group_labels);
+        for (int j=0; j<it.value().size(); j++)
+            nodes[it.value()[j]]->setLabel(group_labels[j], rects[j]);
     }
 }
 
+void NetworkScene::setLabelsFromModel(QAbstractItemModel *model, int column_id, int role)
+{
+    QList<Node *> nodes = this->nodes();
+    QList<QString> labels;
+    labels.reserve(nodes.size());
+    for (Node *node: nodes)
+        labels.append(model->index(node->index(), column_id).data(role).toString());
+    setNodesLabels(nodes, labels);
+}
+
 void NetworkScene::setLabels(QList<QString> labels)
 {
-    auto nodes = this->nodes();
-    for (int i=0; i<nodes.size(); i++) {
-        if (labels.size() == nodes.size())
-            nodes[i]->setLabel(labels[i]);
-    }
+    QList<Node *> nodes = this->nodes();
+    if (labels.size() == nodes.size())
+        setNodesLabels(nodes, labels);
 }
 
 void NetworkScene::resetLabels()
 {
-    foreach (Node* node, this->nodes()) {
-        QString label = QString::number(node->index() + 1);
-        node->setLabel(label);
-    }
+    QList<Node *> nodes = this->nodes();
+    QList<QString> labels;
+    labels.reserve(nodes.size());
+    for (Node *node: nodes)
+        labels.append(QString::number(node->index() + 1));
+    setNodesLabels(nodes, labels);
 }
 
 void NetworkScene::setNodesRadiiFromModel(QAbstractItemModel *model, int column_id, int role)
 {
+    visible_extents_valid_ = false;
     foreach (Node* node, this->nodes()) {
         node->setRadius(model->index(node->index(), column_id).data(role).toInt());
     }
 
-    foreach (Edge* edge, this->edges()) {
-        edge->adjust();
-    }
+    adjustEdges();
 }
 
 void NetworkScene::setNodesRadiiFromModel(QAbstractItemModel *model, int column_id, const std::function<int (qreal)> &func, int role)
 {
+    visible_extents_valid_ = false;
     foreach (Node* node, this->nodes()) {
         node->setRadius(func(model->index(node->index(), column_id).data(role).toReal()));
     }
 
-    foreach (Edge* edge, this->edges()) {
-        edge->adjust();
-    }
+    adjustEdges();
 }
 
 void NetworkScene::resetNodesRadii()
 {
+    visible_extents_valid_ = false;
     foreach (Node* node, this->nodes()) {
         node->setRadius(Config::Radius);
     }
 
-    foreach (Edge* edge, this->edges()) {
-        edge->adjust();
-    }
+    adjustEdges();
 }
 
 QList<QColor> NetworkScene::pieColors()
@@ -473,6 +978,11 @@ QList<QColor> NetworkScene::pieColors()
 void NetworkScene::setPieColors(QList<QColor> colors)
 {
     this->colors_ = colors;
+    foreach(Node* node, nodes())
+    {
+        if (!node->pie().isEmpty())
+            node->update();
+    }
 }
 
 void NetworkScene::setPieChartsFromModel(QAbstractItemModel *model, QList<int> column_ids, int role)
@@ -489,6 +999,35 @@ void NetworkScene::setPieChartsFromModel(QAbstractItemModel *model, QList<int> c
     }
 }
 
+void NetworkScene::setPieChartsFromArray(const qreal *values, int rows, int columns)
+{
+    QList<Node *> nodes = this->nodes();
+
+    if (rows < nodes.size() || columns < 0)
+        return;
+
+    // Each row is normalized once here, rows which do not sum to a positive value give empty pie charts
+    foreach (Node* node, nodes) {
+        int i = node->index();
+        if (i >= rows)
+            continue;
+
+        const qreal *row = values + qsizetype(i) * columns;
+        qreal sum = 0;
+        for (int j=0; j<columns; j++)
+            sum += row[j];
+
+        QList<qreal> pie;
+        if (sum > 0)
+        {
+            pie.reserve(columns);
+            for (int j=0; j<columns; j++)
+                pie.append(row[j] / sum);
+        }
+        node->setNormalizedPie(pie);
+    }
+}
+
 void NetworkScene::resetPieCharts()
 {
     foreach (Node* node, this->nodes()) {
@@ -512,28 +1051,232 @@ void NetworkScene::setPieChartsVisibility(bool visibility)
 
 void NetworkScene::setPixmapsFromModel(QAbstractItemModel *model, int column_id, int role, int type)
 {
+    QList<Node*> nodes;
+    QStringList texts;
     foreach (Node* node, this->nodes()) {
         QVariant data = model->index(node->index(), column_id).data(role);
         if (!data.isValid())
             continue;
-        QString text = data.toString();
+        nodes.append(node);
+        texts.append(data.toString());
+    }
 
-        if (type == NetworkScene::PixmapsBase64 || (type == NetworkScene::PixmapsAuto && text.startsWith(QString("b64="))))
-        {
-            if (text.startsWith(QString("b64=")))
-                node->setPixmapFromBase64(text.mid(4).toUtf8());
+    // Type is detected for the whole column at once, then rows are processed by type
+    QVector<int> types = DepictionTypes(texts, type);
+    if (lazy_pixmaps_) {
+        for (int i=0; i<nodes.size(); i++)
+            nodes[i]->setDepiction(texts[i], types[i]);
+        return;
+    }
+
+    for (int pixmap_type: {PixmapsBase64, PixmapsSvg, PixmapsInchi, PixmapsSmiles}) {
+        for (int i=0; i<nodes.size(); i++) {
+            if (types[i] != pixmap_type)
+                continue;
+
+            const QString &text = texts[i];
+            if (pixmap_type == PixmapsBase64)
+                nodes[i]->setPixmapFromBase64(text.startsWith(QString("b64=")) ? text.mid(4).toUtf8() : text.toUtf8());
+            else if (pixmap_type == PixmapsSvg)
+                nodes[i]->setPixmapFromSvg(text.toUtf8());
+            else if (pixmap_type == PixmapsInchi)
+                nodes[i]->setPixmapFromInchi(text);
             else
-                node->setPixmapFromBase64(text.toUtf8());
+                nodes[i]->setPixmapFromSmiles(text);
+        }
+    }
+}
+
+bool NetworkScene::lazyPixmaps() const
+{
+    return lazy_pixmaps_;
+}
+
+void NetworkScene::setLazyPixmaps(bool lazy)
+{
+    // In lazy mode, setPixmapsFromModel only keeps structures on nodes. Pixmaps are generated when nodes are
+    // first painted at a level of detail high enough to show them, and for nodes just outside of the views.
+    lazy_pixmaps_ = lazy;
+}
+
+void NetworkScene::requestDepiction(Node *node, const QSize &size)
+{
+    // Schedule generation of the pixmap of node from its depiction, at size (maximum size by default)
+    if (node->depiction().isEmpty())
+        return;
+
+    if (depictions_synchronous_)
+    {
+        renderDepiction(node, size);
+        return;
+    }
+
+    if (!pending_depictions_.contains(node) || size.width() > pending_depictions_.value(node).width())
+        pending_depictions_.insert(node, size);
+    if (!depictions_timer_.isActive())
+    {
+        evicted_depictions_.clear();
+        depictions_timer_.start(0, this);
+    }
+}
+
+void NetworkScene::flushDepictions()
+{
+    depictions_timer_.stop();
+    QHash<Node *, QSize> depictions = pending_depictions_;
+    pending_depictions_.clear();
+    for (auto it = depictions.cbegin(); it != depictions.cend(); ++it)
+        renderDepiction(it.key(), it.value());
+}
+
+QPixmap NetworkScene::sharedPixmap(Node *node, const QString &text, int type, const QSize &size)
+{
+    // Nodes with identical depictions share the same pixmap, which is kept until no node uses it. Structures not
+    // seen yet are rendered first, SMILES are then parsed once for both the depiction and its key.
+    bool rendered = !DepictionCache::hasStructure(text, type);
+    QImage image = rendered ? DepictionCache::image(text, type, size) : QImage();
+    QString key = DepictionCache::key(text, type, size);
+    if (nodes_pixmap_keys_.value(node) == key && shared_pixmaps_.contains(key))
+        return shared_pixmaps_.value(key).first;
+
+    if (!shared_pixmaps_.contains(key)) {
+        if (!rendered)
+            image = DepictionCache::image(text, type, size);
+        shared_pixmaps_.insert(key, qMakePair(image.isNull() ? QPixmap() : QPixmap::fromImage(image), 0));
+    }
+    releaseSharedPixmap(node);
+    shared_pixmaps_[key].second += 1;
+    nodes_pixmap_keys_.insert(node, key);
+    return shared_pixmaps_.value(key).first;
+}
+
+void NetworkScene::releaseSharedPixmap(Node *node)
+{
+    if (!nodes_pixmap_keys_.contains(node))
+        return;
+
+    QString key = nodes_pixmap_keys_.take(node);
+    shared_pixmaps_[key].second -= 1;
+    if (shared_pixmaps_.value(key).second <= 0)
+        shared_pixmaps_.remove(key);
+}
+
+int NetworkScene::sharedPixmapsCount() const
+{
+    return shared_pixmaps_.size();
+}
+
+int NetworkScene::depictionsMemoryLimit() const
+{
+    // Maximum memory used by pixmaps generated from depictions, in kilobytes
+    return depictions_memory_limit_;
+}
+
+void NetworkScene::setDepictionsMemoryLimit(int limit)
+{
+    depictions_memory_limit_ = limit;
+    trimDepictions();
+}
+
+void NetworkScene::renderDepiction(Node *node, const QSize &size)
+{
+    node->renderDepiction(size);
+
+    // Keep track of memory used by pixmaps, a pixmap shared by several nodes is only counted once, until no
+    // depicted node uses it anymore
+    forgetDepiction(node);
+    QPixmap pixmap = node->pixmap();
+    if (!pixmap.isNull())
+    {
+        qint64 key = pixmap.cacheKey();
+        if (!depicted_pixmaps_.contains(key))
+        {
+            int cost = static_cast<int>(static_cast<qint64>(pixmap.width()) * pixmap.height() * pixmap.depth() / 8 / 1024);
+            depicted_pixmaps_.insert(key, qMakePair(cost, 0));
+            depictions_cost_ += cost;
         }
-        else if (type == NetworkScene::PixmapsSvg || (type == NetworkScene::PixmapsAuto && (text.startsWith(QString("<?xml")) || text.startsWith("<svg"))))
-            node->setPixmapFromSvg(text.toUtf8());
-        else if (type == NetworkScene::PixmapsInchi || (type == NetworkScene::PixmapsAuto && text.startsWith(QString("InChI="))))
-            node->setPixmapFromInchi(text);
-        else if (type == NetworkScene::PixmapsSmiles || type == NetworkScene::PixmapsAuto)
-            node->setPixmapFromSmiles(text);
+        depicted_pixmaps_[key].second += 1;
+        quint64 serial = depictions_serial_++;
+        depicted_nodes_.insert(node, qMakePair(serial, key));
+        depicted_order_[serial] = node;
+    }
+    trimDepictions();
+}
+
+void NetworkScene::forgetDepiction(Node *node)
+{
+    if (!depicted_nodes_.contains(node))
+        return;
+
+    QPair<quint64, qint64> entry = depicted_nodes_.take(node);
+    depicted_order_.erase(entry.first);
+    QPair<int, int> &depicted = depicted_pixmaps_[entry.second];
+    depicted.second -= 1;
+    if (depicted.second <= 0)
+    {
+        depictions_cost_ -= depicted.first;
+        depicted_pixmaps_.remove(entry.second);
+    }
+}
+
+void NetworkScene::trimDepictions()
+{
+    // Release least recently rendered pixmaps until memory limit is respected, but keep the last one
+    while (depictions_cost_ > depictions_memory_limit_ && depicted_order_.size() > 1)
+    {
+        Node *node = depicted_order_.begin()->second;
+        forgetDepiction(node);
+        node->releaseDepiction();
+        evicted_depictions_.insert(node);
+    }
+}
+
+void NetworkScene::processDepictions(qint64 budget)
+{
+    // Generate requested pixmaps until time budget (in milliseconds) is elapsed, then let the event loop run
+    QElapsedTimer timer;
+    timer.start();
+    while (!pending_depictions_.isEmpty())
+    {
+        auto it = pending_depictions_.begin();
+        Node *node = it.key();
+        QSize size = it.value();
+        pending_depictions_.erase(it);
+        renderDepiction(node, size);
+        if (timer.elapsed() > budget)
+            return;
+    }
+
+    // Once pixmaps had to be released to respect the memory limit, nothing more fits: prefetching would release
+    // other pixmaps to be requested again, and never end
+    if (!evicted_depictions_.isEmpty() || !prefetchDepictions())
+    {
+        depictions_timer_.stop();
+        evicted_depictions_.clear();
     }
 }
 
+bool NetworkScene::prefetchDepictions()
+{
+    // Request depictions of nodes in the surroundings of the views, so that they are ready when scrolling
+    foreach (QGraphicsView *view, views())
+    {
+        qreal lod = QStyleOptionGraphicsItem::levelOfDetailFromTransform(view->viewportTransform());
+        if (lod < lod_thresholds_[NetworkScene::DetailPixmaps])
+            continue;
+
+        QRectF rect = view->mapToScene(view->viewport()->rect()).boundingRect();
+        rect.adjust(-rect.width() / 2, -rect.height() / 2, rect.width() / 2, rect.height() / 2);
+        foreach (Node *node, nodesInRect(rect))
+        {
+            if (node->hasPendingDepiction() && !evicted_depictions_.contains(node))
+                pending_depictions_.insert(node, node->depictionSize(lod));
+        }
+    }
+
+    return !pending_depictions_.isEmpty();
+}
+
 bool NetworkScene::pixmapVisibility()
 {
     return this->pixmap_visibility;
@@ -550,9 +1293,45 @@ void NetworkScene::setPixmapVisibility(bool visibility)
 
 void NetworkScene::resetPixmaps()
 {
+    depictions_timer_.stop();
+    pending_depictions_.clear();
+    depicted_nodes_.clear();
+    depicted_order_.clear();
+    depicted_pixmaps_.clear();
+    depictions_cost_ = 0;
+    evicted_depictions_.clear();
     foreach (Node* node, this->nodes()) {
         node->setPixmap(QPixmap());
     }
+    shared_pixmaps_.clear();
+    nodes_pixmap_keys_.clear();
+}
+
+qreal NetworkScene::levelOfDetailThreshold(int detail) const
+{
+    return lod_thresholds_[detail];
+}
+
+void NetworkScene::setLevelOfDetailThreshold(int detail, qreal threshold)
+{
+    if (threshold != lod_thresholds_[detail])
+    {
+        lod_thresholds_[detail] = threshold;
+        foreach(Node* node, nodes())
+            node->update();
+    }
+}
+
+bool NetworkScene::edgesBatchRendering() const
+{
+    return edges_batch_rendering_;
+}
+
+void NetworkScene::setEdgesBatchRendering(bool enabled)
+{
+    // Let the edges layer draw all unselected straight edges at once instead of painting edges one by one
+    edges_batch_rendering_ = enabled;
+    edgesLayer->setBatchRendering(enabled);
 }
 
 void NetworkScene::hideItems(QList<QGraphicsItem *> items)
@@ -586,20 +1365,120 @@ void NetworkScene::hideSelectedItems()
 
 void NetworkScene::showAllItems()
 {
-    foreach(QGraphicsItem *item, items())
-    {
-        item->show();
-    }
+    QList<int> indexes = nodes_map_.keys();
+    QSet<int> nodes_indexes(indexes.cbegin(), indexes.cend());
+    indexes = edges_map_.keys();
+    QSet<int> edges_indexes(indexes.cbegin(), indexes.cend());
+    setItemsVisibility(&nodes_indexes, &edges_indexes);
     emit this->itemsVisibilityChanged();
 }
 
 void NetworkScene::hideAllItems()
 {
-    foreach(QGraphicsItem *item, items())
+    QSet<int> nodes_indexes;
+    QSet<int> edges_indexes;
+    setItemsVisibility(&nodes_indexes, &edges_indexes);
+    emit this->itemsVisibilityChanged();
+}
+
+bool NetworkScene::setItemsVisibility(const QSet<int> *nodes_indexes, const QSet<int> *edges_indexes)
+{
+    // Nodes are shown or hidden first, then edges are shown only if both of their ends are visible. If
+    // nodes_indexes is null, visibility of nodes is left untouched. If edges_indexes is null, only edges with a
+    // hidden end are hidden, and edges hidden that way are shown again once both of their ends are visible, the
+    // visibility of other edges is left untouched. Only items whose visibility changes are updated.
+    bool changed = false;
+    if (nodes_indexes != nullptr)
     {
-        item->hide();
+        // Extents of visible nodes are computed again once instead of being updated for each node
+        visible_extents_valid_ = false;
+        for (auto it = nodes_map_.cbegin(); it != nodes_map_.cend(); ++it)
+        {
+            bool visible = nodes_indexes->contains(it.key());
+            if (it.value()->isVisible() != visible)
+            {
+                it.value()->setVisible(visible);
+                changed = true;
+            }
+        }
     }
-    emit this->itemsVisibilityChanged();
+
+    if (edges_indexes != nullptr)
+    {
+        edges_hidden_by_nodes_.clear();
+        for (auto it = edges_map_.cbegin(); it != edges_map_.cend(); ++it)
+        {
+            Edge *edge = it.value();
+            bool visible = edges_indexes->contains(it.key());
+            if (visible && !(edge->sourceNode()->isVisible() && edge->destNode()->isVisible()))
+            {
+                edges_hidden_by_nodes_.insert(edge);
+                visible = false;
+            }
+            if (edge->isVisible() != visible)
+            {
+                edge->setVisible(visible);
+                changed = true;
+            }
+        }
+    }
+    else
+    {
+        for (Edge *edge: qAsConst(edges_map_))
+        {
+            bool ends_visible = edge->sourceNode()->isVisible() && edge->destNode()->isVisible();
+            if (edge->isVisible() && !ends_visible)
+            {
+                edges_hidden_by_nodes_.insert(edge);
+                edge->setVisible(false);
+                changed = true;
+            }
+            else if (ends_visible && edges_hidden_by_nodes_.remove(edge) && !edge->isVisible())
+            {
+                edge->setVisible(true);
+                changed = true;
+            }
+        }
+    }
+    return changed;
+}
+
+void NetworkScene::setNodesVisibleFromArray(const int *indexes, int size)
+{
+    QSet<int> nodes_indexes(indexes, indexes + size);
+    if (setItemsVisibility(&nodes_indexes, nullptr))
+        emit this->itemsVisibilityChanged();
+}
+
+void NetworkScene::setEdgesVisibleFromArray(const int *indexes, int size)
+{
+    QSet<int> edges_indexes(indexes, indexes + size);
+    if (setItemsVisibility(nullptr, &edges_indexes))
+        emit this->itemsVisibilityChanged();
+}
+
+void NetworkScene::setItemsVisibleFromArrays(const int *nodes, int nodes_size, const int *edges, int edges_size)
+{
+    // All nodes or edges are shown if nodes or edges is null
+    QSet<int> nodes_indexes;
+    if (nodes != nullptr)
+        nodes_indexes = QSet<int>(nodes, nodes + nodes_size);
+    else
+    {
+        QList<int> indexes = nodes_map_.keys();
+        nodes_indexes = QSet<int>(indexes.cbegin(), indexes.cend());
+    }
+    QSet<int> edges_indexes;
+    if (edges != nullptr)
+        edges_indexes = QSet<int>(edges, edges + edges_size);
+    else
+    {
+        QList<int> indexes = edges_map_.keys();
+        edges_indexes = QSet<int>(indexes.cbegin(), indexes.cend());
+    }
+
+    if (setItemsVisibility(&nodes_indexes, &edges_indexes))
+        emit this->itemsVisibilityChanged();
 }
 
 QList<QColor> NetworkScene::nodesColors()
@@ -704,22 +1583,25 @@ void NetworkScene::setNodesRadii(QList<int> radii)
     if (radii.size() < nodes.size())
         return;
 
+    visible_extents_valid_ = false;
     for (int i=0; i<nodes.size(); i++) {
         radius = radii[nodes[i]->index()];
         nodes[i]->setRadius(radius);
-        foreach(Edge* edge, nodes[i]->edges())
-            edge->adjust();
     }
+
+    adjustEdges();
 }
 
 void NetworkScene::setSelectedNodesRadius(int radius)
 {
+    QSet<Edge *> edges;
     foreach(Node *node, selectedNodes())
     {
         node->setRadius(radius);
-        foreach(Edge* edge, node->edges())
-            edge->adjust();
+        edges.unite(node->edges());
     }
+
+    adjustEdges(edges.values());
 }
 
 QList<int> NetworkScene::nodesPolygons()
@@ -734,6 +1616,43 @@ QList<int> NetworkScene::nodesPolygons()
     return polygons;
 }
 
+QList<QRgb> NetworkScene::nodesColorsArray() const
+{
+    // Raw state of nodes sorted by index, read from the items which hold it compactly in C++
+    QList<QRgb> colors;
+    colors.reserve(nodes_map_.size());
+    foreach(Node *node, nodes())
+        colors.append(node->brush().color().rgba());
+    return colors;
+}
+
+QList<int> NetworkScene::nodesRadiiArray() const
+{
+    QList<int> radii;
+    radii.reserve(nodes_map_.size());
+    foreach(Node *node, nodes())
+        radii.append(node->radius());
+    return radii;
+}
+
+QList<int> NetworkScene::nodesPolygonsArray() const
+{
+    QList<int> polygons;
+    polygons.reserve(nodes_map_.size());
+    foreach(Node *node, nodes())
+        polygons.append(node->polygon());
+    return polygons;
+}
+
+QList<qreal> NetworkScene::edgesWidthsArray() const
+{
+    QList<qreal> widths;
+    widths.reserve(edges_map_.size());
+    foreach(Edge *edge, edges())
+        widths.append(edge->width());
+    return widths;
+}
+
 void NetworkScene::setNodesPolygons(QList<int> polygons)
 {
     NodePolygon polygon;
@@ -745,19 +1664,21 @@ void NetworkScene::setNodesPolygons(QList<int> polygons)
     for (int i=0; i<nodes.size(); i++) {
         polygon = NodePolygon(polygons[nodes[i]->index()]);
         nodes[i]->setPolygon(polygon);
-        foreach(Edge* edge, nodes[i]->edges())
-            edge->adjust();
     }
+
+    adjustEdges();
 }
 
 void NetworkScene::setSelectedNodesPolygon(int polygon)
 {
+    QSet<Edge *> edges;
     foreach(Node *node, selectedNodes())
     {
         node->setPolygon(NodePolygon(polygon));
-        foreach(Edge* edge, node->edges())
-            edge->adjust();
+        edges.unite(node->edges());
     }
+
+    adjustEdges(edges.values());
 }
 
 void NetworkScene::lock(bool lock)
@@ -1,15 +1,21 @@
 #ifndef NETWORKSCENE_H
 #define NETWORKSCENE_H
 
+#include <map>
+
 #include <QGraphicsScene>
 #include <QGraphicsItem>
 #include <QWidget>
 #include <QAbstractTableModel>
+#include <QHash>
+#include <QSet>
+#include <QBasicTimer>
 
 #include "config.h"
 #include "style.h"
 #include "graphicsitem.h"
 #include "node.h"
+#include "spatial_index.h"
 
 class Node;
 class Edge;
@@ -35,6 +41,14 @@ public:
         PixmapsAuto = -1
 	};
 
+    // Levels of detail from which each part of the nodes is painted. Below DetailShapes, nodes are painted as dots.
+    enum LevelOfDetail: int {
+        DetailShapes = 0,
+        DetailPieCharts = 1,
+        DetailLabels = 2,
+        DetailPixmaps = 3
+    };
+
     NetworkScene(QWidget *parent=nullptr);
 
     NetworkStyle *networkStyle();
@@ -53,25 +67,51 @@ public:
                            QList<QVariant> colors = QList<QVariant>(),
                            QList<QVariant> radii = QList<QVariant>());
     QList<Edge *> createEdges(QList<int> indexes, QList<Node *> sourceNodes, QList<Node *> destNodes, QList<qreal> widths);
+    void createNodesFromArrays(const int *indexes, int size, const qreal *positions=nullptr, const int *radii=nullptr,
+                               const QRgb *colors=nullptr, const QList<QString> &labels=QList<QString>());
+    void createEdgesFromArrays(const int *indexes, int size, const int *sources, const int *dests, const qreal *widths=nullptr);
     void removeAllNodes();
     void removeNodes(QList<Node *> nodes);
     void removeAllEdges();
     void removeEdges(QList<Edge *> edges);
 
     QList<Node *> nodes() const;
+    Node *node(int index) const;
     QList<Node *> selectedNodes() const;
+    QList<int> selectedNodesIndexes() const;
+    void updateItemSelection(QGraphicsItem *item);
     void setNodesSelection(QList<int> indexes);
     void setNodesSelection(QList<Node *> nodes);
+    void setNodesSelectionFromArray(const int *indexes, int size);
+    void invalidateNodesIndex();
+    Node *nodeAt(const QPointF &pos);
+    QList<Node *> nodesInRect(const QRectF &rect, Qt::ItemSelectionMode mode=Qt::IntersectsItemBoundingRect);
+    void setItemsSelection(const QList<QGraphicsItem *> &items);
     QRectF selectedNodesBoundingRect();
     QRectF visibleNodesBoundingRect();
+    void updateVisibleNodesBoundingRect(Node *node);
 
     QList<Edge *> edges() const;
+    Edge *edge(int index) const;
     QList<Edge *> selectedEdges() const;
+    QList<int> selectedEdgesIndexes() const;
     void setEdgesSelection(QList<int> indexes);
     void setEdgesSelection(QList<Edge *> edges);
+    void setEdgesSelectionFromArray(const int *indexes, int size);
+    void invalidateEdgesIndex();
+    Edge *edgeAt(const QPointF &pos);
+    QList<Edge *> edgesInRect(const QRectF &rect, Qt::ItemSelectionMode mode=Qt::IntersectsItemBoundingRect);
 
     void setLayout(QList<qreal> layout, qreal scale=0, QList<int> isolated_nodes=QList<int>());
     void setLayout(QList<QPointF> layout, qreal scale=0, QList<int> isolated_nodes=QList<int>());
+    void setLayoutFromArray(const qreal *layout, int size, qreal scale=0, const bool *isolated_mask=nullptr);
+    bool edgesAdjustmentSuspended() const;
+    bool edgesAdjustmentSynchronous() const;
+    void setEdgesAdjustmentSynchronous(bool synchronous=true);
+    void scheduleEdgesAdjustment(const QList<Edge *> &edges);
+    void flushEdgesAdjustment();
+    void adjustEdges();
+    void adjustEdges(const QList<Edge *> &edges);
     qreal scale();
     void setScale(qreal scale=1);
     void setLabelsFromModel(QAbstractItemModel *model, int column_id, int role=Qt::DisplayRole);
@@ -83,21 +123,39 @@ public:
     void resetNodesRadii();
     void setPieColors(QList<QColor> colors);
     void setPieChartsFromModel(QAbstractItemModel *model, QList<int> column_ids, int role=Qt::DisplayRole);
+    void setPieChartsFromArray(const qreal *values, int rows, int columns);
     void resetPieCharts();
     bool pieChartsVisibility();
     void setPieChartsVisibility(bool visibility=true);
     void setPixmapsFromModel(QAbstractItemModel *model, int column_id, int role=Qt::DisplayRole, int type=NetworkScene::PixmapsSmiles);
+    bool lazyPixmaps() const;
+    void setLazyPixmaps(bool lazy=true);
+    void requestDepiction(Node *node, const QSize &size=QSize());
+    void flushDepictions();
+    QPixmap sharedPixmap(Node *node, const QString &text, int type, const QSize &size);
+    void releaseSharedPixmap(Node *node);
+    int sharedPixmapsCount() const;
+    int depictionsMemoryLimit() const;
+    void setDepictionsMemoryLimit(int limit);
     bool pixmapVisibility();
     void setPixmapVisibility(bool visibility=true);
     void resetPixmaps();
+    qreal levelOfDetailThreshold(int detail) const;
+    void setLevelOfDetailThreshold(int detail, qreal threshold);
+    bool edgesBatchRendering() const;
+    void setEdgesBatchRendering(bool enabled=true);
 
     void hideItems(QList<QGraphicsItem *> items);
     void showItems(QList<QGraphicsItem *> items);
     void hideSelectedItems();
     void showAllItems();
     void hideAllItems();
+    void setNodesVisibleFromArray(const int *indexes, int size);
+    void setEdgesVisibleFromArray(const int *indexes, int size);
+    void setItemsVisibleFromArrays(const int *nodes, int nodes_size, const int *edges, int edges_size);
 
     QList<QColor> nodesColors();
+    QList<QRgb> nodesColorsArray() const;
     void setNodesColors(QList<QVariant> colors);
     void setSelectedNodesColor(QColor color);
 
@@ -106,26 +164,110 @@ public:
     void setSelectedNodesOverlayBrush(QBrush brush);
 
     QList<int> nodesRadii();
+    QList<int> nodesRadiiArray() const;
     void setNodesRadii(QList<int> radii);
     void setSelectedNodesRadius(int radius);
 
     QList<int> nodesPolygons();
+    QList<int> nodesPolygonsArray() const;
     void setNodesPolygons(QList<int> polygons);
     void setSelectedNodesPolygon(int polygon);
 
+    QList<qreal> edgesWidthsArray() const;
+
     void lock(bool lock=true);
     void unlock();
     bool isLocked();
 
+protected:
+    void timerEvent(QTimerEvent *event) override;
+
 private:
+    // Nodes and edges unregister themselves when they leave the scene or are deleted
+    friend class Node;
+    friend class Edge;
+
+    void registerNode(Node *node);
+    void unregisterNode(Node *node);
+    void registerEdge(Edge *edge);
+    void unregisterEdge(Edge *edge);
+    bool setItemsVisibility(const QSet<int> *nodes_indexes, const QSet<int> *edges_indexes);
+    void setNodesLabels(const QList<Node *> &nodes, const QList<QString> &labels);
+    void renderDepiction(Node *node, const QSize &size);
+    void forgetDepiction(Node *node);
+    void trimDepictions();
+    void processDepictions(qint64 budget=15);
+    bool prefetchDepictions();
+    void buildNodesIndex();
+    void buildEdgesIndex();
+    void computeVisibleExtents();
+
     NetworkStyle *style_;
     GraphicsItemLayer *nodesLayer;
-    GraphicsItemLayer *edgesLayer;
+    EdgesLayer *edgesLayer;
     qreal scale_;
     QList <QColor> colors_;
     bool pie_charts_visibility;
     bool pixmap_visibility;
     bool is_locked = false;
+    bool edges_adjustment_suspended_ = false;
+    bool edges_adjustment_synchronous_ = false;
+    bool edges_batch_rendering_ = false;
+    qreal lod_thresholds_[4] = {0.1, 0.1, 0.4, 0.4};
+    bool lazy_pixmaps_ = false;
+    bool depictions_synchronous_ = false;
+    int depictions_memory_limit_ = 262144;
+
+    // Edges of moving nodes are adjusted all at once on next event loop iteration
+    QSet<Edge *> pending_edges_;
+    QSet<Edge *> edges_hidden_by_nodes_;
+    QBasicTimer edges_adjustment_timer_;
+
+    // Depictions requested by nodes while painting are generated a few at a time, without blocking the event loop
+    QHash<Node *, QSize> pending_depictions_;
+    QBasicTimer depictions_timer_;
+
+    // Memory used by pixmaps generated from depictions, ordered by rendering serial to release least recently
+    // rendered first. Nodes are mapped to their serial and the cache key of their pixmap, a pixmap shared by
+    // several nodes is counted once with the number of depicted nodes using it.
+    QHash<Node *, QPair<quint64, qint64>> depicted_nodes_;
+    std::map<quint64, Node *> depicted_order_;
+    QHash<qint64, QPair<int, int>> depicted_pixmaps_;
+    quint64 depictions_serial_ = 0;
+    int depictions_cost_ = 0;
+    // Nodes whose pixmap was released to respect the memory limit since the depictions timer started
+    QSet<Node *> evicted_depictions_;
+
+    // Pixmaps of identical depictions are shared by nodes, with the number of nodes using them
+    QHash<QString, QPair<QPixmap, int>> shared_pixmaps_;
+    QHash<Node *, QString> nodes_pixmap_keys_;
+
+    // Selected nodes and edges with their index, updated when items are selected or deselected
+    QHash<Node *, int> selected_nodes_;
+    QHash<Edge *, int> selected_edges_;
+
+    // Spatial indexes of nodes and edges, rebuilt at once on next query when items have been added, moved or
+    // removed
+    SpatialIndex nodes_index_;
+    QList<Node *> indexed_nodes_;
+    bool nodes_index_valid_ = false;
+    SpatialIndex edges_index_;
+    QList<Edge *> indexed_edges_;
+    bool edges_index_valid_ = false;
+
+    // Extents of visible nodes (left, top, right, bottom) and the nodes defining each of them. They are extended
+    // when nodes move outwards, and computed again only when one of these nodes moves inwards or is hidden.
+    qreal visible_extents_[4];
+    Node *visible_extents_nodes_[4];
+    bool visible_extents_valid_ = false;
+
+    // Registries of nodes and edges keyed by their index, and cached views sorted by index
+    QHash<int, Node *> nodes_map_;
+    QHash<int, Edge *> edges_map_;
+    mutable QList<Node *> sorted_nodes_;
+    mutable QList<Edge *> sorted_edges_;
+    mutable bool sorted_nodes_valid_ = true;
+    mutable bool sorted_edges_valid_ = true;
 };
 
 #endif // NETWORKSCENE_H
@@ -4,6 +4,9 @@
 #include "style.h"
 #include "config.h"
 #include "mol_depiction.h"
+#include "label_metrics.h"
+
+#include <algorithm>
 
 #include <QtWidgets>
 #include <QtCore>
@@ -11,6 +14,9 @@
 #include <QPixmap>
 #include <QtSvg/QSvgRenderer>
 
+static QHash<QByteArray, QPainterPath> shared_shapes;
+static const int SHARED_SHAPES_LIMIT = 4096;
+
 Node::Node(int index, const QString &label)
     : QGraphicsEllipseItem(-Config::Radius, -Config::Radius, 2*Config::Radius, 2*Config::Radius)
 {
@@ -29,9 +35,18 @@ Node::Node(int index, const QString &label)
     setZValue(10);
 }
 
+Node::~Node()
+{
+    // Deleted items do not notify the scene, do not let it keep a dangling pointer
+    NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+    if (scene != nullptr)
+        scene->unregisterNode(this);
+}
+
 void Node::invalidateShape()
 {
     //TODO: Can't find a good way to update shape
+    shape_valid_ = false;
     prepareGeometryChange();
     QRectF rect = this->rect();
     setRect(QRectF());
@@ -40,11 +55,20 @@ void Node::invalidateShape()
 
 void Node::updateLabelRect()
 {
-    QFontMetrics fm = QFontMetrics(this->font());
-    int width = fm.horizontalAdvance(this->label());
-    int height = fm.height();
-    this->label_rect_ = QRectF(-width/2, -height/2, width, height);
+    setLabelRect(LabelMetrics::labelRect(this->font_, this->label_));
+}
+
+void Node::setLabelRect(const QRectF &rect)
+{
+    // Geometry is left untouched if the label keeps the same size, e.g. when the style is applied again, but the
+    // cached rendering of the node has to be repainted with the new text
+    if (rect == this->label_rect_)
+    {
+        update();
+        return;
+    }
 
+    this->label_rect_ = rect;
     this->invalidateShape();
 }
 
@@ -63,6 +87,13 @@ void Node::setRadius(int radius)
     prepareGeometryChange();
     this->setRect(QRectF(-radius, -radius, 2 * radius, 2 * radius));
     scalePolygon();
+
+    NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+    if (scene != nullptr)
+    {
+        scene->invalidateNodesIndex();
+        scene->updateVisibleNodesBoundingRect(this);
+    }
 }
 
 QFont Node::font()
@@ -129,6 +160,13 @@ void Node::setLabel(const QString &label)
     updateLabelRect();
 }
 
+void Node::setLabel(const QString &label, const QRectF &rect)
+{
+    // Used by the scene to set many labels at once, `rect` is the rect of `label` in the font of the node
+    this->label_ = label;
+    setLabelRect(rect);
+}
+
 QList<qreal> Node::pie()
 {
     return this->pieList;
@@ -149,7 +187,14 @@ void Node::setPie(QList<qreal> values)
     }
     else
         values = QList<qreal>();
+    setNormalizedPie(values);
+}
+
+void Node::setNormalizedPie(const QList<qreal> &values)
+{
+    // Values are expected to be already normalized
     this->pieList = values;
+    pie_slices_valid_ = false;
     this->update();
 }
 
@@ -160,32 +205,117 @@ QPixmap Node::pixmap()
 
 void Node::setPixmap(const QPixmap &pixmap)
 {
+    releaseSharedPixmap();
     this->pixmap_ = pixmap;
+    depiction_.clear();
+    depiction_size_ = QSize();
+}
+
+QString Node::depiction()
+{
+    return depiction_;
+}
+
+void Node::setDepiction(const QString &text, int type, const QSize &size)
+{
+    // Keep text to generate the pixmap of the node the first time it needs to be painted.
+    // The pixmap is rendered at the lowest resolution needed by the current level of detail, up to size, and
+    // rendered again at a higher resolution when zooming in.
+    releaseSharedPixmap();
+    pixmap_ = QPixmap();
+    depiction_ = text;
+    depiction_type_ = type;
+    depiction_max_size_ = size;
+    depiction_size_ = QSize();
+    update();
+}
+
+bool Node::hasPendingDepiction()
+{
+    return !depiction_.isEmpty() && pixmap_.isNull();
+}
+
+QSize Node::depictionSize(qreal lod)
+{
+    // Size needed to paint the depiction at level of detail lod: the maximum size divided by a power of two
+    if (depiction_.isEmpty())
+        return QSize();
+
+    QRectF rect = boundingRect();
+    qreal needed = std::max({rect.width() * lod, rect.height() * lod, static_cast<qreal>(Config::MinDepictionSize)});
+    int width = depiction_max_size_.width();
+    int height = depiction_max_size_.height();
+    while (std::max(width, height) / 2 >= needed)
+    {
+        width /= 2;
+        height /= 2;
+    }
+    return QSize(width, height);
+}
+
+void Node::renderDepiction(const QSize &size)
+{
+    if (depiction_.isEmpty())
+        return;
+
+    QSize render_size = size.isValid() ? size : depiction_max_size_;
+    if (pixmap_.isNull() || render_size.width() > depiction_size_.width())
+    {
+        setSharedPixmap(depiction_, depiction_type_, render_size);
+        depiction_size_ = render_size;
+        update();
+    }
+}
+
+void Node::releaseDepiction()
+{
+    // Free the pixmap generated from the depiction. It will be generated again when needed
+    if (!depiction_.isEmpty())
+    {
+        releaseSharedPixmap();
+        pixmap_ = QPixmap();
+        depiction_size_ = QSize();
+    }
 }
 
 void Node::setPixmapFromSmiles(const QString &smiles, const QSize &size)
 {
-    QPixmap pixmap(SmilesToPixmap(smiles, size));
-    this->pixmap_ = pixmap;
+    setSharedPixmap(smiles, NetworkScene::PixmapsSmiles, size);
 }
 
 void Node::setPixmapFromInchi(const QString &inchi, const QSize &size)
 {
-    QPixmap pixmap(InchiToPixmap(inchi, size));
-    this->pixmap_ = pixmap;
+    setSharedPixmap(inchi, NetworkScene::PixmapsInchi, size);
 }
 
 void Node::setPixmapFromBase64(const QByteArray &b64)
 {
     QPixmap pixmap;
     pixmap.loadFromData(QByteArray::fromBase64(b64));
+    releaseSharedPixmap();
     this->pixmap_ = pixmap;
 }
 
 void Node::setPixmapFromSvg(const QByteArray &svg, const QSize &size)
 {
-    QPixmap pixmap(SvgToPixmap(svg, size));
-    this->pixmap_ = pixmap;
+    setSharedPixmap(QString::fromUtf8(svg), NetworkScene::PixmapsSvg, size);
+}
+
+void Node::setSharedPixmap(const QString &text, int type, const QSize &size)
+{
+    // Nodes of a scene share the pixmaps of identical depictions
+    NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+    if (scene != nullptr)
+        this->pixmap_ = scene->sharedPixmap(this, text, type, size);
+    else
+        this->pixmap_ = DepictionCache::pixmap(text, type, size);
+}
+
+void Node::releaseSharedPixmap()
+{
+    NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+    if (scene != nullptr)
+        scene->releaseSharedPixmap(this);
 }
 
 void Node::scalePolygon()
@@ -194,6 +324,7 @@ void Node::scalePolygon()
     qreal polygon_size = std::max(this->node_polygon_.boundingRect().width(), this->node_polygon_.boundingRect().height());
     qreal scale = polygon_size > 0. ? rect_size / polygon_size : 1.;
     this->node_polygon_ = QTransform().scale(scale, scale).map(this->node_polygon_);
+    pie_slices_valid_ = false;
 }
 
 NodePolygon Node::polygon()
@@ -258,15 +389,50 @@ QVariant Node::itemChange(GraphicsItemChange change, const QVariant &value)
     switch (change)
     {
     case ItemScenePositionHasChanged:
-        foreach(Edge* edge, this->edges_)
+    {
+        NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+        if (scene == nullptr)
+        {
+            foreach(Edge* edge, this->edges_)
+            {
+                edge->adjust();
+            }
+        }
+        else
         {
-            edge->adjust();
+            scene->invalidateNodesIndex();
+            scene->updateVisibleNodesBoundingRect(this);
+            if (!scene->edgesAdjustmentSuspended())
+                scene->scheduleEdgesAdjustment(this->edges_.values());
         }
         break;
+    }
+    case ItemVisibleHasChanged:
+    {
+        NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+        if (scene != nullptr)
+            scene->updateVisibleNodesBoundingRect(this);
+        break;
+    }
     case ItemSelectedChange:
         setZValue(value.toBool() ? 20 : 10);  // Bring item to front
         setCacheMode(cacheMode()); // Force Redraw
         break;
+    case ItemSelectedHasChanged:
+    {
+        NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+        if (scene != nullptr)
+            scene->updateItemSelection(this);
+        break;
+    }
+    case ItemSceneChange:
+    {
+        // Node is removed from the scene, or moved to another one
+        NetworkScene *scene = qobject_cast<NetworkScene *>(this->scene());
+        if (scene != nullptr && value.value<QGraphicsScene *>() != scene)
+            scene->unregisterNode(this);
+        break;
+    }
     default:
         break;
     }
@@ -288,18 +454,60 @@ void Node::mouseReleaseEvent(QGraphicsSceneMouseEvent *event)
 
 QPainterPath Node::shape() const
 {
-    QPainterPath path;
-    QPainterPath label_path;
+    // Shape is requested each time the node moves, only rebuild it when geometry or pen has changed
+    if (shape_valid_ && shape_rect_ == rect() && shape_start_angle_ == startAngle() && shape_span_angle_ == spanAngle()
+            && shape_pen_ == pen())
+        return shape_;
 
-    if (this->stock_polygon_ == NodePolygon::Circle)
-        path = QGraphicsEllipseItem::shape();
-    else
+    // Shapes of nodes with a stock polygon only depend on their geometry, pen and label size, nodes with the same
+    // ones share their shape instead of each uniting their polygon with their label
+    QByteArray shared_key;
+    bool found = false;
+    if (this->stock_polygon_ != NodePolygon::Custom)
     {
-        path.addPolygon(this->node_polygon_);
+        QRectF node_rect = this->rect();
+        QPen pen = this->pen();
+        const qreal values[] = {qreal(this->stock_polygon_), node_rect.x(), node_rect.y(), node_rect.width(),
+                                node_rect.height(),
+                                qreal(startAngle()), qreal(spanAngle()), pen.widthF(), qreal(pen.style()),
+                                qreal(pen.capStyle()), qreal(pen.joinStyle()), pen.miterLimit(),
+                                this->label_rect_.width(), this->label_rect_.height()};
+        shared_key = QByteArray(reinterpret_cast<const char *>(values), sizeof(values));
+        auto it = shared_shapes.constFind(shared_key);
+        if (it != shared_shapes.constEnd())
+        {
+            shape_ = it.value();
+            found = true;
+        }
     }
 
-    label_path.addRect(this->label_rect_);
-    return path.united(label_path);
+    if (!found)
+    {
+        QPainterPath path;
+        QPainterPath label_path;
+
+        if (this->stock_polygon_ == NodePolygon::Circle)
+            path = QGraphicsEllipseItem::shape();
+        else
+        {
+            path.addPolygon(this->node_polygon_);
+        }
+
+        label_path.addRect(this->label_rect_);
+        shape_ = path.united(label_path);
+        if (!shared_key.isNull())
+        {
+            if (shared_shapes.size() >= SHARED_SHAPES_LIMIT)
+                shared_shapes.clear();
+            shared_shapes.insert(shared_key, shape_);
+        }
+    }
+    shape_rect_ = rect();
+    shape_start_angle_ = startAngle();
+    shape_span_angle_ = spanAngle();
+    shape_pen_ = pen();
+    shape_valid_ = true;
+    return shape_;
 }
 
 void Node::paint(QPainter *painter, const QStyleOptionGraphicsItem *option, QWidget *widget)
@@ -312,37 +520,41 @@ void Node::paint(QPainter *painter, const QStyleOptionGraphicsItem *option, QWid
 
     NetworkStyle *style(scene->networkStyle());
 
+    // Get level of detail
+    qreal lod(option->levelOfDetailFromTransform(painter->worldTransform()));
+    QRectF rect = this->rect();
+
     // If selected, change brush to yellow and text to black
+    QBrush brush;
+    QPen pen;
     QColor text_color;
     if (option->state & QStyle::State_Selected)
     {
-        QBrush brush = style->nodeBrush(true);
+        brush = style->nodeBrush(true);
         text_color = style->nodeTextColor(true);
         if (!brush.color().isValid())
         {
             brush = this->brush();
             text_color = this->textColor();
         }
-        painter->setBrush(brush);
-        painter->setPen(style->nodePen(true));
+        pen = style->nodePen(true);
     }
     else
     {
-        painter->setBrush(this->brush());
-        painter->setPen(this->pen());
+        brush = this->brush();
+        pen = this->pen();
         text_color = this->textColor();
     }
 
-    // Get level of detail
-    qreal lod(option->levelOfDetailFromTransform(painter->worldTransform()));
-    QRectF rect = this->rect();
-
-    if (lod<0.1)
+    if (lod < scene->levelOfDetailThreshold(NetworkScene::DetailShapes))
     {
-        painter->fillRect(rect, painter->brush());
+        painter->fillRect(rect, brush);
         return;
     }
 
+    painter->setBrush(brush);
+    painter->setPen(pen);
+
     if (this->stock_polygon_ == NodePolygon::Circle)
     {
         // Draw ellipse
@@ -379,50 +591,92 @@ void Node::paint(QPainter *painter, const QStyleOptionGraphicsItem *option, QWid
     }
 
     // Draw pies if any
-    if (scene->pieChartsVisibility() && this->pieList.size() > 0)
+    if (scene->pieChartsVisibility() && this->pieList.size() > 0
+            && lod >= scene->levelOfDetailThreshold(NetworkScene::DetailPieCharts))
     {
-        float start = 0;
         QList<QColor> colors = scene->pieColors();
         painter->setPen(QPen(Qt::NoPen));
+        updatePieSlices();
 
         if (this->stock_polygon_ == NodePolygon::Circle)
         {
-            rect = QTransform().scale(.85, .85).mapRect(rect);
-            for (int i=0; i<std::min(this->pieList.size(), colors.size()); i++) {
+            for (int i=0; i<std::min(pie_angles_.size(), colors.size()); i++) {
                 painter->setBrush(colors[i]);
-                painter->drawPie(rect, int(start*5760), int(pieList[i]*5760));
-                start += this->pieList[i];
+                painter->drawPie(pie_rect_, pie_angles_[i].first, pie_angles_[i].second);
             }
         }
         else
         {
-            if (this->stock_polygon_ == NodePolygon::Square)
-                rect = QTransform().scale(1.2, 1.2).mapRect(rect);
-
-            // Set clip path for pies
-            QPainterPath clip_path;
-            QPainterPath pie_path;
-            clip_path.addPolygon(QTransform().scale(.8, .8).map(this->node_polygon_));
-            for (int i=0; i<std::min(this->pieList.size(), colors.size()); i++) {
+            for (int i=0; i<std::min(pie_paths_.size(), colors.size()); i++) {
                 painter->setBrush(colors[i]);
-                pie_path = QPainterPath();
-                pie_path.arcTo(rect, static_cast<qreal>(start*360),
-                                     static_cast<qreal>(pieList[i]*360));
-                painter->drawPath(clip_path.intersected(pie_path));
-                start += this->pieList[i];
+                painter->drawPath(pie_paths_[i]);
             }
         }
     }
 
     // Draw text
-    if (lod > 0.4)
+    if (lod >= scene->levelOfDetailThreshold(NetworkScene::DetailLabels))
     {
         QRectF bounding_rect = boundingRect();
         painter->setClipping(false);
         painter->setFont(this->font_);
         painter->setPen(QPen(text_color, 0));
         painter->drawText(bounding_rect, Qt::AlignCenter, label_);
-        if (scene->pixmapVisibility() && !this->pixmap_.isNull())
+    }
+
+    // Draw pixmap. Depictions set lazily are generated the first time they are needed, and again at higher
+    // resolution when zooming in
+    if (scene->pixmapVisibility() && lod >= scene->levelOfDetailThreshold(NetworkScene::DetailPixmaps))
+    {
+        if (!depiction_.isEmpty())
+        {
+            QSize size = depictionSize(lod);
+            if (pixmap_.isNull() || size.width() > depiction_size_.width())
+                scene->requestDepiction(this, size);
+        }
+
+        if (!this->pixmap_.isNull())
+        {
+            QRectF bounding_rect = boundingRect();
+            painter->setClipping(false);
             painter->drawPixmap(bounding_rect.toRect(), this->pixmap_, this->pixmap_.rect());
+        }
+    }
+}
+
+void Node::updatePieSlices() const
+{
+    // Slices of pie charts are only rebuilt when values or geometry have changed
+    QRectF rect = this->rect();
+    if (pie_slices_valid_ && rect == pie_slices_rect_)
+        return;
+
+    pie_angles_.clear();
+    pie_paths_.clear();
+    float start = 0;
+    if (this->stock_polygon_ == NodePolygon::Circle)
+    {
+        pie_rect_ = QTransform().scale(.85, .85).mapRect(rect);
+        for (int i=0; i<this->pieList.size(); i++) {
+            pie_angles_.append(qMakePair(int(start*5760), int(pieList[i]*5760)));
+            start += this->pieList[i];
+        }
+    }
+    else
+    {
+        pie_rect_ = this->stock_polygon_ == NodePolygon::Square ? QTransform().scale(1.2, 1.2).mapRect(rect) : rect;
+
+        QPainterPath clip_path;
+        QPainterPath pie_path;
+        clip_path.addPolygon(QTransform().scale(.8, .8).map(this->node_polygon_));
+        for (int i=0; i<this->pieList.size(); i++) {
+            pie_path = QPainterPath();
+            pie_path.arcTo(pie_rect_, static_cast<qreal>(start*360),
+                                 static_cast<qreal>(pieList[i]*360));
+            pie_paths_.append(clip_path.intersected(pie_path));
+            start += this->pieList[i];
+        }
     }
+    pie_slices_rect_ = rect;
+    pie_slices_valid_ = true;
 }
@@ -9,6 +9,7 @@
 #include <QMap>
 #include <QPolygonF>
 #include <QVector>
+#include <QPainterPath>
 
 #include "style.h"
 #include "config.h"
@@ -157,9 +158,11 @@ class QMN_EXPORT Node : public QGraphicsEllipseItem
 {
 public:
     Node(int index, const QString &label=QString());
+    ~Node() override;
 
     void invalidateShape();
     void updateLabelRect();
+    void setLabelRect(const QRectF &rect);
     int index();
     int radius();
     void setRadius(int radius);
@@ -172,10 +175,18 @@ public:
     void setOverlayBrush(QBrush brush);
     QString label();
     void setLabel(const QString &label);
+    void setLabel(const QString &label, const QRectF &rect);
     QList<qreal> pie();
     void setPie(QList<qreal> values);
+    void setNormalizedPie(const QList<qreal> &values);
     QPixmap pixmap();
     void setPixmap(const QPixmap &pixmap);
+    QString depiction();
+    void setDepiction(const QString &text, int type = -1, const QSize &size = QSize(300, 300));
+    bool hasPendingDepiction();
+    QSize depictionSize(qreal lod);
+    void renderDepiction(const QSize &size = QSize());
+    void releaseDepiction();
     void setPixmapFromSmiles(const QString &smiles, const QSize &size = QSize(300, 300));
     void setPixmapFromInchi(const QString &inchi, const QSize &size = QSize(300, 300));
     void setPixmapFromBase64(const QByteArray &b64);
@@ -205,6 +216,10 @@ protected:
     void mouseReleaseEvent(QGraphicsSceneMouseEvent *event) override;
 
 private:
+    void updatePieSlices() const;
+    void setSharedPixmap(const QString &text, int type, const QSize &size);
+    void releaseSharedPixmap();
+
     int id;
     QString label_;
     QRectF label_rect_;
@@ -213,9 +228,25 @@ private:
     QSet<Edge *> edges_;
     QList<qreal> pieList;
     QPixmap pixmap_;
+    QString depiction_;
+    int depiction_type_ = -1;
+    QSize depiction_max_size_;
+    QSize depiction_size_;
     QPolygonF node_polygon_;
     NodePolygon stock_polygon_ = NodePolygon::Circle;
     QBrush overlay_brush_;
+    mutable QPainterPath shape_;
+    mutable bool shape_valid_ = false;
+    mutable QRectF shape_rect_;
+    mutable int shape_start_angle_ = 0;
+    mutable int shape_span_angle_ = 0;
+    mutable QPen shape_pen_;
+    // Slices of pie charts: start and span angles for circles, paths clipped to the polygon for other shapes
+    mutable QRectF pie_rect_;
+    mutable QList<QPair<int, int>> pie_angles_;
+    mutable QList<QPainterPath> pie_paths_;
+    mutable bool pie_slices_valid_ = false;
+    mutable QRectF pie_slices_rect_;
 };
 
 Q_DECLARE_METATYPE(Node *);
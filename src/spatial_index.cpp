@@ -0,0 +1,93 @@
+#include "spatial_index.h"
+
+#include <algorithm>
+#include <cmath>
+
+SpatialIndex::SpatialIndex(const QVector<QRectF> &rects)
+    : rects_(rects)
+{
+    const int count = rects_.size();
+    if (count == 0)
+        return;
+
+    qreal min_x = rects_[0].center().x(), max_x = min_x;
+    qreal min_y = rects_[0].center().y(), max_y = min_y;
+    foreach (const QRectF &rect, rects_)
+    {
+        QPointF center = rect.center();
+        min_x = std::min(min_x, center.x());
+        max_x = std::max(max_x, center.x());
+        min_y = std::min(min_y, center.y());
+        max_y = std::max(max_y, center.y());
+        margin_[0] = std::max(margin_[0], rect.width() / 2);
+        margin_[1] = std::max(margin_[1], rect.height() / 2);
+    }
+    origin_[0] = min_x;
+    origin_[1] = min_y;
+    qreal width = max_x - min_x;
+    qreal height = max_y - min_y;
+
+    // About one rectangle per cell if rectangles are evenly spread, and never more cells than rectangles in a
+    // row or column
+    cell_size_ = std::max({std::sqrt(width * height / count), width / count, height / count, 1e-6});
+    columns_ = static_cast<int>(width / cell_size_) + 1;
+    rows_ = static_cast<int>(height / cell_size_) + 1;
+
+    QVector<int> cell_ids(count);
+    starts_.fill(0, rows_ * columns_ + 1);
+    for (int i=0; i<count; i++)
+    {
+        QPointF center = rects_[i].center();
+        int column = qBound(0, static_cast<int>(std::floor((center.x() - origin_[0]) / cell_size_)), columns_ - 1);
+        int row = qBound(0, static_cast<int>(std::floor((center.y() - origin_[1]) / cell_size_)), rows_ - 1);
+        cell_ids[i] = row * columns_ + column;
+        starts_[cell_ids[i] + 1]++;
+    }
+
+    // Counting sort of rectangles by cell, keeping their order inside each cell
+    for (int cell=0; cell<rows_*columns_; cell++)
+        starts_[cell + 1] += starts_[cell];
+    QVector<int> positions(starts_.cbegin(), starts_.cend() - 1);
+    order_.resize(count);
+    for (int i=0; i<count; i++)
+        order_[positions[cell_ids[i]]++] = i;
+}
+
+int SpatialIndex::size() const
+{
+    return rects_.size();
+}
+
+void SpatialIndex::cellsRange(qreal low, qreal high, int axis, int size, int *first, int *last) const
+{
+    *first = std::max(static_cast<int>(std::floor((low - margin_[axis] - origin_[axis]) / cell_size_)), 0);
+    *last = std::min(static_cast<int>(std::floor((high + margin_[axis] - origin_[axis]) / cell_size_)), size - 1);
+}
+
+QVector<int> SpatialIndex::query(const QRectF &rect, bool contains) const
+{
+    QVector<int> result;
+    if (rects_.isEmpty())
+        return result;
+
+    int first_column, last_column, first_row, last_row;
+    cellsRange(rect.left(), rect.right(), 0, columns_, &first_column, &last_column);
+    cellsRange(rect.top(), rect.bottom(), 1, rows_, &first_row, &last_row);
+
+    for (int row=first_row; row<=last_row && first_column<=last_column; row++)
+    {
+        for (int k=starts_[row * columns_ + first_column]; k<starts_[row * columns_ + last_column + 1]; k++)
+        {
+            const QRectF &r = rects_[order_[k]];
+            bool match;
+            if (contains)
+                match = r.left() >= rect.left() && r.top() >= rect.top() && r.right() <= rect.right() && r.bottom() <= rect.bottom();
+            else
+                match = r.left() <= rect.right() && r.right() >= rect.left() && r.top() <= rect.bottom() && r.bottom() >= rect.top();
+            if (match)
+                result.append(order_[k]);
+        }
+    }
+    std::sort(result.begin(), result.end());
+    return result;
+}
@@ -0,0 +1,32 @@
+#ifndef SPATIAL_INDEX_H
+#define SPATIAL_INDEX_H
+
+#include <QRectF>
+#include <QVector>
+
+// Uniform grid of rectangles, built at once from a list of rectangles.
+// Rectangles are bucketed by their center, cells are stored contiguously row by row so that the cells of a row
+// overlapping a query are a single range. Queries are grown by half of the largest rectangle to find rectangles
+// whose center is outside of the queried area.
+class SpatialIndex
+{
+public:
+    SpatialIndex(const QVector<QRectF> &rects = QVector<QRectF>());
+
+    int size() const;
+    QVector<int> query(const QRectF &rect, bool contains=false) const;
+
+private:
+    void cellsRange(qreal low, qreal high, int axis, int size, int *first, int *last) const;
+
+    QVector<QRectF> rects_;
+    QVector<int> order_;
+    QVector<int> starts_;
+    qreal margin_[2] = {0, 0};
+    qreal origin_[2] = {0, 0};
+    qreal cell_size_ = 1;
+    int columns_ = 0;
+    int rows_ = 0;
+};
+
+#endif // SPATIAL_INDEX_H
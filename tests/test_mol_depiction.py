@@ -1,8 +1,15 @@
-from PySide6.QtCore import QSize
-from PySide6.QtGui import QPixmap
+from PySide6.QtCore import QSize, QPointF, SIGNAL
+from PySide6.QtGui import QPixmap, QStandardItemModel, QStandardItem
+from PySide6MolecularNetwork.mol_depiction import (DEPICTION_OK, DEPICTION_EMPTY, DEPICTION_PARSE_ERROR,
+                                                   DEPICTION_ERROR, DEPICTION_SMILES, DEPICTION_INCHI,
+                                                   DEPICTION_BASE64, DEPICTION_SVG, DEPICTION_AUTO, DepictionTypes)
 
+from concurrent.futures import ProcessPoolExecutor
+import PySide6MolecularNetwork.mol_depiction
 import pytest
 import hashlib
+import base64
+import numpy as np
 
 from resources import MOLECULES
 
@@ -34,3 +41,305 @@ def test_inchi_to_pixmap(mod, molecule, size):
     pixmap = mod.InchiToPixmap(molecule['inchi'], size)
     assert pixmap.isNull() == size.isNull()
     assert pixmap.size() == size
+
+
+def create_depiction_scene(mod, model):
+    scene = mod.NetworkScene()
+    scene.createNodes(range(model.rowCount()), positions=[QPointF(i*10, 0) for i in range(model.rowCount())])
+    return scene
+
+@pytest.mark.parametrize("column,type", [('smiles', 0), ('inchi', 1), ('svg', 3), ('smiles', -1), ('inchi', -1),
+                                         ('svg', -1)])
+def test_depiction_service(mod, qtbot, column, type):
+    """Check that DepictionService sets pixmaps on nodes without blocking."""
+
+    model = QStandardItemModel()
+    for molecule in MOLECULES:
+        if column == 'svg':
+            with open(molecule['svg'], 'r') as f:
+                model.appendRow([QStandardItem(f.read())])
+        else:
+            model.appendRow([QStandardItem(molecule[column])])
+    scene = create_depiction_scene(mod, model)
+
+    service = mod.DepictionService()
+    progress = []
+    service.progress.connect(lambda done, total: progress.append((done, total)))
+    with qtbot.waitSignal(service.finished, timeout=10000):
+        service.depictModel(scene, model, 0, type=type, size=QSize(100, 100))
+        assert service.isRunning()
+
+    assert not service.isRunning()
+    assert progress[-1] == (len(MOLECULES), len(MOLECULES))
+    for node in scene.nodes():
+        assert not node.pixmap().isNull()
+        assert node.pixmap().size() == QSize(100, 100)
+    service.shutdown()
+
+def test_depiction_service_cancel(mod, qtbot):
+    """Check that depiction is cancelled when model changes."""
+
+    model = QStandardItemModel()
+    for molecule in MOLECULES:
+        model.appendRow([QStandardItem(molecule['smiles'])])
+    scene = create_depiction_scene(mod, model)
+
+    service = mod.DepictionService()
+    with qtbot.assertNotEmitted(service.finished, wait=500):
+        service.depictModel(scene, model, 0)
+        model.setItem(0, 0, QStandardItem(""))
+        assert not service.isRunning()
+
+    for node in scene.nodes():
+        assert node.pixmap().isNull()
+
+    # Changes to the model are not followed anymore once depiction has been cancelled
+    with qtbot.waitSignal(service.finished, timeout=10000):
+        service.depictModel(scene, model, 0)
+    service.cancel()
+    model.setItem(0, 0, QStandardItem(MOLECULES[0]['smiles']))
+    assert sum(not node.pixmap().isNull() for node in scene.nodes()) == len(MOLECULES) - 1
+    service.shutdown()
+
+@pytest.mark.parametrize("texts", [[m['smiles'] for m in MOLECULES], [""]])
+def test_depiction_service_disconnect(mod, qtbot, texts):
+    """Check that DepictionService stops watching the model once depiction has finished."""
+
+    model = QStandardItemModel()
+    for text in texts:
+        model.appendRow([QStandardItem(text)])
+    scene = create_depiction_scene(mod, model)
+    signals = [SIGNAL("modelReset()"), SIGNAL("dataChanged(QModelIndex,QModelIndex,QList<int>)")]
+    receivers = [model.receivers(signal) for signal in signals]
+
+    service = mod.DepictionService()
+    with qtbot.waitSignal(service.finished, timeout=10000):
+        service.depictModel(scene, model, 0)
+    assert [model.receivers(signal) for signal in signals] == receivers
+    service.shutdown()
+
+def test_depiction_service_empty(mod, qtbot):
+    """Check that DepictionService finishes immediately if there is nothing to depict."""
+
+    model = QStandardItemModel()
+    model.appendRow([QStandardItem("")])
+    scene = create_depiction_scene(mod, model)
+    service = mod.DepictionService()
+    with qtbot.waitSignal(service.finished, timeout=1000):
+        service.depictModel(scene, model, 0)
+    assert not service.isRunning()
+
+@pytest.fixture
+def depiction_cache(mod, tmp_path):
+    mod.DepictionCache.clear()
+    mod.DepictionCache.setDirectory(str(tmp_path))
+    yield mod.DepictionCache
+    mod.DepictionCache.setDirectory("")
+    mod.DepictionCache.clear()
+
+@pytest.mark.parametrize("molecule", MOLECULES)
+def test_depiction_cache(mod, depiction_cache, tmp_path, molecule):
+    """Check that depictions are cached in memory and on disk."""
+
+    size = QSize(100, 100)
+    pixmap = depiction_cache.pixmap(molecule['smiles'], 0, size)
+    assert pixmap.toImage() == mod.SmilesToPixmap(molecule['smiles'], size).toImage()
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert files[0].name == depiction_cache.key(molecule['smiles'], 0, size) + ".png"
+
+    # Depiction is read from disk once memory has been cleared
+    depiction_cache.clear()
+    mtime = files[0].stat().st_mtime_ns
+    assert depiction_cache.pixmap(molecule['smiles'], 0, size).toImage() == pixmap.toImage()
+    assert list(tmp_path.iterdir()) == files
+    assert files[0].stat().st_mtime_ns == mtime
+
+    # Other sizes are cached separately
+    depiction_cache.pixmap(molecule['smiles'], 0, QSize(50, 50))
+    assert len(list(tmp_path.iterdir())) == 2
+
+def test_depiction_cache_key(mod):
+    """Check that different notations of the same structure share the same key."""
+
+    size = QSize(100, 100)
+    assert mod.DepictionCache.key("CCO", 0, size) == mod.DepictionCache.key("OCC", 0, size)
+    assert mod.DepictionCache.key("CCO", -1, size) == mod.DepictionCache.key("OCC", 0, size)
+    assert mod.DepictionCache.key("CCO", 0, size) != mod.DepictionCache.key("CCN", 0, size)
+    assert mod.DepictionCache.key("CCO", 0, size) != mod.DepictionCache.key("CCO", 0, QSize(50, 50))
+
+def test_depiction_cache_parse_once(monkeypatch):
+    """Check that SMILES are parsed once to compute the key and render the depiction, and not parsed again."""
+
+    module = PySide6MolecularNetwork.mol_depiction
+    calls = []
+    mol_from_smiles = module.MolFromSmiles
+    monkeypatch.setattr(module, 'MolFromSmiles', lambda smiles: calls.append(smiles) or mol_from_smiles(smiles))
+
+    size = QSize(50, 50)
+    module.DepictionCache.clear()
+    smiles = "OCCCCCCCCCCCCCCCCCCC"
+    assert not module.DepictionCache.image(smiles, 0, size).isNull()
+    assert calls == [smiles]
+    assert not module.DepictionCache.image(smiles, 0, size).isNull()
+    assert module.DepictionCache.key(smiles, 0, size) == module.DepictionCache.key(smiles[::-1], 0, size)
+    assert calls == [smiles, smiles[::-1]]
+    module.DepictionCache.clear()
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_scene_pixmaps_parse_once(monkeypatch, lazy):
+    """Check that scenes parse SMILES once to render shared depictions."""
+
+    module = PySide6MolecularNetwork.mol_depiction
+    calls = []
+    mol_from_smiles = module.MolFromSmiles
+    monkeypatch.setattr(module, 'MolFromSmiles', lambda smiles: calls.append(smiles) or mol_from_smiles(smiles))
+
+    module.DepictionCache.clear()
+    texts = ["OCCCCCCCCCCCCCCCCCCN" if lazy else "NCCCCCCCCCCCCCCCCCCO", "C1CCCCCCCCCCCCCCCCC1"]
+    model = QStandardItemModel()
+    for text in texts * 2:
+        model.appendRow([QStandardItem(text)])
+    scene = create_depiction_scene(PySide6MolecularNetwork._pure, model)
+    scene.setLazyPixmaps(lazy)
+    scene.setPixmapsFromModel(model, 0)
+    for node in scene.nodes():
+        scene.requestDepiction(node)
+    scene.flushDepictions()
+    assert sorted(calls) == sorted(texts)
+    assert scene.sharedPixmapsCount() == 2
+    module.DepictionCache.clear()
+
+def test_depiction_cache_limit(mod, depiction_cache, tmp_path):
+    """Check that least recently used depictions are discarded from memory when the cache is full."""
+
+    limit = depiction_cache.cacheLimit()
+    try:
+        # Each 100x100 depiction takes 39 KB
+        depiction_cache.setDirectory("")
+        depiction_cache.setCacheLimit(100)
+        assert depiction_cache.cacheLimit() == 100
+
+        size = QSize(100, 100)
+        images = [depiction_cache.image(molecule['smiles'], 0, size) for molecule in MOLECULES[:3]]
+        assert depiction_cache.image(MOLECULES[2]['smiles'], 0, size).cacheKey() == images[2].cacheKey()
+        assert depiction_cache.image(MOLECULES[0]['smiles'], 0, size).cacheKey() != images[0].cacheKey()
+    finally:
+        depiction_cache.setCacheLimit(limit)
+
+STRUCTURES = [m['smiles'] for m in MOLECULES] + ["", "invalid", MOLECULES[0]['inchi'], "InChI=invalid"]
+STRUCTURES_STATUS = [DEPICTION_OK] * len(MOLECULES) + [DEPICTION_EMPTY, DEPICTION_PARSE_ERROR, DEPICTION_OK,
+                                                        DEPICTION_PARSE_ERROR]
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_parse_structures(mod, chunk_size):
+    """Check that ParseStructures gives molecules and status of each row."""
+
+    mols, status, timings = mod.ParseStructures(STRUCTURES, chunk_size=chunk_size)
+    assert len(mols) == len(STRUCTURES)
+    assert status.tolist() == STRUCTURES_STATUS
+    assert [mol is not None for mol in mols] == [s == DEPICTION_OK for s in STRUCTURES_STATUS]
+    assert timings.shape == (len(STRUCTURES),)
+    assert np.all(timings >= 0)
+
+    mols, status, timings = mod.ParseStructures([])
+    assert mols == [] and len(status) == 0 and len(timings) == 0
+
+def test_parse_structures_process_pool(mod):
+    """Check that ParseStructures can use a pool of processes."""
+
+    with ProcessPoolExecutor(2) as executor:
+        mols, status, _ = mod.ParseStructures(STRUCTURES, chunk_size=4, executor=executor)
+    assert status.tolist() == STRUCTURES_STATUS
+    assert [mol is not None for mol in mols] == [s == DEPICTION_OK for s in STRUCTURES_STATUS]
+
+def test_depict_structures(mod):
+    """Check that DepictStructures gives images and status of each row."""
+
+    with open(MOLECULES[0]['svg'], 'r') as f:
+        svg = f.read()
+    with open(MOLECULES[0]['image'], 'rb') as f:
+        b64 = "b64=" + base64.b64encode(f.read()).decode()
+    texts = STRUCTURES + [svg, "<svg>invalid", b64, "b64=!!!", "b64=" + base64.b64encode(b"invalid").decode()]
+    expected = STRUCTURES_STATUS + [DEPICTION_OK, DEPICTION_PARSE_ERROR, DEPICTION_OK, DEPICTION_PARSE_ERROR,
+                                    DEPICTION_ERROR]
+
+    images, status, timings = mod.DepictStructures(texts, size=QSize(50, 50), chunk_size=3)
+    assert status.tolist() == expected
+    assert [not image.isNull() for image in images] == [s == DEPICTION_OK for s in expected]
+    assert len(timings) == len(texts)
+
+def test_depict_structures_parsed(mod):
+    """Check that DepictStructures draws molecules given by ParseStructures instead of parsing structures again."""
+
+    size = QSize(50, 50)
+    mols, parse_status, _ = mod.ParseStructures(STRUCTURES)
+    images, status, _ = mod.DepictStructures(STRUCTURES, size=size, mols=mols)
+    assert status.tolist() == parse_status.tolist()
+    expected, _, _ = mod.DepictStructures(STRUCTURES, size=size)
+    assert images == expected
+
+    # Rows whose molecule is missing failed to be parsed
+    _, status, _ = mod.DepictStructures(STRUCTURES[:2], size=size, mols=[mols[0], None])
+    assert status.tolist() == [DEPICTION_OK, DEPICTION_PARSE_ERROR]
+
+    with pytest.raises(ValueError):
+        mod.DepictStructures(STRUCTURES, size=size, mols=mols[:2])
+
+def test_depict_structures_failures(mod, monkeypatch):
+    """Check that structures that failed to be depicted are not parsed again."""
+
+    cache = PySide6MolecularNetwork.mol_depiction.DepictionCache
+    texts = ["invalid", "InChI=invalid"]
+    cache.clear()
+    _, status, _ = mod.DepictStructures(texts, size=QSize(50, 50))
+    assert status.tolist() == [DEPICTION_PARSE_ERROR] * 2
+
+    calls = []
+    monkeypatch.setattr(PySide6MolecularNetwork.mol_depiction, 'ParseStructure',
+                        lambda *args: calls.append(args) or (None, DEPICTION_PARSE_ERROR))
+    _, status, _ = mod.DepictStructures(texts, size=QSize(50, 50))
+    assert status.tolist() == [DEPICTION_PARSE_ERROR] * 2
+    assert calls == []
+
+    # Failures are forgotten when the cache is cleared
+    cache.clear()
+    mod.DepictStructures(texts, size=QSize(50, 50))
+    assert len(calls) == 2
+    cache.clear()
+
+def test_depiction_service_status(mod, qtbot):
+    """Check that DepictionService reports the status of each depiction."""
+
+    model = QStandardItemModel()
+    for text in STRUCTURES:
+        model.appendRow([QStandardItem(text)])
+    scene = create_depiction_scene(mod, model)
+
+    service = mod.DepictionService()
+    with qtbot.waitSignal(service.finished, timeout=10000):
+        service.depictModel(scene, model, 0, type=-1, size=QSize(50, 50))
+
+    # Empty rows are not submitted
+    expected = [(i, s) for i, s in enumerate(STRUCTURES_STATUS) if s != DEPICTION_EMPTY]
+    assert service.indexes().tolist() == [i for i, _ in expected]
+    assert service.status().tolist() == [s for _, s in expected]
+    assert np.all(service.timings() >= 0)
+    service.shutdown()
+
+@pytest.mark.parametrize("texts,expected", [
+    (["CCO"] * 200, [DEPICTION_SMILES] * 200),
+    (["InChI=1S/CH4/h1H4"] * 200, [DEPICTION_INCHI] * 200),
+    (["b64=AAAA"] * 200, [DEPICTION_BASE64] * 200),
+    # Rows of another type missed by the sample are still detected
+    (["InChI=1S/CH4/h1H4"] * 100 + ["<svg/>"] + ["InChI=1S/CH4/h1H4"] * 99,
+     [DEPICTION_INCHI] * 100 + [DEPICTION_SVG] + [DEPICTION_INCHI] * 99),
+    (["CCO", "InChI=1S/CH4/h1H4", "b64=AAAA", "<?xml version='1.0'?><svg/>", "<svg/>"],
+     [DEPICTION_SMILES, DEPICTION_INCHI, DEPICTION_BASE64, DEPICTION_SVG, DEPICTION_SVG]),
+    ([], []),
+])
+def test_depiction_types(texts, expected):
+    """Check that DepictionTypes detects the type of each row of a column."""
+
+    assert DepictionTypes(texts, DEPICTION_AUTO, sample_size=16).tolist() == expected
+    assert DepictionTypes(texts, DEPICTION_SMILES).tolist() == [DEPICTION_SMILES] * len(texts)
@@ -1,9 +1,12 @@
-from PySide6.QtGui import QColor, QFont, QBrush, QFontMetrics, QPixmap
+from PySide6.QtGui import QColor, QFont, QBrush, QFontMetrics, QPen, QPixmap
 from PySide6.QtCore import Qt, QSize
 
 import pytest
+import gc
 import hashlib
+import tracemalloc
 import PySide6MolecularNetwork
+import PySide6MolecularNetwork._pure
 from PySide6MolecularNetwork.node import NodePolygon, NODE_POLYGON_MAP
 from PySide6.QtGui import QPolygonF
 from PySide6.QtCore import QPointF
@@ -168,6 +171,34 @@ def test_node_set_pixmap(mod, molecule):
     assert p.size() == pixmap.size()
     assert p.cacheKey() == pixmap.cacheKey()
 
+@pytest.mark.parametrize("size,lod,expected", [(QSize(320, 320), 1, QSize(80, 80)),
+                                               (QSize(320, 320), 0.1, QSize(20, 20)),
+                                               (QSize(320, 320), 10, QSize(320, 320)),
+                                               (QSize(320, 160), 1, QSize(80, 40))])
+def test_node_depiction_size(mod, size, lod, expected):
+    """Check that depictionSize gives the smallest mip level large enough for the level of detail."""
+
+    node = mod.Node(12)
+    assert node.depictionSize(lod) == QSize()
+    node.setDepiction("CCO", mod.NetworkScene.PixmapsSmiles, size)
+    assert node.depiction() == "CCO"
+    assert node.hasPendingDepiction()
+    assert node.depictionSize(lod) == expected
+
+    node.renderDepiction(expected)
+    assert node.pixmap().size() == expected
+    assert not node.hasPendingDepiction()
+
+    # Smaller sizes do not replace the pixmap, larger ones do
+    node.renderDepiction(QSize(10, 10))
+    assert node.pixmap().size() == expected
+    node.renderDepiction()
+    assert node.pixmap().size() == size
+
+    node.releaseDepiction()
+    assert node.pixmap().isNull()
+    assert node.hasPendingDepiction()
+
 @pytest.mark.parametrize("molecule", MOLECULES)
 @pytest.mark.parametrize("size", SIZES)
 def test_node_set_pixmap_from_smiles(mod, molecule, size):
@@ -253,3 +284,53 @@ def test_node_shape_set_font(mod):
     node.setFont(font)
     assert node.font() == font
     assert node.boundingRect().width() < width
+
+
+def test_node_shape_set_pen(mod):
+    """Check that shape is modified when pen width is changed"""
+
+    node = mod.Node(226, "")
+    width = node.shape().boundingRect().width()
+    node.setPen(QPen(Qt.black, 20))
+    assert node.shape().boundingRect().width() > width
+    assert node.shape().contains(QPointF(node.rect().right() + 8, 0))
+
+    node.setPen(QPen(Qt.black, 0))
+    assert node.shape().boundingRect().width() < width
+
+
+def test_node_default_values(mod):
+    """Check that modifying values returned by a node does not affect other nodes."""
+
+    a, b = mod.Node(0), mod.Node(1)
+    a.overlayBrush().setColor(Qt.red)
+    a.textColor().setRed(200)
+    a.customPolygon().append(QPointF(1, 1))
+    c = mod.Node(2)
+    for node in (a, b, c):
+        assert node.overlayBrush() == QBrush()
+        assert node.textColor() == QColor(Qt.black)
+        assert node.customPolygon().isEmpty()
+
+    edge = mod.Edge(0, a, b)
+    edge.source_point.setX(10)
+    assert mod.Edge(1, a, b).source_point == QPointF()
+
+
+def test_node_memory():
+    """Check that pure Python nodes with default state share their default objects instead of allocating their
+    own. See examples/memory_per_node.py for a measure on a full scene."""
+
+    count = 2000
+    PySide6MolecularNetwork._pure.Node(0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        nodes = [PySide6MolecularNetwork._pure.Node(i) for i in range(count)]
+        gc.collect()
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(nodes) == count
+    assert memory / count < 600
@@ -1,8 +1,10 @@
 from PySide6.QtGui import (QPen, QColor, QStandardItemModel, QStandardItem,
-                         QPixmap, QPainter, QImage, QBrush, QPolygonF)
-from PySide6.QtWidgets import QGraphicsItem
-from PySide6.QtCore import Qt, QPoint, QPointF, QSize
+                         QPixmap, QPainter, QImage, QBrush, QPolygonF, QFont)
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsScene, QGraphicsView
+from PySide6.QtCore import Qt, QPoint, QPointF, QSize, QRectF, QAbstractTableModel, QModelIndex
 from PySide6MolecularNetwork.node import NodePolygon, NODE_POLYGON_MAP
+from PySide6MolecularNetwork.spatial_index import SpatialIndex
+from PySide6MolecularNetwork.attributes import AttributesTable
 
 import pytest
 import hashlib
@@ -17,8 +19,7 @@ POSITIONS = [(56, 196), (136, 236), (60, 300), (160, 328), (232, 252),
 LINKS = [(0, 1), (1, 2), (1, 3), (1, 4), (1, 5), (4, 5), (5, 6), (5, 7), (5, 8), (5, 9)]
 WIDTHS = (11.024, 9.868, 13.504, 6.664, 9.944, 10.036, 7.984, 11.028, 6.464, 8.504)
   
-@pytest.fixture
-def scene(mod, qapp):
+def create_scene(mod):
     scene = mod.NetworkScene()
     nodes = scene.createNodes(range(len(POSITIONS)),
                            labels=["({},{})".format(x, y) for x, y in POSITIONS],
@@ -29,6 +30,11 @@ def scene(mod, qapp):
 
     return scene
 
+
+@pytest.fixture
+def scene(mod, qapp):
+    return create_scene(mod)
+
     
 def test_scene_init(mod):
     """Check initialization of NetworkScene."""
@@ -179,6 +185,76 @@ def test_scene_create_edges_empty(mod):
     assert len(edges) == 0
         
         
+@pytest.mark.parametrize("with_optional", [True, False])
+def test_scene_create_nodes_from_arrays(mod, with_optional):
+    """Check that nodes can be created from arrays."""
+    
+    scene = mod.NetworkScene()
+    indexes = np.arange(len(POSITIONS), dtype=np.int32)
+    positions = np.asarray(POSITIONS, dtype=np.float64)
+    radii = np.arange(10, 10 + len(POSITIONS), dtype=np.int32)
+    colors = np.full(len(POSITIONS), 0xff336699, dtype=np.uint32)
+    colors[::2] = 0  # Transparent colors are ignored
+    labels = [f"node{i}" for i in indexes]
+    
+    if with_optional:
+        scene.createNodesFromArrays(indexes, positions, radii, colors, labels)
+    else:
+        scene.createNodesFromArrays(indexes)
+        
+    nodes = scene.nodes()
+    assert len(nodes) == len(indexes)
+    default_color = mod.NetworkScene().networkStyle().nodeBrush().color()
+    for i, node in enumerate(nodes):
+        assert node.index() == i
+        if with_optional:
+            assert node.label() == labels[i]
+            assert node.pos() == QPointF(*POSITIONS[i])
+            assert node.radius() == radii[i]
+            expected_color = QColor(0x33, 0x66, 0x99) if colors[i] else default_color
+            assert node.brush().color() == expected_color
+        else:
+            assert node.label() == str(i + 1)
+            assert node.pos() == QPointF(0, 0)
+            assert node.brush().color() == default_color
+            
+            
+def test_scene_create_nodes_from_arrays_mismatch(mod):
+    """Check that createNodesFromArrays refuses arrays shorter than indexes."""
+    
+    scene = mod.NetworkScene()
+    with pytest.raises(ValueError):
+        scene.createNodesFromArrays(np.arange(10), positions=np.zeros((5, 2)))
+    with pytest.raises(ValueError):
+        scene.createNodesFromArrays(np.arange(10), radii=np.ones(5))
+    with pytest.raises(ValueError):
+        scene.createNodesFromArrays(np.arange(10), colors=np.zeros(5))
+    with pytest.raises(ValueError):
+        scene.createNodesFromArrays(np.arange(10), labels=[str(i) for i in range(5)])
+    assert not scene.nodes()
+        
+        
+@pytest.mark.parametrize("widths", [None, np.linspace(0, 10, 5)])
+def test_scene_create_edges_from_arrays(mod, widths):
+    """Check that edges can be created from arrays of nodes indexes."""
+    
+    scene = mod.NetworkScene()
+    scene.createNodesFromArrays(np.arange(10), np.asarray(POSITIONS))
+    sources = np.arange(5, dtype=np.int32)
+    dests = np.arange(5, 10, dtype=np.int32)
+    dests[-1] = 100  # Edges referencing missing nodes are skipped
+    scene.createEdgesFromArrays(np.arange(5), sources, dests, widths)
+    
+    edges = scene.edges()
+    assert len(edges) == 4
+    for i, edge in enumerate(edges):
+        assert edge.index() == i
+        assert edge.sourceNode() == scene.node(sources[i])
+        assert edge.destNode() == scene.node(dests[i])
+        assert edge.width() == pytest.approx(widths[i] if widths is not None else 1.)
+        assert not edge.path().isEmpty()
+        
+        
 def test_scene_remove_all_nodes(scene):
     """Check that nodes can be removed from the scene."""
        
@@ -222,6 +298,28 @@ def test_scene_remove_edges(scene):
     assert len(scene.edges()) == 0
     
 
+def test_scene_remove_items_from_base_class(mod):
+    """Check that items removed with QGraphicsScene methods or moved to another scene are not kept by the scene."""
+
+    scene = mod.NetworkScene()
+    nodes = scene.createNodes(range(3))
+    edges = scene.createEdges(range(2), [nodes[0], nodes[1]], [nodes[1], nodes[2]], [1., 1.])
+    nodes[2].setSelected(True)
+    edges[1].setSelected(True)
+
+    QGraphicsScene.removeItem(scene, nodes[2])
+    QGraphicsScene.removeItem(scene, edges[1])
+    assert scene.nodes() == nodes[:2] and scene.node(2) is None
+    assert scene.edges() == edges[:1] and scene.edge(1) is None
+    assert scene.selectedNodes() == [] and scene.selectedEdges() == []
+
+    other = QGraphicsScene()
+    other.addItem(nodes[1])
+    assert scene.nodes() == nodes[:1]
+    assert scene.nodeAt(QPointF(0, 0)) is nodes[0]
+    other.removeItem(nodes[1])
+
+
 @pytest.mark.parametrize("scale", [0, 1, 0.245, 1000])
 def test_scene_set_scale(scene, scale, qtbot):
     """Check that scale can be changed."""
@@ -284,6 +382,58 @@ def test_scene_set_labels_from_model(scene, role):
         assert node.label() == str(node.index()+1)
       
       
+def test_scene_set_labels_geometry(mod, scene):
+    """Check that labels set at once give the same geometry as labels set on each node, for nodes sharing their
+    font and shape or not."""
+
+    nodes = scene.nodes()
+    nodes[0].setFont(QFont("Times", 32))
+    nodes[1].setPolygon(NodePolygon.Square)
+    nodes[2].setRadius(50)
+    labels = ["label" if i % 2 else "a much longer label" for i in range(len(nodes))]
+    scene.setLabels(labels)
+
+    for node, label in zip(nodes, labels):
+        single = mod.Node(node.index(), label)
+        single.setFont(node.font())
+        single.setPolygon(node.polygon())
+        single.setRadius(node.radius())
+        assert node.label() == label
+        assert node.boundingRect() == single.boundingRect()
+        assert node.shape().boundingRect() == single.shape().boundingRect()
+        assert node.shape().contains(QPointF(single.boundingRect().right() - 1, 0))
+
+
+def test_scene_set_labels_repaint(mod, qtbot):
+    """Check that nodes are repainted when their label changes for one of the same width."""
+
+    scene = mod.NetworkScene()
+    node, = scene.createNodes([0], labels=["12"], positions=[QPointF(0, 0)])
+
+    view = QGraphicsView(scene)
+    qtbot.addWidget(view)
+    view.resize(200, 200)
+    view.scale(3, 3)
+    view.centerOn(QPointF(0, 0))
+    view.show()
+    qtbot.waitExposed(view)
+
+    def grab():
+        qtbot.wait(50)
+        return view.grab().toImage()
+
+    image = grab()
+    node.setLabel("21")
+    assert node.boundingRect() == mod.Node(0, "12").boundingRect()
+    changed = grab()
+    assert changed != image
+
+    scene.setLabels(["12"])
+    assert grab() == image
+    scene.setLabels(["21"])
+    assert grab() == changed
+
+
 def test_scene_set_labels(scene):
     """Check that setLabels change labels on all nodes."""
 
@@ -387,6 +537,62 @@ def test_scene_set_pie_charts_from_model(scene, colors, role):
             assert len(node.pie()) == 0
             
 
+def test_scene_set_pie_charts(scene):
+    """Check that setPieCharts normalizes each row of a matrix and gives it to the node with the same index."""
+    
+    values = np.random.default_rng(0).random((len(scene.nodes()), 4))
+    values[3] = 0
+    scene.setPieCharts(values)
+    
+    for node in scene.nodes():
+        if node.index() == 3:
+            assert len(node.pie()) == 0
+        else:
+            assert node.pie() == pytest.approx(list(values[node.index()] / values[node.index()].sum()))
+            
+    # Matrix with less rows than nodes is ignored
+    scene.setPieCharts(np.ones((len(scene.nodes()) - 1, 2)))
+    assert scene.node(0).pie() == pytest.approx(list(values[0] / values[0].sum()))
+    
+    
+class TableModel(QAbstractTableModel):
+    def __init__(self, values):
+        super().__init__()
+        self._values = values
+        
+    def rowCount(self, parent=QModelIndex()):
+        return self._values.shape[0]
+    
+    def columnCount(self, parent=QModelIndex()):
+        return self._values.shape[1]
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return float(self._values[index.row(), index.column()])
+        
+        
+class ArrayTableModel(TableModel):
+    def data(self, index, role=Qt.DisplayRole):
+        raise AssertionError("Model should be read as an array")
+    
+    def __array__(self, dtype=None, copy=None):
+        return self._values
+    
+    
+@pytest.mark.parametrize("model_class", [TableModel, ArrayTableModel])
+def test_scene_set_pie_charts_from_array_model(scene, model_class):
+    """Check that models which can be converted to arrays give the same pie charts as other models."""
+    
+    values = np.arange(len(scene.nodes()) * 6, dtype=np.float64).reshape(-1, 6)
+    model = model_class(values)
+    scene.setPieColors([QColor(i) for i in range(2, 5)])
+    scene.setPieChartsFromModel(model, [1, 3, 5])
+    
+    for node in scene.nodes():
+        expected = values[node.index(), [1, 3, 5]]
+        assert node.pie() == pytest.approx(list(expected / expected.sum()))
+        
+
 def test_scene_set_pie_charts_visibility(qtbot, scene):
     """Check that setPieChartsVisibility effectively changed pie charts visibility."""
     
@@ -491,6 +697,29 @@ def test_scene_set_pixmaps_from_model_auto(mod, scene, molecule, role, type):
         for node in scene.nodes():
             assert node.pixmap().isNull()
         
+def test_scene_set_pixmaps_from_model_auto_mixed(mod, scene):
+    """Check that setPixmapsFromModel handles columns with several types of depictions."""
+
+    molecule = MOLECULES[0]
+    with open(molecule['image'], 'rb') as f:
+        b64 = "b64=" + base64.b64encode(f.read()).decode()
+    with open(molecule['svg'], 'r') as f:
+        svg = f.read()
+    data = [molecule['smiles'], molecule['inchi'], b64, svg]
+
+    model = QStandardItemModel()
+    for i in range(len(scene.nodes())):
+        model.setItem(i, 0, QStandardItem(data[i % len(data)]))
+
+    scene.setPixmapsFromModel(model, 0, Qt.DisplayRole, mod.NetworkScene.PixmapsAuto)
+    pixmap = QPixmap(molecule['image'])
+    for node in scene.nodes():
+        assert node.pixmap().size() == pixmap.size()
+
+    # Rows with identical SMILES share the same pixmap
+    pixmaps = {scene.nodes()[i].pixmap().cacheKey() for i in range(0, len(scene.nodes()), len(data))}
+    assert len(pixmaps) == 1
+
 @pytest.mark.parametrize("molecule", MOLECULES)
 def test_scene_reset_pixmaps(scene, molecule):
     """Check that reset pixmaps sucessfully reset pixmaps for all nodes in scene"""
@@ -509,6 +738,181 @@ def test_scene_reset_pixmaps(scene, molecule):
     for node in scene.nodes():
         assert node.pixmap().isNull()
         
+@pytest.mark.parametrize("molecule", MOLECULES)
+def test_scene_lazy_pixmaps(mod, scene, molecule):
+    """Check that in lazy mode, pixmaps are only generated when nodes are painted with enough details."""
+
+    model = QStandardItemModel()
+    for i in range(len(scene.nodes())):
+        model.setItem(i, 0, QStandardItem(molecule['smiles']))
+
+    assert not scene.lazyPixmaps()
+    scene.setLazyPixmaps(True)
+    assert scene.lazyPixmaps()
+    scene.setPixmapsFromModel(model, 0)
+    for node in scene.nodes():
+        assert node.pixmap().isNull()
+        assert node.hasPendingDepiction()
+        assert node.depiction() == molecule['smiles']
+
+    # Too far to show pixmaps
+    image = QImage(QSize(40, 40), QImage.Format_ARGB32)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(image.rect()), QRectF(0, 0, 400, 400))
+    painter.end()
+    for node in scene.nodes():
+        assert node.pixmap().isNull()
+
+    render_image(scene)
+    for node in scene.nodes():
+        assert not node.hasPendingDepiction()
+        size = node.depictionSize(1)
+        assert node.pixmap().toImage() == mod.SmilesToPixmap(molecule['smiles'], size).toImage()
+
+    # Setting a pixmap replaces the depiction
+    scene.setPixmapsFromModel(model, 0)
+    scene.nodes()[0].setPixmap(QPixmap(molecule['image']))
+    assert not scene.nodes()[0].hasPendingDepiction()
+    scene.resetPixmaps()
+    for node in scene.nodes():
+        assert not node.hasPendingDepiction()
+        assert node.pixmap().isNull()
+
+def test_scene_lazy_pixmaps_view(mod, qtbot):
+    """Check that in lazy mode, pixmaps are generated only for nodes in and around the view."""
+
+    scene = mod.NetworkScene()
+    scene.createNodes(range(20), positions=[QPointF(i * 100, 0) for i in range(20)])
+    scene.setLazyPixmaps(True)
+    for node in scene.nodes():
+        node.setDepiction(MOLECULES[0]['smiles'])
+
+    view = QGraphicsView(scene)
+    qtbot.addWidget(view)
+    view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+    view.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+    view.resize(200, 200)
+    view.centerOn(QPointF(0, 0))
+    view.show()
+    qtbot.waitExposed(view)
+
+    # Nodes in view and close to it are depicted, but not the others
+    qtbot.waitUntil(lambda: not scene.node(2).hasPendingDepiction())
+    qtbot.wait(100)
+    assert all(not scene.node(i).pixmap().isNull() for i in range(3))
+    assert all(scene.node(i).hasPendingDepiction() for i in range(5, 20))
+
+    # Nothing is generated when zoomed out too much
+    view.centerOn(QPointF(1900, 0))
+    view.scale(0.1, 0.1)
+    qtbot.wait(100)
+    assert all(scene.node(i).hasPendingDepiction() for i in range(5, 20))
+
+def test_scene_depictions_mipmaps(mod):
+    """Check that depictions are rendered again at higher resolution when zooming in, but not when zooming out."""
+
+    scene = mod.NetworkScene()
+    node, = scene.createNodes([0], positions=[QPointF(200, 200)])
+    node.setDepiction(MOLECULES[0]['smiles'])
+
+    render_image(scene)
+    assert node.pixmap().size() == node.depictionSize(1)
+    assert node.pixmap().size().width() < 300
+
+    image = QImage(QSize(400, 400), QImage.Format_ARGB32)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(image.rect()), QRectF(150, 150, 100, 100))
+    painter.end()
+    assert node.pixmap().size() == QSize(300, 300)
+
+    render_image(scene)
+    assert node.pixmap().size() == QSize(300, 300)
+
+def test_scene_depictions_memory_limit(mod, scene):
+    """Check that least recently rendered depictions are released when memory limit is reached."""
+
+    assert scene.depictionsMemoryLimit() > 0
+    for node in scene.nodes():
+        node.setDepiction(MOLECULES[node.index()]['smiles'])
+
+    # Each depiction takes 21 KB
+    scene.setDepictionsMemoryLimit(50)
+    assert scene.depictionsMemoryLimit() == 50
+    render_image(scene)
+    assert sum(not node.pixmap().isNull() for node in scene.nodes()) == 2
+    assert sum(node.hasPendingDepiction() for node in scene.nodes()) == len(scene.nodes()) - 2
+
+    scene.setDepictionsMemoryLimit(10)
+    assert sum(not node.pixmap().isNull() for node in scene.nodes()) == 1
+
+    scene.setDepictionsMemoryLimit(1000)
+    render_image(scene)
+    assert all(not node.pixmap().isNull() for node in scene.nodes())
+
+    # A pixmap shared by several nodes is only counted once
+    scene.resetPixmaps()
+    scene.setDepictionsMemoryLimit(50)
+    for node in scene.nodes():
+        node.setDepiction(MOLECULES[0]['smiles'])
+    render_image(scene)
+    assert all(not node.pixmap().isNull() for node in scene.nodes())
+
+def test_scene_depictions_memory_limit_view(mod, qtbot):
+    """Check that depictions are not requested again and again when the memory limit is lower than what the view
+    needs."""
+
+    scene = mod.NetworkScene()
+    scene.createNodes(range(20), positions=[QPointF(i * 60, 0) for i in range(20)])
+    scene.setLazyPixmaps(True)
+    for node in scene.nodes():
+        node.setDepiction(MOLECULES[node.index() % len(MOLECULES)]['smiles'])
+    scene.setDepictionsMemoryLimit(50)
+
+    view = QGraphicsView(scene)
+    qtbot.addWidget(view)
+    view.resize(1400, 300)
+    view.centerOn(QPointF(600, 0))
+    view.show()
+    qtbot.waitExposed(view)
+
+    # Pixmaps are not released and rendered again once the limit is reached
+    qtbot.wait(300)
+    pixmaps = [node.pixmap().cacheKey() for node in scene.nodes()]
+    qtbot.wait(300)
+    assert [node.pixmap().cacheKey() for node in scene.nodes()] == pixmaps
+    assert 0 < sum(not node.pixmap().isNull() for node in scene.nodes()) < 20
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_scene_shared_pixmaps(mod, scene, lazy):
+    """Check that nodes with identical depictions share the same pixmap."""
+
+    model = QStandardItemModel()
+    for i in range(len(scene.nodes())):
+        # Different notations of the same molecule give the same depiction
+        smiles = MOLECULES[0]['smiles'] if i < 6 else MOLECULES[1]['smiles']
+        if i == 5:
+            smiles = "OCC"
+        elif i == 4:
+            smiles = "CCO"
+        model.setItem(i, 0, QStandardItem(smiles))
+
+    scene.setLazyPixmaps(lazy)
+    scene.setPixmapsFromModel(model, 0)
+    render_image(scene)
+    nodes = scene.nodes()
+    assert scene.sharedPixmapsCount() == 3
+    assert len({node.pixmap().cacheKey() for node in nodes}) == 3
+    assert len({node.pixmap().cacheKey() for node in nodes[:4]}) == 1
+    assert nodes[4].pixmap().cacheKey() == nodes[5].pixmap().cacheKey()
+
+    # Pixmaps are released when no node uses them anymore
+    nodes[4].setPixmap(QPixmap())
+    assert scene.sharedPixmapsCount() == 3
+    scene.removeItem(nodes[5])
+    assert scene.sharedPixmapsCount() == 2
+    scene.resetPixmaps()
+    assert scene.sharedPixmapsCount() == 0
+
 def test_scene_set_pixmap_visibility(qtbot, scene):
     """Check that setPixmapVisibility effectively changed pixmap visibility."""
     
@@ -578,6 +982,144 @@ def test_scene_show_hide_items(qtbot, scene):
         assert edge.isVisible() == True
         
         
+def test_scene_set_items_visible(qtbot, scene):
+    """Check that nodes/edges can be shown/hidden from masks, that edges with a hidden end are hidden, that
+    showing nodes does not show edges hidden explicitly and that itemsVisibilityChanged is emitted once."""
+
+    nodes = scene.nodes()
+    edges = scene.edges()
+    emitted = []
+    scene.itemsVisibilityChanged.connect(lambda: emitted.append(True))
+
+    mask = np.ones(len(nodes), dtype=bool)
+    mask[[0, 3]] = False
+    scene.setNodesVisible(mask)
+    assert [node.isVisible() for node in nodes] == mask.tolist()
+    assert [edge.isVisible() for edge in edges] == [edge.sourceNode().isVisible() and edge.destNode().isVisible()
+                                                   for edge in edges]
+    assert any(edge.isVisible() for edge in edges) and not all(edge.isVisible() for edge in edges)
+    assert len(emitted) == 1
+
+    # Nothing is emitted if visibility does not change
+    scene.setNodesVisible(np.flatnonzero(mask))
+    assert len(emitted) == 1
+
+    hidden_edge = next(edge for edge in edges if edge.isVisible())
+    scene.setEdgesVisible([edge.index() for edge in edges if edge is not hidden_edge])
+    assert not hidden_edge.isVisible()
+    assert [edge.isVisible() for edge in edges if edge is not hidden_edge] == [
+        edge.sourceNode().isVisible() and edge.destNode().isVisible() for edge in edges if edge is not hidden_edge]
+    assert len(emitted) == 2
+
+    # Edges hidden with their ends are shown again, edges hidden explicitly stay hidden
+    scene.setNodesVisible(np.ones(len(nodes), dtype=bool))
+    assert all(node.isVisible() for node in nodes)
+    assert [edge.isVisible() for edge in edges] == [edge is not hidden_edge for edge in edges]
+    assert len(emitted) == 3
+
+    scene.hideItems([edges[-1]])
+    scene.setNodesVisible([node.index() for node in nodes if node is not edges[0].sourceNode()])
+    assert not edges[0].isVisible() and not hidden_edge.isVisible() and not edges[-1].isVisible()
+    scene.setNodesVisible(np.ones(len(nodes), dtype=bool))
+    assert edges[0].isVisible() and not hidden_edge.isVisible() and not edges[-1].isVisible()
+    assert len(emitted) == 6
+
+    scene.showAllItems()
+    assert all(item.isVisible() for item in nodes + edges)
+    assert len(emitted) == 7
+
+    scene.setNodesVisible([])
+    assert not any(item.isVisible() for item in nodes + edges)
+    assert scene.visibleNodesBoundingRect().isNull()
+    assert len(emitted) == 8
+
+
+@pytest.mark.parametrize("expression,expected", [
+    ("x > 2", [False, False, False, True, True, False]),
+    ("1 <= x < 4 and not y == 1", [False, True, False, False, False, False]),
+    ("(x >= 4) | (y > 0)", [False, False, True, True, True, False]),
+    ("abs(x - 2 * y) <= 1", [True, True, True, True, False, False]),
+    ("isnan(y)", [False, False, False, False, True, True]),
+    ("y != y", [False, False, False, False, True, True]),
+    ("1", [True] * 6),
+    ("x > 1 and True", [False, False, True, True, True, False]),
+    ("min(x, y) >= 1", [False, False, True, True, True, False]),
+])
+def test_attributes_table_evaluate(expression, expected):
+    """Check that filter expressions are evaluated element-wise and that missing values compare as false."""
+
+    table = AttributesTable()
+    table.setColumn("x", [0, 1, 2, 3, 4])
+    table.setColumn("y", [0, 0, 1, 1], indexes=[0, 1, 3, 2])
+    assert len(table) == 5
+    table.setColumn("z", [1], indexes=[5])
+    assert len(table) == 6
+    assert np.isnan(table.column("x")[5])
+
+    assert table.evaluate(expression).tolist() == expected
+
+
+@pytest.mark.parametrize("expression", ["x >", "x.real > 1", "__import__('os')", "x if x else y", "unknown > 1",
+                                        "'a' > x", "x[0] > 1", "sqrt(x, x) > 100", "min(x) > 1", "abs() > 1",
+                                        "max(*x) > 1"])
+def test_attributes_table_evaluate_invalid(expression):
+    """Check that unsupported expressions, unknown attributes or wrong number of arguments raise a ValueError and
+    leave columns untouched."""
+
+    table = AttributesTable()
+    table.setColumn("x", [0, 1, 4])
+    table.setColumn("y", [0, 1, 2])
+    with pytest.raises(ValueError):
+        table.evaluate(expression)
+    assert table.column("x").tolist() == [0, 1, 4]
+    with pytest.raises(ValueError):
+        table.column("x")[0] = 1
+
+
+def test_scene_filters(qtbot, scene):
+    """Check that nodes and edges are shown or hidden from filters over their attributes."""
+
+    nodes = scene.nodes()
+    edges = scene.edges()
+    scene.setNodesAttribute("spectra", [5, 1, 3, 4, 2, 8, 9, 1], indexes=range(8))
+    scene.setEdgesAttribute("cosine", np.linspace(0, 1, len(edges)))
+    assert scene.nodesAttributes() == ["spectra"]
+    assert scene.edgesAttributes() == ["cosine"]
+    assert scene.nodesAttribute("spectra")[:3].tolist() == [5, 1, 3]
+
+    with qtbot.waitSignal(scene.itemsVisibilityChanged):
+        scene.setNodesFilter("spectra >= 3")
+    assert scene.nodesFilter() == "spectra >= 3"
+    # Nodes 8 and 9 have no value and are hidden
+    assert [node.isVisible() for node in nodes] == [True, False, True, True, False, True, True, False, False, False]
+
+    scene.setEdgesFilter("cosine > 0.3")
+    for edge, cosine in zip(edges, scene.edgesAttribute("cosine")):
+        assert edge.isVisible() == (cosine > 0.3 and edge.sourceNode().isVisible() and edge.destNode().isVisible())
+
+    # Invalid filters are not kept
+    for expression in ("score > 0.3", "min(cosine) > 0.3"):
+        with pytest.raises(ValueError):
+            scene.setEdgesFilter(expression)
+        assert scene.edgesFilter() == "cosine > 0.3"
+    scene.applyFilters()
+
+    # Attributes can't be modified in place
+    with pytest.raises(ValueError):
+        scene.nodesAttribute("spectra")[0] = 0
+
+    scene.setNodesFilter(None)
+    assert all(node.isVisible() for node in nodes)
+    for edge, cosine in zip(edges, scene.edgesAttribute("cosine")):
+        assert edge.isVisible() == (cosine > 0.3)
+
+    scene.setEdgesFilter(None)
+    assert all(item.isVisible() for item in nodes + edges)
+
+    scene.removeNodesAttribute("spectra")
+    assert scene.nodesAttributes() == []
+
+
 def test_scene_hide_selected_items(qtbot, scene):
     """Check that hideSelectedItems hide only selected items"""
     
@@ -655,6 +1197,37 @@ def test_scene_set_selection(scene):
         assert edges[i+2].isVisible() == True
         
         
+@pytest.mark.parametrize("kind", ["nodes", "edges"])
+def test_scene_set_selection_from_array(scene, qtbot, kind):
+    """Check that nodes/edges can be selected from arrays of indexes or masks, with a single selectionChanged."""
+
+    if kind == "nodes":
+        items, set_selection = scene.nodes(), scene.setNodesSelection
+    else:
+        items, set_selection = scene.edges(), scene.setEdgesSelection
+    count = len(items)
+
+    mask = np.zeros(count, dtype=bool)
+    mask[::2] = True
+    with qtbot.waitSignal(scene.selectionChanged, timeout=100):
+        set_selection(mask)
+    assert [item.isSelected() for item in items] == mask.tolist()
+
+    emitted = []
+    scene.selectionChanged.connect(lambda: emitted.append(True))
+    set_selection(np.array([1, 2, count + 10, -1]))
+    assert [item.isSelected() for item in items] == [i in (1, 2) for i in range(count)]
+    assert len(emitted) == 1
+
+    # Nothing is emitted if selection does not change
+    set_selection(np.array([2, 1], dtype=np.int64))
+    assert len(emitted) == 1
+
+    set_selection(np.zeros(count, dtype=bool))
+    assert not any(item.isSelected() for item in items)
+    assert len(emitted) == 2
+
+        
 @pytest.mark.parametrize("color", [QColor(), QColor(Qt.blue)])
 def test_scene_set_selected_nodes_color(scene, color):
     """Check that setSelectedNodesColor modify only the color of selected nodes
@@ -849,6 +1422,32 @@ def test_scene_set_nodes_polygons(mod, scene, polygon_ids):
         for node in scene.nodes():
             assert node.polygon() == circle
             
+def test_scene_state_arrays(mod, scene):
+    """Check that arrays of radii, colors, polygons and widths follow changes made to items."""
+
+    nodes = scene.nodes()
+    edges = scene.edges()
+    assert scene.nodesRadiiArray().tolist() == [node.radius() for node in nodes]
+    assert scene.nodesColorsArray().tolist() == [node.brush().color().rgba() for node in nodes]
+    assert scene.nodesPolygonsArray().tolist() == [NodePolygon.Circle.value] * len(nodes)
+    assert scene.edgesWidthsArray().tolist() == pytest.approx([edge.width() for edge in edges])
+
+    nodes[2].setRadius(42)
+    nodes[3].setBrush(QColor(Qt.red))
+    nodes[4].setPolygon(mod.NodePolygon.Star)
+    edges[1].setWidth(3.5)
+    scene.removeNodes([nodes[0]])
+    scene.removeEdges([edges[0]])
+
+    nodes, edges = nodes[1:], edges[1:]
+    assert scene.nodesRadiiArray().tolist() == [node.radius() for node in nodes]
+    assert scene.nodesRadiiArray()[1] == 42
+    assert scene.nodesColorsArray()[2] == QColor(Qt.red).rgba()
+    assert scene.nodesPolygonsArray()[3] == NodePolygon.Star.value
+    assert scene.edgesWidthsArray()[0] == 3.5
+    assert scene.nodesRadii() == [node.radius() if node.radius() != 30 else 0 for node in nodes]
+
+
 def test_scene_nodes(scene):
     """Check that nodes are sorted by index."""
     
@@ -865,6 +1464,40 @@ def test_scene_edges(scene):
         assert edge.index() == i
             
             
+def test_scene_nodes_unordered(mod):
+    """Check that nodes are sorted by index even if they were not added in order."""
+    
+    scene = mod.NetworkScene()
+    indexes = [5, 2, 8, 0, 3]
+    scene.addNodes([mod.Node(i) for i in indexes])
+    assert [node.index() for node in scene.nodes()] == sorted(indexes)
+    
+    scene.addNode(mod.Node(1))
+    assert [node.index() for node in scene.nodes()] == sorted(indexes + [1])
+    
+    
+def test_scene_node_edge_by_index(scene):
+    """Check that nodes and edges can be retrieved from their index."""
+    
+    for node in scene.nodes():
+        assert scene.node(node.index()) is node
+    for edge in scene.edges():
+        assert scene.edge(edge.index()) is edge
+    assert scene.node(len(POSITIONS)) is None
+    assert scene.edge(len(LINKS)) is None
+    
+    node = scene.node(3)
+    scene.removeItem(node)
+    assert scene.node(3) is None
+    assert node not in scene.nodes()
+    
+    scene.clear()
+    assert scene.node(0) is None
+    assert scene.edge(0) is None
+    assert len(scene.nodes()) == 0
+    assert len(scene.edges()) == 0
+    
+    
 def test_scene_selected_nodes(scene):
     """Check that selectedNodes returns only selected nodes."""
     
@@ -891,6 +1524,33 @@ def test_scene_selected_edges(scene):
     assert set(r) == selected_edges
 
 
+@pytest.mark.parametrize("kind", ["nodes", "edges"])
+def test_scene_selected_indexes(scene, kind):
+    """Check that indexes of selected nodes/edges follow selection, clearing and removal of items."""
+
+    if kind == "nodes":
+        items, selected, selected_indexes, remove = (scene.nodes(), scene.selectedNodes,
+                                                     scene.selectedNodesIndexes, scene.removeNodes)
+    else:
+        items, selected, selected_indexes, remove = (scene.edges(), scene.selectedEdges,
+                                                     scene.selectedEdgesIndexes, scene.removeEdges)
+
+    assert selected_indexes().tolist() == []
+    for item in reversed(items[::3]):
+        item.setSelected(True)
+    expected = [item.index() for item in items[::3]]
+    assert selected_indexes().tolist() == expected
+    assert selected() == items[::3]
+
+    items[0].setSelected(False)
+    remove([items[3]])
+    assert selected_indexes().tolist() == expected[2:]
+
+    scene.clearSelection()
+    assert selected_indexes().tolist() == []
+    assert selected() == []
+
+
 def test_scene_paint_no_scene(mod, qtbot):
     """Check that painting scene does not throw an error."""
     
@@ -999,6 +1659,44 @@ def test_scene_visible_nodes_bounding_rect(scene):
         bounding_rect = new_bounding_rect
         
         
+def test_scene_visible_nodes_bounding_rect_incremental(mod):
+    """Check that visibleNodesBoundingRect stays exact when nodes move, are resized, hidden or shown."""
+
+    def expected_rect(scene):
+        rect = QRectF()
+        for node in scene.nodes():
+            if node.isVisible() and not node.flags() & QGraphicsItem.ItemHasNoContents:
+                rect |= node.sceneBoundingRect()
+        return rect
+
+    rng = random.Random(0)
+    scene = mod.NetworkScene()
+    scene.createNodes(range(50))
+    scene.setLayout(np.array([(rng.uniform(-500, 500), rng.uniform(-500, 500)) for _ in range(50)]),
+                    isolated_nodes=[0, 1])
+    assert scene.visibleNodesBoundingRect() == expected_rect(scene)
+
+    for _ in range(200):
+        node = scene.node(rng.randrange(50))
+        action = rng.randrange(4)
+        if action == 0:
+            node.setPos(rng.uniform(-700, 700), rng.uniform(-700, 700))
+        elif action == 1:
+            node.setRadius(rng.randrange(5, 60))
+        elif action == 2:
+            node.hide()
+        else:
+            node.show()
+        assert scene.visibleNodesBoundingRect() == expected_rect(scene)
+
+    scene.setScale(2)
+    assert scene.visibleNodesBoundingRect() == expected_rect(scene)
+    scene.removeNodes(scene.nodes()[:25])
+    assert scene.visibleNodesBoundingRect() == expected_rect(scene)
+    scene.hideAllItems()
+    assert scene.visibleNodesBoundingRect().isNull()
+
+
 def test_scene_items_bounding_rect(mod):
     """Check that itemsBoundingRect increase as new nodes are added."""
     
@@ -1025,6 +1723,103 @@ def test_scene_items_bounding_rect(mod):
         bounding_rect = new_bounding_rect
 
 
+@pytest.mark.parametrize("count", [0, 1, 7, 500])
+@pytest.mark.parametrize("contains", [False, True])
+def test_spatial_index(count, contains):
+    """Check that SpatialIndex finds the same rectangles as a linear search."""
+
+    rng = np.random.default_rng(count)
+    positions = rng.uniform(-1000, 1000, (count, 2))
+    radii = rng.uniform(1, 50, (count, 1))
+    rects = np.hstack((positions - radii, positions + radii))
+    index = SpatialIndex(rects)
+    assert len(index) == count
+
+    for left, top, width, height in [(-1000, -1000, 2000, 2000), (0, 0, 100, 300), (10, 10, 0, 0),
+                                     (2000, 2000, 10, 10), (-3000, -3000, 6000, 6000)]:
+        right, bottom = left + width, top + height
+        if contains:
+            expected = (rects[:, 0] >= left) & (rects[:, 1] >= top) & (rects[:, 2] <= right) & (rects[:, 3] <= bottom)
+        else:
+            expected = (rects[:, 0] <= right) & (rects[:, 2] >= left) & (rects[:, 1] <= bottom) & (rects[:, 3] >= top)
+        assert index.query(left, top, right, bottom, contains).tolist() == np.flatnonzero(expected).tolist()
+
+def test_scene_node_at(mod):
+    """Check that nodeAt finds the visible node at a position, using an index updated when nodes move."""
+
+    scene = mod.NetworkScene()
+    scene.createNodes(range(3), positions=[QPointF(0, 0), QPointF(100, 0), QPointF(1000, 1000)])
+    assert scene.nodeAt(QPointF(0, 0)) is scene.node(0)
+    assert scene.nodeAt(QPointF(100, 10)) is scene.node(1)
+    assert scene.nodeAt(QPointF(50, 0)) is None
+
+    scene.node(1).setPos(QPointF(500, 500))
+    assert scene.nodeAt(QPointF(100, 10)) is None
+    assert scene.nodeAt(QPointF(500, 500)) is scene.node(1)
+
+    scene.setLayout([0, 0, 1000, 1000, 100, 0])
+    assert scene.nodeAt(QPointF(1000, 1000)) is scene.node(1)
+
+    scene.node(1).hide()
+    assert scene.nodeAt(QPointF(1000, 1000)) is None
+
+    # Selected nodes are on top of others
+    scene.node(0).setPos(QPointF(10, 0))
+    scene.node(2).setPos(QPointF(0, 0))
+    scene.node(0).setSelected(True)
+    assert scene.nodeAt(QPointF(5, 0)) is scene.node(0)
+
+    scene.removeNodes([scene.node(0)])
+    assert scene.nodeAt(QPointF(5, 0)) is scene.node(2)
+
+def test_scene_nodes_in_rect(mod):
+    """Check that nodesInRect finds visible nodes intersecting or contained in a rectangle."""
+
+    scene = mod.NetworkScene()
+    scene.createNodes(range(100), positions=[QPointF(i * 100, 0) for i in range(100)])
+    radius = scene.node(0).radius()
+    nodes = scene.nodesInRect(QRectF(0, -10, 300, 20))
+    assert nodes == [scene.node(i) for i in range(4)]
+
+    nodes = scene.nodesInRect(QRectF(0, -10, 300, 20), Qt.ContainsItemBoundingRect)
+    assert nodes == []
+    nodes = scene.nodesInRect(QRectF(100 - 2 * radius, -2 * radius, 200 + 4 * radius, 4 * radius),
+                              Qt.ContainsItemBoundingRect)
+    assert nodes == [scene.node(i) for i in range(1, 4)]
+
+    scene.node(2).hide()
+    nodes = scene.nodesInRect(QRectF(0, -10, 300, 20))
+    assert nodes == [scene.node(i) for i in (0, 1, 3)]
+
+    # Isolated nodes are not painted and are not found
+    scene.setLayout(np.zeros((100, 2)), isolated_nodes=[0])
+    assert scene.nodesInRect(QRectF(-10, -10, 20, 20)) == [scene.node(i) for i in range(1, 100) if i != 2]
+
+def test_scene_edges_at_and_in_rect(mod):
+    """Check that edgeAt and edgesInRect find visible edges, using an index updated when edges move."""
+
+    scene = mod.NetworkScene()
+    nodes = scene.createNodes(range(4), positions=[QPointF(0, 0), QPointF(100, 0), QPointF(0, 500),
+                                                    QPointF(100, 500)])
+    edges = scene.createEdges(range(2), [nodes[0], nodes[2]], [nodes[1], nodes[3]], [1., 1.])
+    scene.flushEdgesAdjustment()
+    assert scene.edgeAt(QPointF(50, 0)) is edges[0]
+    assert scene.edgeAt(QPointF(50, 500)) is edges[1]
+    assert scene.edgeAt(QPointF(50, 250)) is None
+    assert scene.edgesInRect(QRectF(40, -10, 20, 20)) == [edges[0]]
+    assert scene.edgesInRect(QRectF(-50, -50, 200, 600), Qt.ContainsItemBoundingRect) == edges
+
+    scene.setLayout([0, 250, 100, 250, 0, 500, 100, 500])
+    assert scene.edgeAt(QPointF(50, 0)) is None
+    assert scene.edgeAt(QPointF(50, 250)) is edges[0]
+
+    edges[0].hide()
+    assert scene.edgeAt(QPointF(50, 250)) is None
+    assert scene.edgesInRect(QRectF(-50, 200, 200, 400)) == [edges[1]]
+
+    scene.removeEdges([edges[1]])
+    assert scene.edgeAt(QPointF(50, 500)) is None
+
 def test_scene_lock(scene, qtbot):
     """Check that nodes in a locked scene can't be moved."""
     
@@ -1136,6 +1931,277 @@ def test_scene_set_layout_no_flags_change(scene, qtbot, scale):
     for node in scene.nodes():
         assert node.flags() & QGraphicsItem.ItemIsMovable
         
+@pytest.mark.parametrize("scale", [0, 1, 0.245, 1000])
+def test_scene_set_layout_from_array(scene, qtbot, scale):
+    """Check that setLayoutFromArray change nodes positions and flags using an isolated nodes mask."""
+    
+    positions = np.random.uniform(-100, 100, (len(scene.nodes()), 2))
+    isolated_mask = np.zeros(len(positions), dtype=bool)
+    isolated_mask[::3] = True
+    
+    with qtbot.waitSignal(scene.layoutChanged):
+        scene.setLayoutFromArray(positions, scale, isolated_mask)
+        
+    effective_scale = scale if scale > 0 else scene.scale()
+    
+    for node in scene.nodes():
+        if isolated_mask[node.index()]:
+            x, y = POSITIONS[node.index()]
+            assert node.flags() & QGraphicsItem.ItemHasNoContents
+            assert not node.flags() & QGraphicsItem.ItemIsSelectable
+        else:
+            x, y = positions[node.index()] * effective_scale
+            assert not node.flags() & QGraphicsItem.ItemHasNoContents
+            assert node.flags() & QGraphicsItem.ItemIsSelectable
+        assert node.flags() & QGraphicsItem.ItemSendsScenePositionChanges
+        assert node.pos().x() == pytest.approx(x)
+        assert node.pos().y() == pytest.approx(y)
+        
+        
+def test_scene_set_layout_adjust_edges(scene):
+    """Check that edges follow their nodes after setLayout."""
+    
+    positions = np.asarray(POSITIONS[::-1]) * 3
+    scene.setLayout(positions)
+    
+    for edge in scene.edges():
+        source = edge.sourceNode().pos()
+        dest = edge.destNode().pos()
+        path_rect = edge.path().boundingRect()
+        assert path_rect.width() <= abs(dest.x() - source.x()) + 1e-6
+        assert path_rect.height() <= abs(dest.y() - source.y()) + 1e-6
+        assert path_rect.center().x() == pytest.approx((source.x() + dest.x()) / 2, abs=1)
+        assert path_rect.center().y() == pytest.approx((source.y() + dest.y()) / 2, abs=1)
+        
+        
+def path_points(path):
+    return np.array([(path.elementAt(i).x, path.elementAt(i).y) for i in range(path.elementCount())])
+
+
+def render_image(scene):
+    # Render a fixed area so that images do not depend on the scene rect
+    image = QImage(QSize(400, 400), QImage.Format_ARGB32)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(image.rect()), QRectF(image.rect()))
+    painter.end()
+    return image
+        
+        
+def test_scene_adjust_edges(scene):
+    """Check that adjustEdges gives the same edges geometry as Edge.adjust."""
+    
+    for node, (x, y) in zip(scene.nodes(), np.asarray(POSITIONS[::-1]) * 2):
+        node.setPos(x, y)
+    scene.adjustEdges()
+    paths = [path_points(edge.path()) for edge in scene.edges()]
+    
+    for edge, points in zip(scene.edges(), paths):
+        edge.adjust()
+        assert np.allclose(path_points(edge.path()), points)
+        
+        
+def test_scene_adjust_edges_subset(scene):
+    """Check that adjustEdges only updates the given edges."""
+    
+    node = scene.node(0)
+    edges = scene.edges()
+    paths = [path_points(edge.path()) for edge in edges]
+    
+    node.setFlag(QGraphicsItem.ItemSendsScenePositionChanges, False)
+    node.setPos(node.pos() + QPointF(300, 300))
+    scene.adjustEdges(edge for edge in edges if edge.index() == 0)
+    
+    for edge, points in zip(edges, paths):
+        if edge.index() == 0:
+            assert not np.allclose(path_points(edge.path()), points)
+        else:
+            assert np.allclose(path_points(edge.path()), points)
+            
+            
+def test_scene_adjust_edges_self_loop(mod, qapp):
+    """Check that self-loops are rebuilt by adjustEdges when only the radius of their node changed."""
+    
+    scene = mod.NetworkScene()
+    node, = scene.createNodes([0])
+    edge, = scene.createEdges([0], [node], [node], [1.])
+    rect = edge.path().boundingRect()
+    
+    node.setRadius(node.radius() * 2)
+    scene.adjustEdges()
+    assert edge.path().boundingRect().width() > rect.width()
+        
+        
+def test_scene_edges_adjustment_deferred(scene, qtbot):
+    """Check that edges of moved nodes are adjusted once on next event loop iteration."""
+    
+    assert not scene.edgesAdjustmentSynchronous()
+    
+    edge = scene.edge(0)
+    points = path_points(edge.path())
+    for node in scene.nodes():
+        node.setPos(node.pos() + QPointF(50, -50))
+    assert np.allclose(path_points(edge.path()), points)
+    
+    qtbot.waitUntil(lambda: not np.allclose(path_points(edge.path()), points))
+    assert np.allclose(path_points(edge.path()), points + (50, -50))
+    
+    
+def test_scene_edges_adjustment_flush(scene):
+    """Check that pending edges can be adjusted right away."""
+    
+    edge = scene.edge(0)
+    points = path_points(edge.path())
+    edge.sourceNode().setPos(edge.sourceNode().pos() + QPointF(50, -50))
+    scene.flushEdgesAdjustment()
+    assert not np.allclose(path_points(edge.path()), points)
+    
+    
+def test_scene_edges_adjustment_synchronous(scene):
+    """Check that edges are adjusted as soon as a node moves in synchronous mode."""
+    
+    scene.setEdgesAdjustmentSynchronous(True)
+    assert scene.edgesAdjustmentSynchronous()
+    
+    edge = scene.edge(0)
+    points = path_points(edge.path())
+    edge.sourceNode().setPos(edge.sourceNode().pos() + QPointF(50, -50))
+    assert not np.allclose(path_points(edge.path()), points)
+    
+    
+def test_scene_edges_batch_rendering_flags(scene):
+    """Check that only unselected straight edges are drawn by the edges layer in batch rendering mode."""
+    
+    assert not scene.edgesBatchRendering()
+    scene.setEdgesBatchRendering(True)
+    assert scene.edgesBatchRendering()
+    
+    for edge in scene.edges():
+        assert edge.flags() & QGraphicsItem.ItemHasNoContents
+        
+    edge = scene.edge(0)
+    edge.setSelected(True)
+    assert not edge.flags() & QGraphicsItem.ItemHasNoContents
+    edge.setSelected(False)
+    assert edge.flags() & QGraphicsItem.ItemHasNoContents
+    
+    scene.setEdgesBatchRendering(False)
+    for edge in scene.edges():
+        assert not edge.flags() & QGraphicsItem.ItemHasNoContents
+        assert edge.flags() & QGraphicsItem.ItemIsSelectable
+        
+        
+@pytest.mark.parametrize("selected", [None, 0, 5])
+def test_scene_edges_batch_rendering_render(scene, selected):
+    """Check that batch rendering of edges gives the same image as painting edges one by one."""
+    
+    if selected is not None:
+        scene.edge(selected).setSelected(True)
+    scene.edge(3).hide()
+    
+    expected = render_image(scene)
+    scene.setEdgesBatchRendering(True)
+    assert render_image(scene) == expected
+    
+    
+def test_scene_edges_batch_rendering_relayout(scene):
+    """Check that the edges layer follows edges after nodes have moved."""
+    
+    scene.setEdgesBatchRendering(True)
+    before = render_image(scene)
+    scene.setLayout(np.asarray(POSITIONS[::-1]) * 1.2)
+    after = render_image(scene)
+    assert after != before
+    
+    scene.setEdgesBatchRendering(False)
+    assert render_image(scene) == after
+    
+    
+def test_scene_level_of_detail_thresholds(mod, scene):
+    """Check that level of detail thresholds can be changed independently."""
+    
+    details = [mod.NetworkScene.DetailShapes, mod.NetworkScene.DetailPieCharts,
+               mod.NetworkScene.DetailLabels, mod.NetworkScene.DetailPixmaps]
+    assert [scene.levelOfDetailThreshold(d) for d in details] == pytest.approx([0.1, 0.1, 0.4, 0.4])
+    
+    scene.setLevelOfDetailThreshold(mod.NetworkScene.DetailLabels, 2.5)
+    assert [scene.levelOfDetailThreshold(d) for d in details] == pytest.approx([0.1, 0.1, 2.5, 0.4])
+    
+    
+@pytest.mark.parametrize("polygon", [NodePolygon.Circle, NodePolygon.Square, NodePolygon.Star])
+def test_scene_level_of_detail_render(mod, scene, polygon):
+    """Check that parts of nodes are not painted when level of detail is below their threshold."""
+    
+    scene.setPieColors([QColor(Qt.red), QColor(Qt.blue)])
+    for node in scene.nodes():
+        node.setPolygon(polygon.value)
+        node.setPie([1, 2])
+    full = render_image(scene)
+    
+    # Pie charts
+    scene.setLevelOfDetailThreshold(mod.NetworkScene.DetailPieCharts, 1000)
+    no_pies = render_image(scene)
+    assert no_pies != full
+    scene.resetPieCharts()
+    assert render_image(scene) == no_pies
+    
+    # Labels
+    scene.setLevelOfDetailThreshold(mod.NetworkScene.DetailLabels, 1000)
+    no_labels = render_image(scene)
+    assert no_labels != no_pies
+    scene.setLabels([""] * len(scene.nodes()))
+    assert render_image(scene) == no_labels
+    
+    # Dots
+    scene.setLevelOfDetailThreshold(mod.NetworkScene.DetailShapes, 1000)
+    assert render_image(scene) != no_labels
+    
+    
+def test_scene_level_of_detail_pixmaps(mod, scene):
+    """Check that pixmaps are not painted when level of detail is below their threshold."""
+    
+    expected = render_image(scene)
+    for node in scene.nodes():
+        node.setPixmap(QPixmap(MOLECULES[0]['image']))
+    assert render_image(scene) != expected
+    
+    scene.setLevelOfDetailThreshold(mod.NetworkScene.DetailPixmaps, 1000)
+    assert render_image(scene) == expected
+    
+    
+@pytest.mark.parametrize("polygon", [NodePolygon.Circle, NodePolygon.Square, NodePolygon.Star])
+@pytest.mark.parametrize("change", ["pie", "radius", "polygon"])
+def test_scene_pie_charts_slices(mod, scene, polygon, change):
+    """Check that cached slices of pie charts are rebuilt when pie values or nodes geometry change."""
+    
+    def setup(scene, pie, radius, polygon):
+        scene.setPieColors([QColor(Qt.red), QColor(Qt.blue), QColor(Qt.green)])
+        scene.setNodesPolygons([polygon.value] * len(scene.nodes()))
+        scene.setNodesRadii([radius] * len(scene.nodes()))
+        for node in scene.nodes():
+            node.setPie(pie)
+    
+    setup(scene, [1, 2, 3], 30, polygon)
+    render_image(scene)
+    
+    pie, radius = [3, 1, 1], 30
+    if change == "pie":
+        for node in scene.nodes():
+            node.setPie(pie)
+    elif change == "radius":
+        radius = 45
+        scene.setNodesRadii([radius] * len(scene.nodes()))
+    else:
+        polygon = NodePolygon.Circle if polygon != NodePolygon.Circle else NodePolygon.Hexagon
+        scene.setNodesPolygons([polygon.value] * len(scene.nodes()))
+    if change != "pie":
+        pie = [1, 2, 3]
+    
+    expected = create_scene(mod)
+    setup(expected, pie, radius, polygon)
+    assert render_image(scene) == render_image(expected)
+    
+    
 def test_scene_render(scene):
     """Check that scene render set back cache mode to DeviceCoordinateCache."""
             
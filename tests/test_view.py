@@ -1,6 +1,6 @@
 import pytest
 
-from PySide6.QtCore import Qt, QPoint
+from PySide6.QtCore import Qt, QPoint, QPointF
 from PySide6.QtWidgets import QGraphicsView, QWidget
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 import PySide6MolecularNetwork
@@ -35,6 +35,94 @@ def test_view_right_mouse_press(view, qtbot):
     assert view.dragMode() == QGraphicsView.NoDrag
     
     
+def test_view_rubber_band_selection(view, qtbot):
+    """Check that nodes are selected when dragging a rubber band with right button"""
+
+    scene = view.scene()
+    scene.createNodes(range(3), positions=[QPointF(0, 0), QPointF(100, 0), QPointF(1000, 0)])
+    view.resize(400, 400)
+    view.resetTransform()
+    view.centerOn(QPointF(0, 0))
+
+    start = view.mapFromScene(QPointF(-50, -50))
+    end = view.mapFromScene(QPointF(150, 50))
+    qtbot.mousePress(view.viewport(), Qt.RightButton, pos=start)
+    assert view.dragMode() == QGraphicsView.RubberBandDrag
+    qtbot.mouseMove(view.viewport(), pos=end)
+    assert set(scene.selectedNodes()) == {scene.node(0), scene.node(1)}
+
+    qtbot.mouseRelease(view.viewport(), Qt.RightButton, pos=end)
+    assert view.dragMode() == QGraphicsView.NoDrag
+    assert set(scene.selectedNodes()) == {scene.node(0), scene.node(1)}
+
+    # Right click on a node does not change selection
+    qtbot.mousePress(view.viewport(), Qt.RightButton, pos=view.mapFromScene(QPointF(0, 0)))
+    assert view.dragMode() == QGraphicsView.NoDrag
+    assert set(scene.selectedNodes()) == {scene.node(0), scene.node(1)}
+
+
+def test_view_rubber_band_selection_edges(view, qtbot):
+    """Check that edges are selected by the rubber band and that edges already selected are kept with Ctrl"""
+
+    scene = view.scene()
+    nodes = scene.createNodes(range(4), positions=[QPointF(0, 0), QPointF(100, 0),
+                                                    QPointF(1000, 0), QPointF(1000, 200)])
+    edges = scene.createEdges(range(2), [nodes[0], nodes[2]], [nodes[1], nodes[3]], [1., 1.])
+    scene.flushEdgesAdjustment()
+    view.resize(400, 400)
+    view.resetTransform()
+    view.centerOn(QPointF(0, 0))
+
+    start = view.mapFromScene(QPointF(-50, -50))
+    end = view.mapFromScene(QPointF(150, 50))
+    scene.setEdgesSelection([edges[1]])
+    qtbot.mousePress(view.viewport(), Qt.RightButton, Qt.ControlModifier, pos=start)
+    qtbot.mouseMove(view.viewport(), pos=end)
+    qtbot.mouseRelease(view.viewport(), Qt.RightButton, pos=end)
+    assert set(scene.selectedNodes()) == {nodes[0], nodes[1]}
+    assert set(scene.selectedEdges()) == {edges[0], edges[1]}
+
+    qtbot.mousePress(view.viewport(), Qt.RightButton, pos=start)
+    qtbot.mouseMove(view.viewport(), pos=end)
+    qtbot.mouseRelease(view.viewport(), Qt.RightButton, pos=end)
+    assert set(scene.selectedNodes()) == {nodes[0], nodes[1]}
+    assert scene.selectedEdges() == [edges[0]]
+
+    # Clicks on an edge are not taken as clicks on background
+    pos = view.mapFromScene(QPointF(50, 0))
+    assert scene.edgeAt(QPointF(50, 0)) is edges[0]
+    qtbot.mousePress(view.viewport(), Qt.RightButton, pos=pos)
+    assert view.dragMode() == QGraphicsView.NoDrag
+    assert scene.selectedEdges() == [edges[0]]
+
+
+def test_view_mouse_press_batch_rendering(view, qtbot):
+    """Check that the edges layer does not catch clicks on background when edges are drawn in batch"""
+
+    scene = view.scene()
+    nodes = scene.createNodes(range(4), positions=[QPointF(0, 0), QPointF(300, 0),
+                                                    QPointF(0, 300), QPointF(300, 300)])
+    scene.createEdges(range(2), [nodes[0], nodes[2]], [nodes[1], nodes[3]], [1., 1.])
+    scene.setEdgesBatchRendering(True)
+    view.resize(400, 400)
+    view.resetTransform()
+    view.centerOn(QPointF(150, 150))
+
+    pos = view.mapFromScene(QPointF(150, 150))
+    assert view.itemAt(pos) is None
+    assert scene.items(QPointF(150, 150)) == []
+
+    qtbot.mousePress(view.viewport(), Qt.LeftButton, pos=pos)
+    assert view.dragMode() == QGraphicsView.ScrollHandDrag
+    qtbot.mouseRelease(view.viewport(), Qt.LeftButton, pos=pos)
+    assert view.dragMode() == QGraphicsView.NoDrag
+
+    qtbot.mousePress(view.viewport(), Qt.RightButton, pos=pos)
+    assert view.dragMode() == QGraphicsView.RubberBandDrag
+    qtbot.mouseRelease(view.viewport(), Qt.RightButton, pos=pos)
+    assert view.dragMode() == QGraphicsView.NoDrag
+
+
 @pytest.mark.parametrize("has_scene", [True, False], ids=["scene", "noscene"])
 def test_view_mouse_move(view, qtbot, mocker, has_scene):
     """Check that rubber band is adjusted when mouse move"""